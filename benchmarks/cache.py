@@ -0,0 +1,182 @@
+import asyncio
+from collections.abc import Callable, Sequence
+from datetime import datetime, timezone
+from typing import Any
+from uuid import UUID, uuid4
+
+from pydantic import BaseModel, ValidationError
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+
+from benchmarks.harness import BenchmarkRunner
+from matter_persistence.redis.cache_helper import CacheHelper
+from matter_persistence.redis.manager import CacheManager
+from matter_persistence.redis.utils import (
+    compress_pickle_data,
+    decompress_pickle_data,
+    dump_compact_model_list,
+    get_model_list_adapter,
+    load_compact_model_list,
+)
+
+
+class BenchmarkDTO(BaseModel):
+    id: UUID
+    organization_id: UUID
+    name: str
+    value: int
+    tags: list[str]
+    created: datetime
+
+
+def make_dtos(number: int) -> list[BenchmarkDTO]:
+    organization_id = uuid4()
+    return [
+        BenchmarkDTO(
+            id=uuid4(),
+            organization_id=organization_id,
+            name=f"object {i}",
+            value=i,
+            tags=["benchmark", f"tag {i % 10}"],
+            created=datetime.now(timezone.utc),  # noqa: UP017
+        )
+        for i in range(number)
+    ]
+
+
+def decode_like_get_many(data: bytes) -> BenchmarkDTO | list[BenchmarkDTO]:
+    """
+    Decodes a value the way CacheManager.get_many_with_keys decodes a value that isn't in the compact encoding.
+    """
+    try:
+        return BenchmarkDTO.model_validate_json(data)
+    except ValidationError:
+        return get_model_list_adapter(BenchmarkDTO).validate_json(data)
+
+
+async def run_codec_benchmarks(runner: BenchmarkRunner, payload_sizes: Sequence[int]) -> None:
+    """
+    Encoding and decoding of lists of objects, per codec and number of objects in the payload. json_get_many is the
+    JSON list decoded the way get_many_with_keys decodes it, the baseline of the compact encoding.
+    """
+    for payload_size in payload_sizes:
+        dtos = make_dtos(payload_size)
+        adapter = get_model_list_adapter(BenchmarkDTO)
+        codecs: dict[str, tuple[Callable[[], bytes], Callable[[bytes], Any]]] = {
+            "json": (lambda: adapter.dump_json(dtos), adapter.validate_json),
+            "json_get_many": (lambda: adapter.dump_json(dtos), decode_like_get_many),
+            "compact": (
+                lambda: dump_compact_model_list(BenchmarkDTO, dtos),
+                lambda data: load_compact_model_list(BenchmarkDTO, data),
+            ),
+            "pickle_gzip": (lambda: compress_pickle_data(dtos), decompress_pickle_data),
+        }
+        for codec, (encode, decode) in codecs.items():
+            encoded = encode()
+            extra = {"encoded_bytes": len(encoded)}
+            await runner.run("codec", "encode", encode, payload_size, extra, codec=codec, objects=payload_size)
+            await runner.run(
+                "codec", "decode", lambda: decode(encoded), payload_size, extra, codec=codec, objects=payload_size
+            )
+
+
+async def run_key_benchmarks(runner: BenchmarkRunner, number_of_keys: int = 1000) -> None:
+    organization_id = uuid4()
+    keys = [str(uuid4()) for _ in range(number_of_keys)]
+
+    def create_basic_hash_keys():
+        for key in keys:
+            CacheHelper.create_basic_hash_key(key, "BenchmarkDTO")
+
+    def create_hash_keys():
+        for key in keys:
+            CacheHelper.create_hash_key(organization_id, key, BenchmarkDTO)
+
+    await runner.run("cache_helper", "create_basic_hash_key", create_basic_hash_keys, number_of_keys)
+    await runner.run("cache_helper", "create_hash_key", create_hash_keys, number_of_keys)
+
+
+async def run_redis_benchmarks(
+    runner: BenchmarkRunner, redis_url: str, sizes: Sequence[int], concurrency: Sequence[int]
+) -> None:
+    """
+    CacheManager operations against a Redis server; the keys are deleted afterwards.
+    """
+    connection_pool = aioredis.ConnectionPool.from_url(redis_url, max_connections=max(concurrency, default=1) + 1)
+    cache_manager = CacheManager(connection_pool=connection_pool)
+    prefix = f"benchmark_{uuid4().hex}"
+    written_keys = [prefix, f"{prefix}_list"]
+    try:
+        dto = make_dtos(1)[0]
+        await runner.run("cache", "save_with_key", lambda: cache_manager.save_with_key(prefix, dto, BenchmarkDTO))
+        await runner.run("cache", "get_with_key", lambda: cache_manager.get_with_key(prefix, BenchmarkDTO))
+
+        for size in sizes:
+            dtos = make_dtos(size)
+            values_to_store = {f"{prefix}_{i}": dto for i, dto in enumerate(dtos)}
+            keys = list(values_to_store)
+            written_keys.extend(keys)
+            await runner.run(
+                "cache",
+                "save_many_with_keys",
+                lambda: cache_manager.save_many_with_keys(values_to_store, BenchmarkDTO, expiration_in_seconds=600),
+                size,
+                keys=size,
+            )
+            await runner.run(
+                "cache",
+                "get_many_with_keys",
+                lambda: cache_manager.get_many_with_keys(keys, BenchmarkDTO),
+                size,
+                keys=size,
+            )
+
+            for compact_lists in (False, True):
+                await runner.run(
+                    "cache",
+                    "save_list_with_key",
+                    lambda: cache_manager.save_many_with_keys(
+                        {f"{prefix}_list": dtos}, BenchmarkDTO, expiration_in_seconds=600, compact_lists=compact_lists
+                    ),
+                    size,
+                    objects=size,
+                    compact_lists=compact_lists,
+                )
+                list_hash_key = CacheHelper.create_basic_hash_key(f"{prefix}_list", BenchmarkDTO.__name__)
+                stored = await cache_manager.get_many_with_keys([list_hash_key], use_key_as_is=True)
+                await runner.run(
+                    "cache",
+                    "get_list_with_key",
+                    # get_with_key only reads lists in the compact encoding, get_many_with_keys reads both
+                    lambda: cache_manager.get_many_with_keys([f"{prefix}_list"], BenchmarkDTO),
+                    size,
+                    {"encoded_bytes": len(stored[list_hash_key] or b"")},
+                    objects=size,
+                    compact_lists=compact_lists,
+                )
+
+        for tasks in concurrency:
+            await runner.run(
+                "cache",
+                "concurrent_get_with_key",
+                lambda: asyncio.gather(*(cache_manager.get_with_key(prefix, BenchmarkDTO) for _ in range(tasks))),
+                tasks,
+                tasks=tasks,
+            )
+    finally:
+        connection = aioredis.Redis(connection_pool=connection_pool)
+        hash_keys = [CacheHelper.create_basic_hash_key(key, BenchmarkDTO.__name__) for key in written_keys]
+        for batch_start in range(0, len(hash_keys), 10_000):
+            await connection.delete(*hash_keys[batch_start : batch_start + 10_000])
+        await connection.aclose()
+        await cache_manager.close_connection_pool()
+
+
+async def is_redis_reachable(redis_url: str) -> bool:
+    connection = aioredis.Redis.from_url(redis_url, socket_connect_timeout=1)
+    try:
+        return await connection.ping()
+    except (OSError, RedisError):
+        return False
+    finally:
+        await connection.aclose()
@@ -0,0 +1,158 @@
+import inspect
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, dataclass, field
+from importlib import metadata
+from typing import Any
+
+
+@dataclass
+class BenchmarkResult:
+    group: str
+    name: str
+    params: dict[str, Any]
+    operations: int  # operations per round, e.g. number of keys of a get_many
+    rounds: int
+    min: float
+    median: float
+    mean: float
+    p95: float
+    stdev: float
+    extra: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def key(self) -> str:
+        params = ",".join(f"{name}={value}" for name, value in sorted(self.params.items()))
+        return f"{self.group}/{self.name}[{params}]"
+
+    @property
+    def operations_per_second(self) -> float:
+        return self.operations / self.median if self.median else float("inf")
+
+
+class BenchmarkRunner:
+    """
+    Runs benchmarks and collects their results.
+
+    Every benchmark is run for warmup rounds that aren't measured, then for up to rounds measured rounds; it stops
+    earlier (after at least min_rounds) once max_seconds have been spent, so that large sizes don't take forever.
+
+    Arguments:
+        rounds (int): maximum number of measured rounds
+        min_rounds (int): minimum number of measured rounds
+        warmup (int): number of rounds run before measuring
+        max_seconds (float): time budget of the measured rounds of one benchmark
+    """
+
+    def __init__(self, rounds: int = 20, min_rounds: int = 3, warmup: int = 1, max_seconds: float = 5.0):
+        self.rounds = rounds
+        self.min_rounds = min_rounds
+        self.warmup = warmup
+        self.max_seconds = max_seconds
+        self.results: list[BenchmarkResult] = []
+
+    async def run(
+        self,
+        group: str,
+        name: str,
+        function: Callable[[], Awaitable[Any] | Any],
+        operations: int = 1,
+        extra: dict[str, Any] | None = None,
+        **params: Any,
+    ) -> BenchmarkResult:
+        for _ in range(self.warmup):
+            await _call(function)
+
+        durations: list[float] = []
+        deadline = time.perf_counter() + self.max_seconds
+        while len(durations) < self.rounds and (len(durations) < self.min_rounds or time.perf_counter() < deadline):
+            start = time.perf_counter()
+            await _call(function)
+            durations.append(time.perf_counter() - start)
+
+        durations.sort()
+        result = BenchmarkResult(
+            group=group,
+            name=name,
+            params=params,
+            operations=operations,
+            rounds=len(durations),
+            min=durations[0],
+            median=statistics.median(durations),
+            mean=statistics.fmean(durations),
+            p95=durations[min(len(durations) - 1, int(len(durations) * 0.95))],
+            stdev=statistics.stdev(durations) if len(durations) > 1 else 0.0,
+            extra=extra or {},
+        )
+        self.results.append(result)
+        print(
+            f"{result.key:<80} median {result.median * 1000:10.3f} ms  {result.operations_per_second:14.1f} ops/s",
+            file=sys.stderr,
+        )
+        return result
+
+    def report(self, settings: dict[str, Any]) -> dict[str, Any]:
+        """
+        The results and the environment they were measured in, as a JSON serialisable dictionary.
+        """
+        return {
+            "environment": get_environment(),
+            "settings": settings,
+            "results": [
+                {"key": result.key, **asdict(result), "operations_per_second": result.operations_per_second}
+                for result in self.results
+            ],
+        }
+
+
+async def _call(function: Callable[[], Awaitable[Any] | Any]) -> Any:
+    result = function()
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+def get_environment() -> dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    versions = {}
+    for package in ("matter-persistence", "sqlalchemy", "pydantic", "redis", "asyncpg", "aiosqlite"):
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "versions": versions,
+    }
+
+
+def compare(baseline: dict[str, Any], current: dict[str, Any], threshold: float = 0.1) -> list[str]:
+    """
+    Compares the median durations of two reports, returning a line per benchmark present in both.
+    Benchmarks that got slower or faster by more than threshold (relative) are marked.
+    """
+    baseline_results = {result["key"]: result for result in baseline["results"]}
+    lines = []
+    for result in current["results"]:
+        baseline_result = baseline_results.get(result["key"])
+        if baseline_result is None or not baseline_result["median"]:
+            continue
+        change = result["median"] / baseline_result["median"] - 1
+        marker = "SLOWER" if change > threshold else "faster" if change < -threshold else ""
+        lines.append(
+            f"{result['key']:<80} {baseline_result['median'] * 1000:10.3f} ms -> "
+            f"{result['median'] * 1000:10.3f} ms {change:+8.1%} {marker}"
+        )
+    return lines
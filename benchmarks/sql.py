@@ -0,0 +1,168 @@
+import asyncio
+import random
+from collections.abc import Sequence
+from uuid import UUID, uuid4
+
+import sqlalchemy as sa
+from sqlalchemy.orm import Mapped, mapped_column
+
+from benchmarks.harness import BenchmarkRunner
+from matter_persistence.sql.base import CustomBase
+from matter_persistence.sql.manager import DatabaseManager
+from matter_persistence.sql.utils import (
+    bulk_insert,
+    count,
+    find,
+    find_page,
+    find_with_count,
+    get,
+    get_many,
+    stream,
+)
+
+NUMBER_OF_ORGANIZATIONS = 10
+PAGE_SIZE = 100
+
+
+class BenchmarkORM(CustomBase):
+    __tablename__ = "matter_persistence_benchmark"
+
+    organization_id: Mapped[UUID] = mapped_column(index=True)
+    name: Mapped[str]
+    value: Mapped[int]
+
+
+def make_rows(number: int, organization_ids: Sequence[UUID]) -> list[dict]:
+    return [
+        {"organization_id": organization_ids[i % len(organization_ids)], "name": f"row {i}", "value": i}
+        for i in range(number)
+    ]
+
+
+async def run_sql_benchmarks(
+    runner: BenchmarkRunner, database_url: str, sizes: Sequence[int], concurrency: Sequence[int]
+) -> None:
+    """
+    sql.utils helpers against a database, on a table of max(sizes) rows that is dropped afterwards.
+    """
+    database_manager = DatabaseManager(database_url, engine_kwargs={"pool_size": max(concurrency, default=1)})
+    table = BenchmarkORM.__table__
+    async with database_manager.connect() as connection:
+        await connection.run_sync(lambda sync_connection: table.drop(sync_connection, checkfirst=True))
+        await connection.run_sync(lambda sync_connection: table.create(sync_connection))
+        await connection.commit()
+
+    try:
+        organization_ids = [uuid4() for _ in range(NUMBER_OF_ORGANIZATIONS)]
+        async with database_manager.session() as session:
+            ids = await bulk_insert(session, BenchmarkORM, make_rows(max(sizes), organization_ids))
+            await session.commit()
+
+        async def in_session(function, *args, **kwargs):
+            async with database_manager.session() as session:
+                return await function(session, *args, **kwargs)
+
+        number_of_rows = len(ids)
+        filters = {"organization_id": organization_ids[0]}
+        await runner.run(
+            "sql",
+            "get",
+            lambda: in_session(get, sa.select(BenchmarkORM).where(BenchmarkORM.id == random.choice(ids)), BenchmarkORM),
+            rows=number_of_rows,
+        )
+        await runner.run(
+            "sql",
+            "get_many",
+            lambda: in_session(get_many, BenchmarkORM, random.sample(ids, PAGE_SIZE)),
+            PAGE_SIZE,
+            rows=number_of_rows,
+            ids=PAGE_SIZE,
+        )
+        await runner.run(
+            "sql", "find", lambda: in_session(find, BenchmarkORM, limit=PAGE_SIZE), rows=number_of_rows, limit=PAGE_SIZE
+        )
+        await runner.run(
+            "sql",
+            "find_with_filters",
+            lambda: in_session(find, BenchmarkORM, limit=PAGE_SIZE, filters=filters),
+            rows=number_of_rows,
+            limit=PAGE_SIZE,
+        )
+        await runner.run(
+            "sql",
+            "find_with_custom_filter",
+            lambda: in_session(
+                find,
+                BenchmarkORM,
+                limit=PAGE_SIZE,
+                custom_filter=lambda q: q.where(BenchmarkORM.organization_id == organization_ids[0]),
+            ),
+            rows=number_of_rows,
+            limit=PAGE_SIZE,
+        )
+        await runner.run(
+            "sql",
+            "find_offset_pagination",
+            lambda: in_session(find, BenchmarkORM, skip=number_of_rows // 2, limit=PAGE_SIZE),
+            rows=number_of_rows,
+            skip=number_of_rows // 2,
+            limit=PAGE_SIZE,
+        )
+        _, cursor = await in_session(find_page, BenchmarkORM, limit=number_of_rows // 2)
+        await runner.run(
+            "sql",
+            "find_page_keyset_pagination",
+            lambda: in_session(find_page, BenchmarkORM, limit=PAGE_SIZE, cursor=cursor),
+            rows=number_of_rows,
+            skip=number_of_rows // 2,
+            limit=PAGE_SIZE,
+        )
+        await runner.run(
+            "sql",
+            "find_with_count",
+            lambda: in_session(find_with_count, BenchmarkORM, limit=PAGE_SIZE, filters=filters),
+            rows=number_of_rows,
+            limit=PAGE_SIZE,
+        )
+        await runner.run("sql", "count", lambda: in_session(count, BenchmarkORM, filters=filters), rows=number_of_rows)
+
+        for size in sizes:
+            await runner.run(
+                "sql",
+                "find_all",
+                lambda: in_session(find, BenchmarkORM, limit=size),
+                size,
+                rows=number_of_rows,
+                limit=size,
+            )
+
+            async def stream_rows(session, limit):
+                return [row async for row in stream(session, BenchmarkORM, limit=limit, as_rows=True)]
+
+            await runner.run(
+                "sql", "stream_rows", lambda: in_session(stream_rows, size), size, rows=number_of_rows, limit=size
+            )
+
+            async def insert_rows(session, rows):
+                # rolled back when the session closes, so that the table size doesn't change
+                await bulk_insert(session, BenchmarkORM, rows)
+
+            rows = make_rows(size, organization_ids)
+            await runner.run("sql", "bulk_insert", lambda: in_session(insert_rows, rows), size, rows=size)
+
+        for tasks in concurrency:
+            await runner.run(
+                "sql",
+                "concurrent_find_with_filters",
+                lambda: asyncio.gather(
+                    *(in_session(find, BenchmarkORM, limit=10, filters=filters) for _ in range(tasks))
+                ),
+                tasks,
+                rows=number_of_rows,
+                tasks=tasks,
+            )
+    finally:
+        async with database_manager.connect() as connection:
+            await connection.run_sync(lambda sync_connection: table.drop(sync_connection, checkfirst=True))
+            await connection.commit()
+        await database_manager.close()
@@ -0,0 +1,72 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+
+class CoarseClock:
+    """
+    A clock that caches the current time and refreshes it every resolution_in_seconds from the running event loop, so
+    that reading it costs an attribute lookup instead of a call to time.time() or datetime.now().
+
+    The cached time may lag behind the real time by resolution_in_seconds, or longer while the event loop is blocked.
+    The refreshing starts with the first read inside an event loop and stops once the clock isn't read for a whole
+    resolution_in_seconds, so an idle clock doesn't keep waking the loop up. Reads outside of the event loop that
+    refreshes the clock (e.g. synchronous code, or other threads) get the exact time.
+
+    Arguments:
+        resolution_in_seconds (float): how often the cached time is refreshed
+
+    Usage example:
+        clock = CoarseClock(resolution_in_seconds=0.01)
+        created_at = clock.now()
+    """
+
+    def __init__(self, resolution_in_seconds: float = 0.01):
+        self.resolution_in_seconds = resolution_in_seconds
+        self._timestamp = 0.0
+        self._datetime = datetime.fromtimestamp(0, tz=timezone.utc)  # noqa: UP017
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._is_read = False
+
+    def timestamp(self) -> float:
+        """
+        The current POSIX timestamp, like time.time().
+        """
+        if self._is_refreshed():
+            return self._timestamp
+        return time.time()
+
+    def now(self) -> datetime:
+        """
+        The current time as a timezone aware UTC datetime, like datetime.now(tz=timezone.utc).
+        """
+        if self._is_refreshed():
+            return self._datetime
+        return datetime.now(tz=timezone.utc)  # noqa: UP017
+
+    def _is_refreshed(self) -> bool:
+        loop = asyncio._get_running_loop()
+        if loop is None:
+            return False
+        if loop is not self._loop:
+            if self._loop is not None and not self._loop.is_closed():  # refreshed by another event loop
+                return False
+            self._loop = loop
+            self._refresh()
+        self._is_read = True
+        return True
+
+    def _refresh(self) -> None:
+        self._is_read = False
+        self._timestamp = time.time()
+        self._datetime = datetime.fromtimestamp(self._timestamp, tz=timezone.utc)  # noqa: UP017
+        self._loop.call_later(self.resolution_in_seconds, self._tick)  # type: ignore[union-attr]
+
+    def _tick(self) -> None:
+        if self._is_read:
+            self._refresh()
+        else:
+            self._loop = None
+
+
+coarse_clock = CoarseClock()
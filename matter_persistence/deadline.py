@@ -0,0 +1,50 @@
+import contextlib
+import time
+from collections.abc import Iterator
+from contextvars import ContextVar
+
+from matter_exceptions import DetailedException
+
+# time.monotonic() by which the SQL and Redis calls made in the current context (e.g. request) must be done
+_deadline: ContextVar[float | None] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceededError(DetailedException):
+    TOPIC = "Deadline Exceeded Error"
+
+
+@contextlib.contextmanager
+def deadline(timeout_in_seconds: float) -> Iterator[None]:
+    """
+    Sets a deadline for the SQL and Redis calls made in the block, e.g. once per request with the time the caller is
+    willing to wait. A nested deadline can only make the deadline earlier.
+
+    While a deadline is set, calls decorated with retry_if_failed (the sql.utils helpers, AsyncRedisClient commands)
+    raise DeadlineExceededError once it has passed and aren't retried when the remaining time is shorter than the
+    delay before the retry. Redis commands are cancelled when the deadline passes while they run. SQL calls aren't
+    cancelled, as that would leave their connection in an undefined state; on PostgreSQL, the transactions of
+    DatabaseManager sessions get a statement_timeout of the remaining time instead, so that the server stops slow
+    queries and releases their connections.
+
+    Usage example:
+        with deadline(2.5):
+            async with database_manager.session() as session:
+                await find(session, NumberORM)
+    """
+    timeout_at = time.monotonic() + timeout_in_seconds
+    current_deadline = _deadline.get()
+    token = _deadline.set(timeout_at if current_deadline is None else min(current_deadline, timeout_at))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def get_remaining_time() -> float | None:
+    """
+    The seconds left until the deadline of the current context, possibly negative; None if there is no deadline.
+    """
+    timeout_at = _deadline.get()
+    if timeout_at is None:
+        return None
+    return timeout_at - time.monotonic()
@@ -1,14 +1,18 @@
+import asyncio
 import itertools
 import logging
+import time
 from enum import Enum
 from functools import wraps
-from time import sleep
 
 from redis.exceptions import ConnectionError, TimeoutError
-from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.exc import DBAPIError, IntegrityError, OperationalError
 
+from matter_persistence.deadline import DeadlineExceededError, get_remaining_time
 from matter_persistence.redis.exceptions import CacheServerError
+from matter_persistence.redis.instrumentation import CacheInstrumentation
 from matter_persistence.sql.exceptions import DatabaseError, DatabaseIntegrityError
+from matter_persistence.sql.prepared_statements import discard_failed_transaction, is_stale_prepared_statement_error
 
 logger = logging.getLogger(__name__)
 
@@ -27,14 +31,67 @@ def _exception_to_details(exception: BaseException) -> dict:
     }
 
 
-def retry_if_failed(func, delays=(0, 1, 5)):
+async def _instrumented_call(func, instrumentation: CacheInstrumentation, args, kwargs):
+    start = time.perf_counter()
+    try:
+        result = await func(*args, **kwargs)
+    except BaseException as exc:
+        instrumentation.record_command(func.__name__, time.perf_counter() - start, exc)
+        raise
+    instrumentation.record_command(func.__name__, time.perf_counter() - start, None)
+    return result
+
+
+async def _wait_for_deadline(call, remaining_time: float, name: str):
+    try:
+        return await asyncio.wait_for(call, remaining_time)
+    except asyncio.TimeoutError as exc:  # noqa: UP041
+        raise DeadlineExceededError(
+            description=f"Deadline exceeded while running {name}",
+            detail=_exception_to_details(exc),
+        ) from exc
+
+
+def _get_instrumentation(args) -> CacheInstrumentation | None:
+    # methods of instrumented clients (e.g. AsyncRedisClient) report every attempt and retry
+    instrumentation = getattr(args[0], "instrumentation", None) if args else None
+    if isinstance(instrumentation, CacheInstrumentation) and instrumentation.enabled:
+        return instrumentation
+    return None
+
+
+def retry_if_failed(func, delays=(0, 1, 5), cancel_at_deadline=False):
+    """
+    Retries func when it fails with a transient error (e.g. a lost connection) and turns SQL and Redis errors into
+    DatabaseError, DatabaseIntegrityError and CacheServerError.
+
+    While a deadline is set (see matter_persistence.deadline.deadline), func isn't called (again) once it has passed.
+    With cancel_at_deadline, a running call is cancelled when the deadline passes as well. That's meant for Redis
+    commands only: cancelling a SQL call leaves its statement running on the server, the outcome of a commit unknown
+    and the connection in an undefined state, so SQL calls are ended by the statement_timeout of the server instead.
+    """
+
     @wraps(func)
     async def async_wrapper(*args, **kwargs):
         operation_outcome = OperationOutcome.SUCCESS  # assume success
         last_exception: Exception | None = None
-        for delay in itertools.chain(delays, [None]):
+        instrumentation = _get_instrumentation(args)
+        for attempt, delay in enumerate(itertools.chain(delays, [None])):
+            remaining_time = get_remaining_time()
+            if remaining_time is not None and remaining_time <= 0:
+                raise DeadlineExceededError(
+                    description=f"Deadline exceeded before running {func.__name__}",
+                    detail={"attempt": attempt},
+                ) from last_exception
             try:
-                result = await func(*args, **kwargs)
+                if instrumentation is None:
+                    call = func(*args, **kwargs)
+                else:
+                    call = _instrumented_call(func, instrumentation, args, kwargs)
+                if remaining_time is None or not cancel_at_deadline:
+                    result = await call
+                else:  # the call is cancelled when the deadline of the context (e.g. request) passes
+                    result = await _wait_for_deadline(call, remaining_time, func.__name__)
             except OperationalError as exc:
                 operation_outcome = OperationOutcome.SQL_ERROR
                 needs_retry = True
@@ -51,6 +108,17 @@ def retry_if_failed(func, delays=(0, 1, 5)):
                     detail=_exception_to_details(exc),
                 )
                 last_exception = exc
+            except DBAPIError as exc:
+                if not is_stale_prepared_statement_error(exc):
+                    raise
+                operation_outcome = OperationOutcome.SQL_ERROR
+                # the caches were invalidated when the error was raised, so a retry prepares the statement again
+                needs_retry = await discard_failed_transaction(args[0] if args else None)
+                new_exc = DatabaseError(
+                    description=f"Prepared statement is stale: {type(exc).__name__}",
+                    detail=_exception_to_details(exc),
+                )
+                last_exception = exc
             except ConnectionError as exc:
                 operation_outcome = OperationOutcome.CACHE_ERROR
                 needs_retry = True
@@ -79,10 +147,15 @@ def retry_if_failed(func, delays=(0, 1, 5)):
                     raise new_exc from last_exception
                 return result
             else:
+                remaining_time = get_remaining_time()
+                if remaining_time is not None and remaining_time <= delay:  # not enough time left for a retry
+                    raise new_exc from last_exception  # type: ignore[misc]
                 storage = "database" if operation_outcome == OperationOutcome.SQL_ERROR else "cache"
-                logging.warning(
+                if instrumentation is not None:
+                    instrumentation.record_retry(func.__name__, attempt, last_exception)  # type: ignore[arg-type]
+                logger.warning(
                     f"Unable to connect to {storage} due to {type(last_exception)}. Retrying in {delay} seconds...",
                 )
-                sleep(delay)
+                await asyncio.sleep(delay)
 
     return async_wrapper
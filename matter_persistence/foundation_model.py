@@ -1,16 +1,20 @@
 import abc
-import time
-from datetime import datetime, timezone
+from collections.abc import Iterable
+from datetime import datetime
+from functools import lru_cache
 from typing import Any
 
-from pydantic import BaseModel, ConfigDict, Field
+import sqlalchemy as sa
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
 
+from matter_persistence.clock import coarse_clock
 from matter_persistence.sql.base import CustomBase
 
 
 class FoundationModel(abc.ABC, BaseModel):
-    created_at: datetime = Field(default=datetime.now(tz=timezone.utc), alias="createdAt")  # noqa: UP017
-    created_at_timestamp: float = Field(default=time.time(), alias="createdAtTimestamp")
+    # factories, so that every instance gets the time it was created at, read from a cheap cached clock
+    created_at: datetime = Field(default_factory=coarse_clock.now, alias="createdAt")
+    created_at_timestamp: float = Field(default_factory=coarse_clock.timestamp, alias="createdAtTimestamp")
 
     model_config = ConfigDict(
         populate_by_name=True,
@@ -20,12 +24,55 @@ class FoundationModel(abc.ABC, BaseModel):
     @classmethod
     def parse_obj(cls, obj: Any):  # all the required fields must exist in the object that are use for initialisation
         if isinstance(obj, list):
-            return [cls.parse_obj(item) for item in obj]
-        elif isinstance(obj, CustomBase):  # sqlalchemy orm base class
-            return cls(**obj.__dict__)
-        elif isinstance(obj, BaseModel):
-            return cls(**obj.model_dump())
+            return cls.parse_many(obj)
         elif isinstance(obj, dict):
             return cls(**obj)
         else:
-            return cls(**obj.__dict__)
+            # from_attributes applies to nested values, e.g. loaded relationships of CustomBase rows
+            return cls.model_validate(_get_values(cls, obj), from_attributes=True)
+
+    @classmethod
+    def parse_many(cls, objs: Iterable[Any]) -> list:
+        """
+        Converts many objects at once, e.g. the result of find, validating all of them with a single call.
+
+        Objects may be CustomBase rows, Core rows (e.g. from stream(..., as_rows=True) or session.execute), pydantic
+        models, dictionaries or any other object. Only the fields of the model are read from the instance dictionary of
+        CustomBase rows and other objects, so their instance state is skipped and attributes that aren't loaded are
+        never lazy loaded.
+
+        :param objs: the objects to convert
+        :return: a list of models
+        """
+        return _get_list_adapter(cls).validate_python([_get_values(cls, obj) for obj in objs], from_attributes=True)
+
+
+def _get_values(model_class: type[FoundationModel], obj: Any) -> dict[str, Any]:
+    if isinstance(obj, dict):
+        return obj
+    if isinstance(obj, sa.Row):
+        if len(obj) != 1 or not isinstance(obj[0], CustomBase):
+            return obj._asdict()
+        obj = obj[0]  # e.g. a row of select(SomeORM)
+
+    values = obj.__dict__
+    return {key: values[key] for key in _get_field_keys(model_class) if key in values}
+
+
+@lru_cache(maxsize=512)
+def _get_field_keys(model_class: type[FoundationModel]) -> tuple[str, ...]:
+    """
+    The keys the fields of model_class can be populated from: their names and aliases.
+    """
+    keys: dict[str, None] = {}
+    for name, field in model_class.model_fields.items():
+        keys[name] = None
+        for alias in (field.alias, field.validation_alias):
+            if isinstance(alias, str):
+                keys[alias] = None
+    return tuple(keys)
+
+
+@lru_cache(maxsize=512)
+def _get_list_adapter(model_class: type[FoundationModel]) -> TypeAdapter[list[Any]]:
+    return TypeAdapter(list[model_class])  # type: ignore[valid-type]
@@ -0,0 +1,167 @@
+import asyncio
+import contextlib
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from functools import partial
+
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from matter_persistence.redis.manager import CacheManager
+from matter_persistence.sql.manager import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ProbeResult:
+    healthy: bool
+    latency_in_seconds: float
+    error: str | None = None
+
+
+@dataclass(frozen=True)
+class HealthStatus:
+    # by probe name: "sql:<engine name>" (see DatabaseManager.engines) and "redis"
+    probes: dict[str, ProbeResult] = field(default_factory=dict)
+    # time.monotonic() of the end of the check
+    checked_at: float = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        """
+        Whether the writer and Redis are healthy; unhealthy read replicas only get no readonly sessions, which then
+        use the writer, so they don't make the application unhealthy.
+        """
+        return all(result.healthy for name, result in self.probes.items() if not name.startswith("sql:reader_"))
+
+
+class HealthMonitor:
+    """
+    Probes the database (the writer and every read replica) and Redis concurrently on a background task, every
+    interval_in_seconds, and keeps the latest results with their latencies, so that readiness and liveness endpoints
+    can read them without querying anything. However often the endpoints are called, every engine only gets one
+    probe (and one pooled connection, for the time of a SELECT) per interval, so that probes don't add to the pressure
+    on the connection pools.
+
+    The read replica probes also check the replication lag and mark the replicas as healthy or not with
+    DatabaseManager.check_replica, so a replica that fails its probe gets no readonly sessions until it passes again.
+    Probes that take longer than timeout_in_seconds fail.
+
+    Arguments:
+        database_manager (DatabaseManager | None): the database to probe
+        cache_manager (CacheManager | None): the Redis to probe
+        interval_in_seconds (float): how often the probes run
+        timeout_in_seconds (float): how long a probe may take
+        max_age_in_seconds (float | None): results older than this (e.g. because the event loop is blocked) are
+            unhealthy; defaults to 3 intervals
+
+    Usage example:
+        async with HealthMonitor(database_manager, cache_manager, interval_in_seconds=5) as health_monitor:
+            ...
+            # in the readiness endpoint
+            if not health_monitor.is_healthy():
+                raise HTTPException(503, health_monitor.status)
+    """
+
+    def __init__(
+        self,
+        database_manager: DatabaseManager | None = None,
+        cache_manager: CacheManager | None = None,
+        interval_in_seconds: float = 5.0,
+        timeout_in_seconds: float = 2.0,
+        max_age_in_seconds: float | None = None,
+    ):
+        self.database_manager = database_manager
+        self.cache_manager = cache_manager
+        self.interval_in_seconds = interval_in_seconds
+        self.timeout_in_seconds = timeout_in_seconds
+        self.max_age_in_seconds = max_age_in_seconds if max_age_in_seconds is not None else 3 * interval_in_seconds
+        self._status: HealthStatus | None = None
+        self._task: asyncio.Task | None = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.stop()
+
+    @property
+    def status(self) -> HealthStatus | None:
+        """
+        The results of the latest check; None before the first one.
+        """
+        return self._status
+
+    def is_healthy(self) -> bool:
+        """
+        Whether the latest check is healthy (see HealthStatus.healthy) and recent enough.
+        """
+        status = self._status
+        return status is not None and status.healthy and time.monotonic() - status.checked_at <= self.max_age_in_seconds
+
+    async def start(self) -> None:
+        """
+        Runs a first check, so that a status is available right away, and starts checking in the background.
+        """
+        if self._task is not None:
+            return
+        await self.check()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    async def check(self) -> HealthStatus:
+        """
+        Runs all probes concurrently and stores their results as the latest status.
+        """
+        database_manager = self.database_manager
+        probes: dict[str, Callable[[], Awaitable[bool]]] = {}
+        if database_manager is not None:
+            for name, engine in database_manager.engines.items():
+                if name == "writer":
+                    probes[f"sql:{name}"] = partial(_probe_engine, engine)
+                else:
+                    probes[f"sql:{name}"] = partial(database_manager.check_replica, name)
+        if self.cache_manager is not None:
+            probes["redis"] = self.cache_manager.is_cache_alive
+
+        results = await asyncio.gather(*(self._probe(name, probe) for name, probe in probes.items()))
+        status = HealthStatus(probes=dict(zip(probes, results, strict=True)), checked_at=time.monotonic())
+        if database_manager is not None:
+            for name, result in status.probes.items():
+                # check_replica marks the replica itself, unless it timed out or failed unexpectedly
+                if name.startswith("sql:reader_") and not result.healthy:
+                    database_manager.set_replica_health(name.removeprefix("sql:"), False)
+        self._status = status
+        return status
+
+    async def _run(self) -> None:
+        while True:
+            # the interval is measured from the end of the previous check
+            await asyncio.sleep(self.interval_in_seconds)
+            await self.check()
+
+    async def _probe(self, name: str, probe: Callable[[], Awaitable[bool]]) -> ProbeResult:
+        start = time.perf_counter()
+        try:
+            healthy = bool(await asyncio.wait_for(probe(), self.timeout_in_seconds))
+            error = None if healthy else "unhealthy"
+        except Exception as exc:
+            logger.warning(f"Health probe {name} failed.", exc_info=True)
+            healthy, error = False, repr(exc)
+        return ProbeResult(healthy=healthy, latency_in_seconds=time.perf_counter() - start, error=error)
+
+
+async def _probe_engine(engine: AsyncEngine) -> bool:
+    async with engine.connect() as connection:
+        return bool(await connection.scalar(sa.text("SELECT 1")) == 1)
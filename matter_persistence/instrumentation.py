@@ -0,0 +1,62 @@
+import bisect
+from collections.abc import Sequence
+from typing import Any
+
+# in seconds
+DEFAULT_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """
+    Histogram with fixed upper bounds (buckets), like a Prometheus histogram.
+
+    Arguments:
+        buckets (Sequence[float]): the sorted upper bounds of the buckets; values above the last bound are counted in
+            an implicit +Inf bucket
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, quantile: float) -> float | None:
+        """
+        Estimates the given quantile (0 to 1) by interpolating within the bucket it falls into; None if empty.
+        """
+        if not self.count:
+            return None
+
+        rank = quantile * self.count
+        cumulative_count = 0
+        for i, bucket_count in enumerate(self.bucket_counts):
+            if cumulative_count + bucket_count >= rank and bucket_count:
+                lower_bound = self.buckets[i - 1] if i > 0 else 0.0
+                if i == len(self.buckets):
+                    return lower_bound
+                return lower_bound + (self.buckets[i] - lower_bound) * (rank - cumulative_count) / bucket_count
+            cumulative_count += bucket_count
+        return self.buckets[-1]
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": dict(zip([*self.buckets, float("inf")], self.bucket_counts, strict=True)),
+        }
+
+    def to_prometheus(self, name: str, labels: str) -> list[str]:
+        lines = []
+        cumulative_count = 0
+        for bucket, bucket_count in zip([*self.buckets, "+Inf"], self.bucket_counts, strict=True):
+            cumulative_count += bucket_count
+            lines.append(f'{name}_bucket{{{labels},le="{bucket}"}} {cumulative_count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
@@ -1,13 +1,18 @@
 import contextlib
 from collections.abc import AsyncIterator, Mapping, Sequence
 from datetime import timedelta
+from functools import partial
 
 from redis import asyncio as aioredis
 
 from matter_persistence.decorators import retry_if_failed
 from matter_persistence.redis.exceptions import CacheConnectionNotEstablishedError
+from matter_persistence.redis.instrumentation import CacheInstrumentation
 from matter_persistence.redis.utils import validate_connection_arguments
 
+# unlike SQL calls, Redis commands can be cancelled when the deadline of the context passes, see retry_if_failed
+_retry_if_failed = partial(retry_if_failed, cancel_at_deadline=True)
+
 
 class AsyncRedisClient:
     """
@@ -17,6 +22,7 @@ class AsyncRedisClient:
         connection_pool (ConnectionPool): The Redis connection pool to use for establishing a connection with.
         connection (Redis): The Redis connection to use; connections will not be pooled - only this one will be used.
         sentinel (Sentinel): The Redis Sentinel to use. Provides option of using the client either for reading or writing.
+        instrumentation (CacheInstrumentation): Records the duration, failures and retries of every command.
 
     Methods:
         async def __aenter__(self) -> AsyncRedisClient:
@@ -43,6 +49,12 @@ class AsyncRedisClient:
         async def get_hash_field(self, hash_key: str, field: Union[str, bytes]) -> Optional[bytes]:
             Retrieves the value of a field from a Redis hash.
 
+        async def set_hash_fields(self, hash_key: str, mapping: Mapping[str, Union[str, bytes]], ttl: Optional[int] = None) -> int:
+            Sets many fields of a Redis hash at once. If ttl is provided, sets the expiration time in seconds.
+
+        async def get_hash_fields(self, hash_key: str, fields: Sequence[str]) -> list[Optional[bytes]]:
+            Retrieves the values of the given fields from a Redis hash, in the order of the fields.
+
         async def get_all_hash_fields(self, hash_key: str) -> Optional[Dict[Union[str, bytes], Union[str, bytes]]]:
             Retrieves all fields and values from a Redis hash.
 
@@ -63,9 +75,11 @@ class AsyncRedisClient:
         sentinel: aioredis.Sentinel | None = None,
         sentinel_service_name: str | None = None,
         for_writing: bool = False,
+        instrumentation: CacheInstrumentation | None = None,
     ):
         validate_connection_arguments(connection, connection_pool, sentinel)
         self.connection = connection
+        self.instrumentation = instrumentation or CacheInstrumentation()
         self._connection_pool = connection_pool
         self._sentinel = sentinel
         self._sentinel_service_name = sentinel_service_name
@@ -97,7 +111,7 @@ class AsyncRedisClient:
         async with self.connection.pipeline(transaction=transaction) as pipe:
             yield pipe
 
-    @retry_if_failed
+    @_retry_if_failed
     async def set_value(self, key: str, value: str, ttl=None):
         result = await self.connection.set(key, value)  # type: ignore
         if ttl is not None:
@@ -105,7 +119,7 @@ class AsyncRedisClient:
 
         return result
 
-    @retry_if_failed
+    @_retry_if_failed
     async def set_many_values(self, values: Mapping[str, str], ttl: int | None = None) -> None:
         async with self.pipeline() as pipe:
             await pipe.mset(values)
@@ -114,11 +128,11 @@ class AsyncRedisClient:
                     await pipe.expire(key, ttl)
             await pipe.execute()
 
-    @retry_if_failed
+    @_retry_if_failed
     async def get_value(self, key: str) -> bytes:
         return await self.connection.get(key)  # type: ignore
 
-    @retry_if_failed
+    @_retry_if_failed
     async def get_many_values(self, keys: Sequence[str]) -> dict[str, bytes]:
         if not isinstance(self.connection, aioredis.Redis):
             raise CacheConnectionNotEstablishedError(
@@ -127,7 +141,7 @@ class AsyncRedisClient:
         response = await self.connection.mget(keys)
         return dict(zip(keys, response, strict=True))
 
-    @retry_if_failed
+    @_retry_if_failed
     async def set_hash_field(self, hash_key: str, field: str, value: str, ttl: int | timedelta | None = None):
         result = await self.connection.hset(hash_key, field, value)  # type: ignore
         if ttl is not None:
@@ -135,26 +149,40 @@ class AsyncRedisClient:
 
         return result
 
-    @retry_if_failed
+    @_retry_if_failed
     async def get_hash_field(self, hash_key: str, field: str) -> bytes:
         return await self.connection.hget(hash_key, field)  # type: ignore
 
-    @retry_if_failed
+    @_retry_if_failed
+    async def set_hash_fields(self, hash_key: str, mapping: Mapping[str, str | bytes], ttl: int | None = None) -> int:
+        async with self.pipeline() as pipe:
+            await pipe.delete(hash_key)
+            await pipe.hset(hash_key, mapping=mapping)  # type: ignore[arg-type, misc]
+            if ttl is not None:
+                await pipe.expire(hash_key, ttl)
+            result = await pipe.execute()
+        return int(result[1])
+
+    @_retry_if_failed
+    async def get_hash_fields(self, hash_key: str, fields: Sequence[str]) -> list[bytes | None]:
+        return await self.connection.hmget(hash_key, fields)  # type: ignore
+
+    @_retry_if_failed
     async def get_all_hash_fields(self, hash_key: str) -> list[bytes]:
         return await self.connection.hgetall(hash_key)  # type: ignore
 
-    @retry_if_failed
+    @_retry_if_failed
     async def delete_key(self, key: str):
         return await self.connection.delete(key)  # type: ignore
 
-    @retry_if_failed
+    @_retry_if_failed
     async def exists(self, key_or_hash: str, field: str | None = None) -> int:
         if field is None:
             return await self.connection.exists(key_or_hash)  # type: ignore
         else:
             return await self.connection.hexists(key_or_hash, field)  # type: ignore
 
-    @retry_if_failed
+    @_retry_if_failed
     async def exists_many(self, keys: Sequence[str]) -> bool:
         if not isinstance(self.connection, aioredis.Redis):
             raise CacheConnectionNotEstablishedError(
@@ -163,6 +191,6 @@ class AsyncRedisClient:
         number_of_existing_keys: int = await self.connection.exists(*keys)
         return number_of_existing_keys == len(keys)
 
-    @retry_if_failed
+    @_retry_if_failed
     async def is_alive(self):
         return await self.connection.ping()
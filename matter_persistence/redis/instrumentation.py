@@ -0,0 +1,299 @@
+import contextlib
+import time
+from collections import defaultdict
+from collections.abc import Iterator
+from contextlib import AbstractContextManager
+from typing import Any, Literal
+
+from matter_persistence.instrumentation import DEFAULT_LATENCY_BUCKETS, Histogram
+
+CodecPhase = Literal["encode", "decode"]
+
+_NO_SPAN = contextlib.nullcontext()
+
+
+class CacheInstrumentation:
+    """
+    Hooks called by CacheManager and AsyncRedisClient around cache operations. This base class does nothing and is the
+    default, so that uninstrumented caches pay (almost) nothing; subclass it and override the hooks to collect
+    metrics or traces, see CacheMetrics and OpenTelemetryCacheInstrumentation.
+
+    Operations are the CacheManager methods (e.g. "get_with_key"), commands are the AsyncRedisClient methods
+    (e.g. "get_many_values"), whose duration is the time spent on the network and in Redis. Encoding and decoding
+    of values (serialisation, validation, compression) is timed separately.
+
+    Hooks are only called when enabled is True.
+    """
+
+    enabled: bool = False
+
+    def span(self, operation: str, object_class: type | None) -> AbstractContextManager:
+        """
+        Context manager wrapping a whole CacheManager operation.
+        """
+        return _NO_SPAN
+
+    def time_codec(self, operation: str, object_class: type | None, phase: CodecPhase) -> AbstractContextManager:
+        """
+        Context manager timing the encoding or decoding of values, reported with record_codec.
+        """
+        if not self.enabled:
+            return _NO_SPAN
+        return _CodecTimer(self, operation, object_class, phase)
+
+    def record_lookup(self, operation: str, object_class: type | None, hits: int, misses: int) -> None:
+        """
+        Called after reading from the cache, with the number of keys that were found and not found.
+        """
+
+    def record_bytes(self, operation: str, object_class: type | None, bytes_written: int, bytes_read: int) -> None:
+        """
+        Called with the size of the payloads sent to and received from Redis.
+        """
+
+    def record_compression(self, operation: str, object_class: type | None, raw_bytes: int, encoded_bytes: int) -> None:
+        """
+        Called after compressing a value, with its size before and after compression.
+        """
+
+    def record_codec(
+        self, operation: str, object_class: type | None, phase: CodecPhase, duration_in_seconds: float
+    ) -> None:
+        """
+        Called with the time spent encoding values before writing them, or decoding them after reading.
+        """
+
+    def record_command(self, command: str, duration_in_seconds: float, error: BaseException | None) -> None:
+        """
+        Called after every attempt of a Redis command, with the exception it raised, if any.
+        """
+
+    def record_retry(self, command: str, attempt: int, error: BaseException) -> None:
+        """
+        Called when a failed Redis command is going to be retried.
+        """
+
+
+class CacheMetrics(CacheInstrumentation):
+    """
+    Collects cache metrics in memory: hits and misses per object class, bytes written and read, compression ratio,
+    and latency histograms of encoding, decoding and Redis commands, plus retries and failures per command.
+
+    Usage example:
+        cache_metrics = CacheMetrics()
+        cache_manager = CacheManager(connection_pool=connection_pool, instrumentation=cache_metrics)
+        ...
+        cache_metrics.hit_ratio(UserDTO)
+        "\\n".join(cache_metrics.to_prometheus())
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.hits: dict[str, int] = defaultdict(int)
+        self.misses: dict[str, int] = defaultdict(int)
+        self.bytes_written: dict[str, int] = defaultdict(int)
+        self.bytes_read: dict[str, int] = defaultdict(int)
+        self.raw_bytes_compressed: dict[str, int] = defaultdict(int)
+        self.encoded_bytes_compressed: dict[str, int] = defaultdict(int)
+        self.encode_duration = Histogram(DEFAULT_LATENCY_BUCKETS)
+        self.decode_duration = Histogram(DEFAULT_LATENCY_BUCKETS)
+        self.command_duration: dict[str, Histogram] = defaultdict(lambda: Histogram(DEFAULT_LATENCY_BUCKETS))
+        self.command_errors: dict[str, int] = defaultdict(int)
+        self.retries: dict[str, int] = defaultdict(int)
+
+    def hit_ratio(self, object_class: type | None = None) -> float | None:
+        """
+        Ratio of lookups that were hits, for the given object class or overall.
+        """
+        if object_class is None:
+            hits, misses = sum(self.hits.values()), sum(self.misses.values())
+        else:
+            hits, misses = self.hits[object_class.__name__], self.misses[object_class.__name__]
+        if hits + misses == 0:
+            return None
+        return hits / (hits + misses)
+
+    def compression_ratio(self, object_class: type | None = None) -> float | None:
+        """
+        Ratio of compressed to raw bytes of the compressed values, for the given object class or overall.
+        """
+        if object_class is None:
+            raw, encoded = sum(self.raw_bytes_compressed.values()), sum(self.encoded_bytes_compressed.values())
+        else:
+            raw = self.raw_bytes_compressed[object_class.__name__]
+            encoded = self.encoded_bytes_compressed[object_class.__name__]
+        if raw == 0:
+            return None
+        return encoded / raw
+
+    def record_lookup(self, operation: str, object_class: type | None, hits: int, misses: int) -> None:
+        object_name = _get_object_name(object_class)
+        self.hits[object_name] += hits
+        self.misses[object_name] += misses
+
+    def record_bytes(self, operation: str, object_class: type | None, bytes_written: int, bytes_read: int) -> None:
+        object_name = _get_object_name(object_class)
+        self.bytes_written[object_name] += bytes_written
+        self.bytes_read[object_name] += bytes_read
+
+    def record_compression(self, operation: str, object_class: type | None, raw_bytes: int, encoded_bytes: int) -> None:
+        object_name = _get_object_name(object_class)
+        self.raw_bytes_compressed[object_name] += raw_bytes
+        self.encoded_bytes_compressed[object_name] += encoded_bytes
+
+    def record_codec(
+        self, operation: str, object_class: type | None, phase: CodecPhase, duration_in_seconds: float
+    ) -> None:
+        if phase == "encode":
+            self.encode_duration.observe(duration_in_seconds)
+        else:
+            self.decode_duration.observe(duration_in_seconds)
+
+    def record_command(self, command: str, duration_in_seconds: float, error: BaseException | None) -> None:
+        self.command_duration[command].observe(duration_in_seconds)
+        if error is not None:
+            self.command_errors[command] += 1
+
+    def record_retry(self, command: str, attempt: int, error: BaseException) -> None:
+        self.retries[command] += 1
+
+    def to_prometheus(self) -> list[str]:
+        """
+        All metrics as lines of the Prometheus text exposition format (without HELP/TYPE comments).
+        """
+        lines = [
+            *self.encode_duration.to_prometheus("cache_codec_duration_seconds", 'phase="encode"'),
+            *self.decode_duration.to_prometheus("cache_codec_duration_seconds", 'phase="decode"'),
+        ]
+        for metric, values in (
+            ("cache_hits_total", self.hits),
+            ("cache_misses_total", self.misses),
+            ("cache_written_bytes_total", self.bytes_written),
+            ("cache_read_bytes_total", self.bytes_read),
+            ("cache_compression_raw_bytes_total", self.raw_bytes_compressed),
+            ("cache_compression_encoded_bytes_total", self.encoded_bytes_compressed),
+        ):
+            lines.extend(f'{metric}{{object_class="{name}"}} {value}' for name, value in values.items())
+        for name, raw_bytes in self.raw_bytes_compressed.items():
+            if raw_bytes:
+                ratio = self.encoded_bytes_compressed[name] / raw_bytes
+                lines.append(f'cache_compression_ratio{{object_class="{name}"}} {ratio}')
+        for metric, values in (
+            ("cache_command_errors_total", self.command_errors),
+            ("cache_command_retries_total", self.retries),
+        ):
+            lines.extend(f'{metric}{{command="{name}"}} {value}' for name, value in values.items())
+        for command, histogram in self.command_duration.items():
+            lines.extend(histogram.to_prometheus("cache_command_duration_seconds", f'command="{command}"'))
+        return lines
+
+
+class OpenTelemetryCacheInstrumentation(CacheInstrumentation):
+    """
+    Reports cache operations as OpenTelemetry spans and metrics. The tracer and meter are passed in, so that
+    OpenTelemetry doesn't need to be a dependency of this package.
+
+    Arguments:
+        tracer: an opentelemetry.trace.Tracer, e.g. trace.get_tracer("matter_persistence")
+        meter: an opentelemetry.metrics.Meter, e.g. metrics.get_meter("matter_persistence")
+    """
+
+    enabled = True
+
+    def __init__(self, tracer: Any, meter: Any):
+        self._tracer = tracer
+        self._lookups = meter.create_counter("cache.lookups", description="Cache lookups by result")
+        self._bytes = meter.create_counter("cache.io", unit="By", description="Bytes written to and read from cache")
+        self._compression_ratio = meter.create_histogram(
+            "cache.compression.ratio", unit="1", description="Ratio of compressed to raw size of cached values"
+        )
+        self._codec_duration = meter.create_histogram(
+            "cache.codec.duration", unit="s", description="Encoding and decoding of cached values"
+        )
+        self._command_duration = meter.create_histogram(
+            "cache.command.duration", unit="s", description="Redis commands, including network time"
+        )
+        self._retries = meter.create_counter("cache.command.retries", description="Retried Redis commands")
+
+    @contextlib.contextmanager
+    def span(self, operation: str, object_class: type | None) -> Iterator[None]:
+        attributes = {
+            "db.system": "redis",
+            "db.operation": operation,
+            "cache.object_class": _get_object_name(object_class),
+        }
+        with self._tracer.start_as_current_span(f"cache.{operation}", attributes=attributes):
+            yield
+
+    def record_lookup(self, operation: str, object_class: type | None, hits: int, misses: int) -> None:
+        object_name = _get_object_name(object_class)
+        if hits:
+            self._lookups.add(hits, {"cache.object_class": object_name, "cache.result": "hit"})
+        if misses:
+            self._lookups.add(misses, {"cache.object_class": object_name, "cache.result": "miss"})
+
+    def record_bytes(self, operation: str, object_class: type | None, bytes_written: int, bytes_read: int) -> None:
+        object_name = _get_object_name(object_class)
+        if bytes_written:
+            self._bytes.add(bytes_written, {"cache.object_class": object_name, "cache.direction": "write"})
+        if bytes_read:
+            self._bytes.add(bytes_read, {"cache.object_class": object_name, "cache.direction": "read"})
+
+    def record_compression(self, operation: str, object_class: type | None, raw_bytes: int, encoded_bytes: int) -> None:
+        if raw_bytes:
+            self._compression_ratio.record(
+                encoded_bytes / raw_bytes, {"cache.object_class": _get_object_name(object_class)}
+            )
+
+    def record_codec(
+        self, operation: str, object_class: type | None, phase: CodecPhase, duration_in_seconds: float
+    ) -> None:
+        self._codec_duration.record(
+            duration_in_seconds, {"cache.object_class": _get_object_name(object_class), "cache.phase": phase}
+        )
+
+    def record_command(self, command: str, duration_in_seconds: float, error: BaseException | None) -> None:
+        attributes = {"db.operation": command}
+        if error is not None:
+            attributes["error.type"] = type(error).__name__
+        self._command_duration.record(duration_in_seconds, attributes)
+
+    def record_retry(self, command: str, attempt: int, error: BaseException) -> None:
+        self._retries.add(1, {"db.operation": command, "error.type": type(error).__name__})
+
+
+class _CodecTimer:
+    __slots__ = ("_instrumentation", "_operation", "_object_class", "_phase", "_start")
+
+    def __init__(
+        self, instrumentation: CacheInstrumentation, operation: str, object_class: type | None, phase: CodecPhase
+    ):
+        self._instrumentation = instrumentation
+        self._operation = operation
+        self._object_class = object_class
+        self._phase = phase
+
+    def __enter__(self) -> None:
+        self._start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self._instrumentation.record_codec(
+            self._operation, self._object_class, self._phase, time.perf_counter() - self._start
+        )
+
+
+def payload_size(value: Any) -> int:
+    """
+    Size of a value sent to or received from Redis (the sum of the sizes of a list of values); 0 for values that
+    aren't strings or bytes.
+    """
+    if isinstance(value, bytes | bytearray | memoryview | str):
+        return len(value)
+    if isinstance(value, list):
+        return sum(map(payload_size, value))
+    return 0
+
+
+def _get_object_name(object_class: type | None) -> str:
+    return object_class.__name__ if object_class is not None else "raw"
@@ -1,8 +1,12 @@
-from collections.abc import Sequence
+import inspect
+import pickle
+from collections.abc import Iterable, Sequence
+from functools import wraps
 from typing import Any
 from uuid import UUID
 
-from pydantic import TypeAdapter, ValidationError
+from pydantic import BaseModel, ValidationError
+from pydantic_core import from_json, to_json
 from redis import asyncio as aioredis
 
 from matter_persistence.redis.async_redis_client import AsyncRedisClient
@@ -12,7 +16,36 @@ from matter_persistence.redis.exceptions import (
     CacheRecordNotFoundError,
     CacheRecordNotSavedError,
 )
-from matter_persistence.redis.utils import compress_pickle_data, decompress_pickle_data, validate_connection_arguments
+from matter_persistence.redis.instrumentation import CacheInstrumentation, payload_size
+from matter_persistence.redis.utils import (
+    CompactModelList,
+    compress_data,
+    decompress_pickle_data,
+    dump_compact_model_list,
+    get_model_list_adapter,
+    get_partial_model,
+    is_compact_model_list,
+    load_compact_model_list,
+    validate_connection_arguments,
+)
+from matter_persistence.tenancy import get_organization_id
+
+
+def _instrumented(method):
+    """
+    Wraps a CacheManager method in a span of its instrumentation, named after the method.
+    """
+    signature = inspect.signature(method)
+
+    @wraps(method)
+    async def wrapper(self: "CacheManager", *args, **kwargs):
+        if not self.instrumentation.enabled:
+            return await method(self, *args, **kwargs)
+        object_class = signature.bind(self, *args, **kwargs).arguments.get("object_class")
+        with self.instrumentation.span(method.__name__, object_class):
+            return await method(self, *args, **kwargs)
+
+    return wrapper
 
 
 class CacheManager:
@@ -29,8 +62,17 @@ class CacheManager:
     - save_with_key: Saves a value to the cache with an optional expiration time using a key.
     - get_with_key: Retrieves a value from the cache using a key.
     - delete_with_key: Deletes a value from the cache using a key.
+    - save_as_hash_with_key: Saves an object to the cache as a hash with one field per attribute, using a key.
+    - get_partial_with_key: Retrieves only some fields of an object from the cache using a key.
     - is_cache_alive: Checks if the cache client is alive.
 
+    An optional CacheInstrumentation (e.g. CacheMetrics) records hits and misses per object class, payload sizes,
+    encoding/decoding time and the duration, failures and retries of Redis commands.
+
+    With organization_namespaces, the keys of the *_with_key(s) methods (unless use_key_as_is) are prefixed with the
+    organization of the context (see matter_persistence.tenancy), like the keys of the organization_id methods, so
+    that every organization gets its own namespace without passing the organization along.
+
     Usage example:
         Check examples/redis.ipynb for usage examples.
     """
@@ -41,12 +83,16 @@ class CacheManager:
         connection_pool: aioredis.ConnectionPool | None = None,
         sentinel: aioredis.Sentinel | None = None,
         sentinel_service_name: str | None = None,
+        instrumentation: CacheInstrumentation | None = None,
+        organization_namespaces: bool = False,
     ):
         validate_connection_arguments(connection, connection_pool, sentinel)
         self.__connection = connection
         self.__connection_pool = connection_pool
         self.__sentinel = sentinel
         self.__sentinel_service_name = sentinel_service_name
+        self.instrumentation = instrumentation or CacheInstrumentation()
+        self.organization_namespaces = organization_namespaces
 
     def __get_cache_client(self, for_writing: bool = False) -> AsyncRedisClient:
         return AsyncRedisClient(
@@ -55,6 +101,7 @@ class CacheManager:
             sentinel=self.__sentinel,
             sentinel_service_name=self.__sentinel_service_name,
             for_writing=for_writing,
+            instrumentation=self.instrumentation,
         )
 
     async def close_connection_pool(self) -> None:
@@ -72,6 +119,7 @@ class CacheManager:
             for sentinel_connection in self.__sentinel.sentinels:
                 await sentinel_connection.aclose()
 
+    @_instrumented
     async def save_value(
         self,
         organization_id: UUID,
@@ -90,15 +138,21 @@ class CacheManager:
             object_class=object_class,
             expiration_in_seconds=expiration_in_seconds,
         )
+        with self.instrumentation.time_codec("save_value", object_class, "encode"):
+            pickled_cache_record = pickle.dumps(cache_record)
+            compressed_pickled_cache_record = compress_data(pickled_cache_record)
+        self._record_written("save_value", object_class, [compressed_pickled_cache_record])
+        self._record_compressed("save_value", object_class, pickled_cache_record, compressed_pickled_cache_record)
+
         async with self.__get_cache_client(for_writing=True) as cache_client:
             if expiration_in_seconds:
                 result = await cache_client.set_value(
                     cache_record.hash_key,
-                    compress_pickle_data(cache_record),
+                    compressed_pickled_cache_record,
                     ttl=expiration_in_seconds,
                 )
             else:
-                result = await cache_client.set_value(cache_record.hash_key, compress_pickle_data(cache_record))
+                result = await cache_client.set_value(cache_record.hash_key, compressed_pickled_cache_record)
 
         if not result:
             raise CacheRecordNotSavedError(
@@ -106,6 +160,7 @@ class CacheManager:
                 detail=cache_record,
             )
 
+    @_instrumented
     async def get_value(
         self,
         organization_id: UUID,
@@ -122,6 +177,7 @@ class CacheManager:
         )
         async with self.__get_cache_client(for_writing=False) as cache_client:
             compressed_pickled_cache_record = await cache_client.get_value(key)
+        self._record_read("get_value", object_class, [compressed_pickled_cache_record])
 
         if not compressed_pickled_cache_record:
             raise CacheRecordNotFoundError(
@@ -129,8 +185,10 @@ class CacheManager:
                 detail=compressed_pickled_cache_record,
             )
 
-        return decompress_pickle_data(compressed_pickled_cache_record)
+        with self.instrumentation.time_codec("get_value", object_class, "decode"):
+            return decompress_pickle_data(compressed_pickled_cache_record)
 
+    @_instrumented
     async def delete_value(
         self,
         organization_id: UUID,
@@ -153,6 +211,7 @@ class CacheManager:
                     detail={"key": key},
                 )
 
+    @_instrumented
     async def cache_record_exists(
         self,
         organization_id: UUID,
@@ -170,6 +229,7 @@ class CacheManager:
         async with self.__get_cache_client(for_writing=False) as cache_client:
             return bool(await cache_client.exists(key))  # cache_client.exists() returns 0 or 1
 
+    @_instrumented
     async def save_with_key(
         self,
         key: str,
@@ -180,7 +240,9 @@ class CacheManager:
     ):
         hash_key = self._get_key_from_params(key=key, object_class=object_class, use_key_as_is=use_key_as_is)
         if object_class:
-            value = value.model_dump_json()
+            with self.instrumentation.time_codec("save_with_key", object_class, "encode"):
+                value = value.model_dump_json()
+        self._record_written("save_with_key", object_class, [value])
 
         async with self.__get_cache_client(for_writing=True) as cache_client:
             if expiration_in_seconds:
@@ -196,12 +258,14 @@ class CacheManager:
 
         return result
 
+    @_instrumented
     async def save_many_with_keys(
         self,
         values_to_store: dict[str, Any],
         object_class: type[Model] | None = None,
         expiration_in_seconds: int | None = None,
         use_key_as_is: bool = False,
+        compact_lists: bool = False,
     ) -> None:
         """
         Saves many given keys with values.
@@ -213,43 +277,29 @@ class CacheManager:
         :param object_class: optional model to facilitate serialisation of data
         :param expiration_in_seconds: cache expiration time in seconds
         :param use_key_as_is: whether to use key as is
+        :param compact_lists: whether to store sequences in the compact encoding, where field names are stored only
+            once instead of once per object, which makes lists smaller and faster to read back (see
+            dump_compact_model_list); get_many_with_keys and get_with_key recognise both encodings
         """
-        object_name = object_class.__name__ if object_class else None
-
-        if object_class is not None:
-            processed_input = {}
-            for key, value in values_to_store.items():
-                if use_key_as_is:
-                    processed_key = key
-                else:
-                    processed_key = CacheHelper.create_basic_hash_key(key, object_name)
-                if isinstance(value, Sequence):
-                    adapter = TypeAdapter(list[object_class])  # type: ignore[valid-type]
-                    if not isinstance(value, list):
-                        pre_processed_value = [v for v in value]
-                    else:
-                        pre_processed_value = value
-                    processed_value = adapter.dump_json(pre_processed_value)
-                else:
-                    processed_value = value.model_dump_json()
-                processed_input[processed_key] = processed_value
-        else:
-            if use_key_as_is:
-                processed_input = {
-                    key: value for key, value in values_to_store.items()
-                }
-            else:
-                processed_input = {
-                    CacheHelper.create_basic_hash_key(key, object_name): value for key, value in values_to_store.items()
-                }
+        with self.instrumentation.time_codec("save_many_with_keys", object_class, "encode"):
+            processed_input = self._encode_values_to_store(values_to_store, object_class, use_key_as_is, compact_lists)
+        self._record_written("save_many_with_keys", object_class, processed_input.values())
 
         async with self.__get_cache_client(for_writing=True) as cache_client:
             await cache_client.set_many_values(processed_input, ttl=expiration_in_seconds)
 
-    async def get_with_key(self, key: str, object_class: type[Model] | None = None, use_key_as_is: bool = False) -> Any:
+    @_instrumented
+    async def get_with_key(
+        self,
+        key: str,
+        object_class: type[Model] | None = None,
+        use_key_as_is: bool = False,
+        lazy: bool = False,
+    ) -> Any:
         hash_key = self._get_key_from_params(key=key, object_class=object_class, use_key_as_is=use_key_as_is)
         async with self.__get_cache_client(for_writing=False) as cache_client:
             value = await cache_client.get_value(hash_key)
+        self._record_read("get_with_key", object_class, [value])
         if not value:
             raise CacheRecordNotFoundError(
                 description=f"Unable to retrieve value from cache. Key: {key}",
@@ -257,16 +307,105 @@ class CacheManager:
             )
 
         if object_class:
-            if isinstance(value, list):
-                value = [object_class.model_validate_json(item) for item in value]
-            else:
-                value = object_class.model_validate_json(value)
+            with self.instrumentation.time_codec("get_with_key", object_class, "decode"):
+                if isinstance(value, list):
+                    value = [object_class.model_validate_json(item) for item in value]
+                elif is_compact_model_list(value):
+                    value = load_compact_model_list(object_class, value, lazy=lazy)
+                else:
+                    value = object_class.model_validate_json(value)
 
         return value
 
+    @_instrumented
+    async def save_as_hash_with_key(
+        self,
+        key: str,
+        value: Model,
+        object_class: type[Model],
+        expiration_in_seconds: int | None = None,
+        use_key_as_is: bool = False,
+    ) -> None:
+        """
+        Saves an object as a Redis hash, with every field of object_class stored (as JSON) in a hash field of its own.
+
+        Values saved like this can't be read with get_with_key, but get_partial_with_key(..., from_hash=True) reads only
+        the requested fields from Redis.
+
+        :param key: key of the object
+        :param value: the object to store
+        :param object_class: model of the object
+        :param expiration_in_seconds: cache expiration time in seconds
+        :param use_key_as_is: whether to use key as is
+        """
+        hash_key = self._get_key_from_params(key=key, object_class=object_class, use_key_as_is=use_key_as_is)
+        with self.instrumentation.time_codec("save_as_hash_with_key", object_class, "encode"):
+            mapping = {field: to_json(field_value) for field, field_value in value.model_dump(mode="json").items()}
+        self._record_written("save_as_hash_with_key", object_class, mapping.values())
+
+        async with self.__get_cache_client(for_writing=True) as cache_client:
+            await cache_client.set_hash_fields(hash_key, mapping, ttl=expiration_in_seconds)
+
+    @_instrumented
+    async def get_partial_with_key(
+        self,
+        key: str,
+        object_class: type[Model],
+        fields: Sequence[str],
+        use_key_as_is: bool = False,
+        from_hash: bool = False,
+    ) -> BaseModel:
+        """
+        Gets only the given fields of a cached object.
+
+        The object is returned as an instance of a partial model of object_class, which has only the requested fields.
+        Partial models are generated once per object_class and set of fields.
+
+        :param key: key of the object
+        :param object_class: model the object was stored with
+        :param fields: names of the fields to get
+        :param use_key_as_is: whether to use key as is
+        :param from_hash: whether the object was stored with save_as_hash_with_key, in which case only the requested
+            fields are fetched from Redis (HMGET); otherwise the stored JSON is fetched and only the requested
+            fields are validated
+        :return: an instance of the partial model
+        """
+        hash_key = self._get_key_from_params(key=key, object_class=object_class, use_key_as_is=use_key_as_is)
+        partial_model = get_partial_model(object_class, tuple(fields))
+
+        async with self.__get_cache_client(for_writing=False) as cache_client:
+            if from_hash:
+                field_values = await cache_client.get_hash_fields(hash_key, fields)
+                value: list[bytes] | bytes = [field_value for field_value in field_values if field_value is not None]
+            else:
+                value = await cache_client.get_value(hash_key)
+        self._record_read("get_partial_with_key", object_class, [value])
+
+        if not value:
+            raise CacheRecordNotFoundError(
+                description=f"Unable to retrieve value from cache. Key: {key}",
+                detail={"key": key, "hash_key": hash_key},
+            )
+
+        with self.instrumentation.time_codec("get_partial_with_key", object_class, "decode"):
+            if isinstance(value, list):
+                return partial_model.model_validate(
+                    {
+                        field: from_json(field_value)
+                        for field, field_value in zip(fields, field_values, strict=True)
+                        if field_value is not None
+                    }
+                )
+            return partial_model.model_validate_json(value)
+
+    @_instrumented
     async def get_many_with_keys(
-        self, keys: Sequence[str], object_class: type[Model] | None = None, use_key_as_is: bool = False
-    ) -> dict[str, bytes | Model | list[Model] | None]:
+        self,
+        keys: Sequence[str],
+        object_class: type[Model] | None = None,
+        use_key_as_is: bool = False,
+        lazy: bool = False,
+    ) -> dict[str, bytes | Model | list[Model] | CompactModelList[Model] | None]:
         """
         Gets multiple values from the cache.
 
@@ -281,32 +420,39 @@ class CacheManager:
         :param keys: which keys to get from the cache
         :param object_class: used in deserialisation of cached values
         :param use_key_as_is: whether to use key as is
+        :param lazy: whether lists stored in the compact encoding are returned as a CompactModelList, which builds
+            each object only when it's accessed; this only pays off when few of the objects are accessed, as
+            building all of them one at a time is slower than loading the list at once
         :return: a dictionary, mapping the original set of keys to the corresponding values from the cache
         """
         object_name = object_class.__name__ if object_class else None
-        return_set: dict[str, bytes | Model | list[Model] | None] = {}
+        return_set: dict[str, bytes | Model | list[Model] | CompactModelList[Model] | None] = {}
         if use_key_as_is:
             keys_map = {key: key for key in keys}
         else:
-            keys_map = {CacheHelper.create_basic_hash_key(original_key, object_name): original_key for original_key in
-                        keys}
+            keys_map = {self._get_hash_key(original_key, object_name): original_key for original_key in keys}
 
         async with self.__get_cache_client(for_writing=False) as cache_client:
             response: dict[str, bytes] = await cache_client.get_many_values(keys_map)
-            if object_class:
+        self._record_read("get_many_with_keys", object_class, response.values())
+
+        if object_class:
+            with self.instrumentation.time_codec("get_many_with_keys", object_class, "decode"):
                 for key, value in response.items():
-                    if value is not None:
+                    if value is None:
+                        return_set[keys_map[key]] = value
+                    elif is_compact_model_list(value):
+                        return_set[keys_map[key]] = load_compact_model_list(object_class, value, lazy=lazy)
+                    else:
                         try:
                             return_set[keys_map[key]] = object_class.model_validate_json(value)
                         except ValidationError:
-                            adapter = TypeAdapter(list[object_class])  # type: ignore[valid-type]
-                            return_set[keys_map[key]] = adapter.validate_json(value)
-                    else:
-                        return_set[keys_map[key]] = value
-            else:
-                return_set = {keys_map[key]: value for key, value in response.items()}
+                            return_set[keys_map[key]] = get_model_list_adapter(object_class).validate_json(value)
+        else:
+            return_set = {keys_map[key]: value for key, value in response.items()}
         return return_set
 
+    @_instrumented
     async def delete_with_key(
         self,
         key: str,
@@ -321,6 +467,7 @@ class CacheManager:
                     detail={"key": key, "hash_key": hash_key},
                 )
 
+    @_instrumented
     async def cache_record_with_key_exists(
         self,
         key: str,
@@ -331,6 +478,7 @@ class CacheManager:
         async with self.__get_cache_client(for_writing=False) as cache_client:
             return bool(await cache_client.exists(hash_key))  # cache_client.exists() returns 0 or 1
 
+    @_instrumented
     async def is_cache_alive(self):
         """
         Checks if the cache client is alive.
@@ -338,10 +486,77 @@ class CacheManager:
         async with self.__get_cache_client(for_writing=False) as cache_client:
             return await cache_client.is_alive()
 
-    @staticmethod
-    def _get_key_from_params(key: str, object_class: type[Model] | None = None, use_key_as_is: bool = False) -> str:
+    def _get_key_from_params(
+        self, key: str, object_class: type[Model] | None = None, use_key_as_is: bool = False
+    ) -> str:
         if use_key_as_is:
             return key
         else:
             object_name = object_class.__name__ if object_class else None
-            return CacheHelper.create_basic_hash_key(key, object_name)
+            return self._get_hash_key(key, object_name)
+
+    def _get_hash_key(self, key: str, object_name: str | None) -> str:
+        hash_key = CacheHelper.create_basic_hash_key(key, object_name)
+        organization_id = get_organization_id() if self.organization_namespaces else None
+        return hash_key if organization_id is None else f"{organization_id}_{hash_key}"
+
+    def _encode_values_to_store(
+        self,
+        values_to_store: dict[str, Any],
+        object_class: type[Model] | None,
+        use_key_as_is: bool,
+        compact_lists: bool,
+    ) -> dict[str, Any]:
+        object_name = object_class.__name__ if object_class else None
+
+        if object_class is not None:
+            processed_input = {}
+            for key, value in values_to_store.items():
+                if use_key_as_is:
+                    processed_key = key
+                else:
+                    processed_key = self._get_hash_key(key, object_name)
+                if isinstance(value, Sequence):
+                    if not isinstance(value, list):
+                        pre_processed_value = [v for v in value]
+                    else:
+                        pre_processed_value = value
+                    if compact_lists:
+                        processed_value = dump_compact_model_list(object_class, pre_processed_value)
+                    else:
+                        processed_value = get_model_list_adapter(object_class).dump_json(pre_processed_value)
+                else:
+                    processed_value = value.model_dump_json()
+                processed_input[processed_key] = processed_value
+        else:
+            if use_key_as_is:
+                processed_input = {
+                    key: value for key, value in values_to_store.items()
+                }
+            else:
+                processed_input = {
+                    self._get_hash_key(key, object_name): value for key, value in values_to_store.items()
+                }
+        return processed_input
+
+    def _record_written(self, operation: str, object_class: type[Model] | None, values: Iterable[Any]) -> None:
+        if self.instrumentation.enabled:
+            self.instrumentation.record_bytes(operation, object_class, sum(map(payload_size, values)), 0)
+
+    def _record_compressed(
+        self, operation: str, object_class: type[Model] | None, raw_value: bytes, encoded_value: bytes
+    ) -> None:
+        if self.instrumentation.enabled:
+            self.instrumentation.record_compression(operation, object_class, len(raw_value), len(encoded_value))
+
+    def _record_read(self, operation: str, object_class: type[Model] | None, values: Iterable[Any]) -> None:
+        if self.instrumentation.enabled:
+            hits = misses = bytes_read = 0
+            for value in values:
+                if value:
+                    hits += 1
+                    bytes_read += payload_size(value)
+                else:
+                    misses += 1
+            self.instrumentation.record_lookup(operation, object_class, hits, misses)
+            self.instrumentation.record_bytes(operation, object_class, 0, bytes_read)
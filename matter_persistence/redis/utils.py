@@ -1,11 +1,25 @@
 import gzip
 import itertools
 import pickle
+from collections.abc import Iterator, Sequence
 from functools import lru_cache
-from typing import Any
+from typing import Any, Generic, overload
 
+from pydantic import BaseModel, ConfigDict, TypeAdapter, create_model
+from pydantic_core import SchemaValidator, from_json, to_json
+from pydantic_core import core_schema as cs
 from redis import asyncio as aioredis
 
+from matter_persistence.redis.base import Model
+
+# every compact list payload starts with this prefix, which allows telling it apart from JSON (of a model or a list of
+# models), as JSON documents can't start with a NUL byte
+COMPACT_MODEL_LIST_PREFIX = b"\x00compact:"
+
+# the values of every row of a compact list are wrapped in an object under this key, as pydantic-core can only map
+# the items of an array to fields through an alias path that starts with a key
+_COMPACT_ROW_KEY = "v"
+
 
 @lru_cache(maxsize=1)
 def get_connection_pool(
@@ -59,7 +73,11 @@ async def get_sentinel(
 
 def compress_pickle_data(data: Any) -> bytes:
     pickled_data = pickle.dumps(data)  # Serialize the data into bytes using pickle
-    compressed_data = gzip.compress(pickled_data)  # Compress the pickled data using gzip
+    return compress_data(pickled_data)
+
+
+def compress_data(data: bytes) -> bytes:
+    compressed_data = gzip.compress(data)  # Compress the data using gzip
     return compressed_data
 
 
@@ -69,6 +87,163 @@ def decompress_pickle_data(compressed_data: bytes) -> Any:
     return data
 
 
+@lru_cache(maxsize=128)
+def get_model_list_adapter(object_class: type[Model]) -> TypeAdapter[list[Model]]:
+    """
+    Gets a (cached) TypeAdapter for lists of the given model, as building one is expensive.
+    """
+    return TypeAdapter(list[object_class])  # type: ignore[valid-type]
+
+
+def _get_compact_row_schema(object_class: type[Model], columns: tuple[str, ...]) -> cs.CoreSchema:
+    # maps the values of a row to the columns by position, then validates them with the schema of the model
+    fields = {}
+    for index, column in enumerate(columns):
+        alias_path: list[str | int] = [_COMPACT_ROW_KEY, index]
+        fields[column] = cs.typed_dict_field(cs.any_schema(), required=False, validation_alias=alias_path)
+    values_schema = cs.typed_dict_schema(fields)
+    return cs.chain_schema([values_schema, object_class.__pydantic_core_schema__])
+
+
+@lru_cache(maxsize=128)
+def _get_compact_list_validator(object_class: type[Model], columns: tuple[str, ...]) -> SchemaValidator:
+    return SchemaValidator(cs.list_schema(_get_compact_row_schema(object_class, columns)))
+
+
+@lru_cache(maxsize=128)
+def _get_compact_row_validator(object_class: type[Model], columns: tuple[str, ...]) -> SchemaValidator:
+    return SchemaValidator(_get_compact_row_schema(object_class, columns))
+
+
+class CompactModelList(Sequence[Model], Generic[Model]):  # noqa: UP046
+    """
+    Read-only sequence over the rows of a compact model list, that builds the models only when accessed.
+
+    Built models are kept, so accessing the same index twice validates the row only once. Validating rows one at a
+    time is slower than validating the whole list at once, so this only pays off when few of the rows are accessed,
+    e.g. the first page of a long list; code that iterates over all rows should load the list eagerly.
+    """
+
+    def __init__(self, object_class: type[Model], columns: Sequence[str], rows: list[dict[str, list[Any]]]):
+        self._object_class = object_class
+        self._validator = _get_compact_row_validator(object_class, tuple(columns))
+        self._rows = rows
+        self._models: list[Model | None] = [None] * len(rows)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @overload
+    def __getitem__(self, index: int) -> Model: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[Model]: ...
+
+    def __getitem__(self, index: int | slice) -> Model | list[Model]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        model = self._models[index]
+        if model is None:
+            model = self._validator.validate_python(self._rows[index])
+            self._models[index] = model
+        return model
+
+    def __iter__(self) -> Iterator[Model]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, Sequence) and not isinstance(other, str | bytes):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other, strict=True))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self._object_class.__name__}, rows={len(self)})"
+
+
+def dump_compact_model_list(object_class: type[Model], values: Sequence[Model]) -> bytes:
+    """
+    Serialises a list of models into a compact encoding: COMPACT_MODEL_LIST_PREFIX, a JSON array of the field names,
+    a newline and a JSON array with the values of every model, e.g. ["a","b"]\n[{"v":[1,"x"]},{"v":[2,"y"]}].
+    Field names are stored only once, which makes the encoding about a quarter smaller than a JSON list of models.
+
+    Args:
+        object_class (type[Model]): the model all values are serialised as
+        values (Sequence[Model]): the models to serialise
+
+    Returns:
+        compact_data (bytes): the compact encoding
+    """
+    dumped = get_model_list_adapter(object_class).dump_python(list(values), mode="json")
+    columns = list(dumped[0]) if dumped else list(object_class.model_fields)
+    rows = [{_COMPACT_ROW_KEY: list(item.values())} for item in dumped]
+    # compact JSON has no newlines (newlines in strings are escaped), so the first one ends the field names
+    return COMPACT_MODEL_LIST_PREFIX + to_json(columns) + b"\n" + to_json(rows)
+
+
+def load_compact_model_list(
+    object_class: type[Model], data: bytes | str, lazy: bool = False
+) -> list[Model] | CompactModelList[Model]:
+    """
+    Deserialises a compact encoding created by dump_compact_model_list.
+
+    The rows are parsed and validated by position in a single pass of pydantic-core, without building a dictionary
+    per row in Python.
+
+    Args:
+        object_class (type[Model]): the model the rows are validated into
+        data (bytes | str): the compact encoding
+        lazy (bool): if True, returns a CompactModelList that validates each row only when it's accessed, which only
+            pays off when few of the rows are accessed
+
+    Returns:
+        values (list[Model] | CompactModelList[Model]): the deserialised models
+    """
+    if isinstance(data, str):
+        data = data.encode()
+    header, _, body = data[len(COMPACT_MODEL_LIST_PREFIX) :].partition(b"\n")
+    columns = tuple(from_json(header))
+    if lazy:
+        return CompactModelList(object_class, columns, from_json(body))
+    values: list[Model] = _get_compact_list_validator(object_class, columns).validate_json(body)
+    return values
+
+
+def is_compact_model_list(data: bytes | str) -> bool:
+    if isinstance(data, str):
+        return data.startswith(COMPACT_MODEL_LIST_PREFIX.decode())
+    return data.startswith(COMPACT_MODEL_LIST_PREFIX)
+
+
+@lru_cache(maxsize=256)
+def get_partial_model(object_class: type[Model], fields: tuple[str, ...]) -> type[BaseModel]:
+    """
+    Gets a (cached) model containing only the given fields of object_class, e.g. for reading a projection of a
+    cached value. The fields keep their type, default and alias, and can be populated by name as well as by alias;
+    any other field present in the data is ignored without being validated.
+
+    Args:
+        object_class (type[Model]): the model to project
+        fields (tuple[str, ...]): names of the fields of object_class to keep
+
+    Returns:
+        partial_model (type[BaseModel]): a model named like "<object_class>Partial"
+    """
+    unknown_fields = set(fields) - set(object_class.model_fields)
+    if unknown_fields:
+        raise ValueError(f"{object_class.__name__} has no fields named: {', '.join(sorted(unknown_fields))}")
+
+    # cached values are dumped by field name, whatever the aliases of object_class
+    config = ConfigDict(**{**object_class.model_config, "extra": "ignore", "populate_by_name": True})  # type: ignore[typeddict-item]
+    partial_model: type[BaseModel] = create_model(  # type: ignore[call-overload]
+        f"{object_class.__name__}Partial",
+        __config__=config,
+        **{name: (object_class.model_fields[name].annotation, object_class.model_fields[name]) for name in fields},
+    )
+    return partial_model
+
+
 def validate_connection_arguments(*args: Any | None) -> None:
     if any(all(item is not None for item in combination) for combination in itertools.combinations(args, 2)) or all(
         item is None for item in args
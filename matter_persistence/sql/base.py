@@ -55,6 +55,43 @@ def timestamp_before_update(mapper, connection, target):
     target.updated = datetime.now(tz=timezone.utc)  # noqa: UP017
 
 
+# rows that aren't soft deleted, which find and get query unless with_deleted is given
+ACTIVE_ROWS_PREDICATE = "deleted IS NULL"
+
+
+def active_index(*columns: str, name: str | None = None, unique: bool = False, **kwargs) -> sa.Index:
+    """
+    A partial index of the given columns of a CustomBase model, with only the rows that aren't soft deleted
+    (WHERE deleted IS NULL, on PostgreSQL and SQLite). It's smaller than a full index, doesn't grow with the deleted
+    rows and, if unique, allows deleted rows to repeat the values of active ones.
+
+    The index is named ix_<table>_<columns>_active, unless a name is given.
+
+    Usage example:
+        class NumberORM(CustomBase):
+            __tablename__ = "numbers"
+            __table_args__ = (active_index("organization_id", "number"),)
+    """
+    where = sa.text(ACTIVE_ROWS_PREDICATE)
+    index = sa.Index(name, *columns, unique=unique, postgresql_where=where, sqlite_where=where, **kwargs)
+    if name is None:
+
+        @sa.event.listens_for(index, "after_parent_attach")
+        def set_name(index: sa.Index, table: sa.Table) -> None:
+            index.name = sa.quoted_name(f"ix_{table.name}_{'_'.join(columns)}_active", None)
+
+    return index
+
+
+def is_active_index(index: sa.Index) -> bool:
+    """
+    Whether index only has the rows that aren't soft deleted, e.g. one created with active_index.
+    """
+    return any(
+        str(index.dialect_options[dialect]["where"]) == ACTIVE_ROWS_PREDICATE for dialect in ("postgresql", "sqlite")
+    )
+
+
 class CustomBase(Base, Timestamp):
     """
     Custom Base class with id, created, updated, and deleted fields.
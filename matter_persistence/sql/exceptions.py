@@ -19,3 +19,15 @@ class DatabaseRecordNotFoundError(DetailedException):
 
 class DatabaseInvalidSortFieldError(DetailedException):
     TOPIC = "Database Invalid Sort Field Error"
+
+
+class DatabaseInvalidCursorError(DetailedException):
+    TOPIC = "Database Invalid Cursor Error"
+
+
+class DatabaseInvalidLoadFieldError(DetailedException):
+    TOPIC = "Database Invalid Load Field Error"
+
+
+class DatabaseOrganizationMismatchError(DetailedException):
+    TOPIC = "Database Organization Mismatch Error"
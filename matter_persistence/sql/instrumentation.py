@@ -0,0 +1,348 @@
+import contextlib
+import logging
+import math
+import random
+import re
+import time
+from collections.abc import Callable, Iterable, Iterator
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any
+
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from matter_persistence.instrumentation import DEFAULT_LATENCY_BUCKETS, Histogram
+
+logger = logging.getLogger(__name__)
+
+# number of executions per statement fingerprint in the current session, see track_session_queries
+_session_query_counts: ContextVar[dict[str, int] | None] = ContextVar("session_query_counts", default=None)
+
+# attribute of the ExecutionContext of a statement that holds when it started, see QueryMetrics
+_QUERY_START = "_matter_query_start"
+
+# attribute of a pool that holds the callbacks of its checkout wait, see _listen_for_checkout_wait
+_CHECKOUT_WAIT_CALLBACKS = "_matter_checkout_wait_callbacks"
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAMETER = re.compile(r"\$\d+|%\(\w+\)s|%s|:\w+|\?")
+_PARAMETER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+# in seconds
+DEFAULT_LIFETIME_BUCKETS = (1.0, 10.0, 60.0, 300.0, 900.0, 1800.0, 3600.0, 7200.0, 14400.0, 28800.0, 86400.0)
+
+
+class PoolMetrics:
+    """
+    Measures the usage of the connection pool of an engine, using SQLAlchemy pool events.
+
+    Recorded metrics:
+    - checkout_wait: seconds spent waiting for a connection from the pool (histogram)
+    - checkout_duration: seconds a connection was checked out before being returned (histogram)
+    - connection_lifetime: seconds between opening and closing a connection (histogram)
+    - connects, checkouts and invalidations: counters
+    - peak_checked_out: the highest number of simultaneously checked out connections
+    - gauges(): the current pool size, checked in (idle), checked out (in use) and overflow connections
+
+    The checkout wait is measured by wrapping the pool's connection getter, as there's no event for the start of a
+    checkout (see _listen_for_checkout_wait); it's not measured anymore after the engine is disposed and recreates
+    its pool.
+
+    Arguments:
+        engine (AsyncEngine): the engine to instrument
+        name (str): name of the engine in the exported metrics
+    """
+
+    def __init__(self, engine: AsyncEngine, name: str = "writer"):
+        self.name = name
+        self.checkout_wait = Histogram(DEFAULT_LATENCY_BUCKETS)
+        self.checkout_duration = Histogram(DEFAULT_LATENCY_BUCKETS)
+        self.connection_lifetime = Histogram(DEFAULT_LIFETIME_BUCKETS)
+        self.connects = 0
+        self.checkouts = 0
+        self.invalidations = 0
+        self.checked_out = 0
+        self.peak_checked_out = 0
+
+        self._pool = engine.sync_engine.pool
+        sa.event.listen(self._pool, "connect", self._on_connect)
+        sa.event.listen(self._pool, "checkout", self._on_checkout)
+        sa.event.listen(self._pool, "checkin", self._on_checkin)
+        sa.event.listen(self._pool, "invalidate", self._on_invalidate)
+        sa.event.listen(self._pool, "close", self._on_close)
+        _listen_for_checkout_wait(self._pool, self.checkout_wait.observe)
+
+    def gauges(self) -> dict[str, int]:
+        # only queue pools keep these numbers, e.g. NullPool doesn't
+        return {
+            gauge: getattr(self._pool, gauge)()
+            for gauge in ("size", "checkedin", "checkedout", "overflow")
+            if hasattr(self._pool, gauge)
+        }
+
+    def snapshot(self) -> dict[str, Any]:
+        """
+        All metrics as a dictionary, e.g. to be passed to a metrics callback or logged.
+        """
+        return {
+            "engine": self.name,
+            "checkout_wait": self.checkout_wait.snapshot(),
+            "checkout_duration": self.checkout_duration.snapshot(),
+            "connection_lifetime": self.connection_lifetime.snapshot(),
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "invalidations": self.invalidations,
+            "peak_checked_out": self.peak_checked_out,
+            "gauges": self.gauges(),
+        }
+
+    def to_prometheus(self) -> list[str]:
+        """
+        All metrics as lines of the Prometheus text exposition format (without HELP/TYPE comments).
+        """
+        labels = f'engine="{self.name}"'
+        lines = [
+            *self.checkout_wait.to_prometheus("db_pool_checkout_wait_seconds", labels),
+            *self.checkout_duration.to_prometheus("db_pool_checkout_duration_seconds", labels),
+            *self.connection_lifetime.to_prometheus("db_pool_connection_lifetime_seconds", labels),
+            f"db_pool_connects_total{{{labels}}} {self.connects}",
+            f"db_pool_checkouts_total{{{labels}}} {self.checkouts}",
+            f"db_pool_invalidations_total{{{labels}}} {self.invalidations}",
+            f"db_pool_peak_checked_out{{{labels}}} {self.peak_checked_out}",
+        ]
+        lines.extend(f"db_pool_{gauge}{{{labels}}} {value}" for gauge, value in self.gauges().items())
+        return lines
+
+    def recommend_settings(
+        self, server_idle_timeout_in_seconds: float | None = None, max_checkout_wait_in_seconds: float = 0.01
+    ) -> dict[str, Any]:
+        """
+        Recommends create_async_engine arguments (to be passed as engine_kwargs) based on the measured data:
+
+        - pool_size: if the 95th percentile of the checkout wait is above max_checkout_wait_in_seconds (requests are
+          queueing for connections), the number of connections that would have been used without waiting: the peak of
+          checked out connections, scaled by how long connections were waited for relative to how long they're held
+        - pool_pre_ping: whether connections were found to be broken, so checking them before use pays off
+        - pool_recycle: 90% of the server's idle timeout, so connections are replaced before the server drops them
+
+        Arguments:
+            server_idle_timeout_in_seconds (float | None): the server (or proxy) timeout for idle connections
+            max_checkout_wait_in_seconds (float): the acceptable 95th percentile of the checkout wait
+        """
+        recommendations: dict[str, Any] = {"pool_pre_ping": self.invalidations > 0}
+
+        checkout_wait_p95 = self.checkout_wait.quantile(0.95)
+        if (
+            checkout_wait_p95 is not None
+            and checkout_wait_p95 > max_checkout_wait_in_seconds
+            and self.checkout_duration.sum > 0
+        ):
+            mean_checkout_wait = self.checkout_wait.sum / self.checkout_wait.count
+            mean_checkout_duration = self.checkout_duration.sum / self.checkout_duration.count
+            recommendations["pool_size"] = math.ceil(
+                self.peak_checked_out * (1 + mean_checkout_wait / mean_checkout_duration)
+            )
+
+        if server_idle_timeout_in_seconds is not None:
+            recommendations["pool_recycle"] = int(server_idle_timeout_in_seconds * 0.9)
+
+        return recommendations
+
+    def _on_connect(self, dbapi_connection, connection_record) -> None:
+        self.connects += 1
+        connection_record.info["connected_at"] = time.monotonic()
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy) -> None:
+        self.checkouts += 1
+        self.checked_out += 1
+        self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+        connection_record.info["checked_out_at"] = time.perf_counter()
+
+    def _on_checkin(self, dbapi_connection, connection_record) -> None:
+        self.checked_out -= 1
+        checked_out_at = connection_record.info.pop("checked_out_at", None)
+        if checked_out_at is not None:
+            self.checkout_duration.observe(time.perf_counter() - checked_out_at)
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception) -> None:
+        self.invalidations += 1
+
+    def _on_close(self, dbapi_connection, connection_record) -> None:
+        connected_at = connection_record.info.pop("connected_at", None)
+        if connected_at is not None:
+            self.connection_lifetime.observe(time.monotonic() - connected_at)
+
+
+def _listen_for_checkout_wait(pool: sa.Pool, callback: Callable[[float], None]) -> None:
+    """
+    Calls callback with the seconds spent waiting for every connection checked out from the pool. This wraps the
+    private Pool._do_get, which exists in the SQLAlchemy versions allowed by pyproject.toml; a pool is wrapped only
+    once, however many callbacks listen to it.
+    """
+    callbacks: list[Callable[[float], None]] | None = getattr(pool, _CHECKOUT_WAIT_CALLBACKS, None)
+    if callbacks is None:
+        do_get = getattr(pool, "_do_get", None)
+        if do_get is None:
+            logger.warning(f"Checkout wait isn't measured, {type(pool).__name__} has no _do_get")
+            return
+        callbacks = []
+
+        def timed_do_get():
+            start = time.perf_counter()
+            try:
+                return do_get()
+            finally:
+                duration = time.perf_counter() - start
+                for checkout_wait_callback in callbacks:
+                    checkout_wait_callback(duration)
+
+        pool._do_get = timed_do_get  # type: ignore[method-assign]
+        setattr(pool, _CHECKOUT_WAIT_CALLBACKS, callbacks)
+    callbacks.append(callback)
+
+
+@dataclass(frozen=True)
+class QueryRecord:
+    engine: str
+    fingerprint: str
+    statement: str
+    duration_in_seconds: float
+    rowcount: int
+    executemany: bool
+
+
+@dataclass
+class QueryStatistics:
+    count: int = 0
+    total_duration_in_seconds: float = 0.0
+    max_duration_in_seconds: float = 0.0
+    rows: int = 0
+
+
+class QueryMetrics:
+    """
+    Measures the statements executed by an engine, using the before/after_cursor_execute engine events.
+
+    For every execution it records the latency and row count, aggregated per statement fingerprint (the SQL with
+    literals, parameters and IN lists normalized). Statements slower than slow_query_threshold_in_seconds are logged
+    as warnings. When the same fingerprint is executed n_plus_one_threshold times within one DatabaseManager session,
+    a possible N+1 query pattern is logged once for that session.
+
+    To keep the overhead low in production, only a sample_rate fraction of the executions is timed; N+1 detection
+    counts every execution.
+
+    Arguments:
+        engine (AsyncEngine): the engine to instrument
+        name (str): name of the engine in records and logs
+        slow_query_threshold_in_seconds (float | None): latency above which statements are logged; None disables it
+        n_plus_one_threshold (int | None): executions of a fingerprint per session above which an N+1 pattern is
+            logged; None disables it
+        sample_rate (float): fraction (0 to 1) of the executions that are timed
+        on_query (Callable[[QueryRecord], None] | None): called with every timed execution, e.g. to export metrics
+        max_fingerprints (int): maximum number of fingerprints kept in statistics; others are aggregated as "other"
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        name: str = "writer",
+        slow_query_threshold_in_seconds: float | None = 0.5,
+        n_plus_one_threshold: int | None = 10,
+        sample_rate: float = 1.0,
+        on_query: Callable[[QueryRecord], None] | None = None,
+        max_fingerprints: int = 1000,
+    ):
+        self.name = name
+        self.slow_query_threshold_in_seconds = slow_query_threshold_in_seconds
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.sample_rate = sample_rate
+        self.on_query = on_query
+        self.max_fingerprints = max_fingerprints
+        self.latency = Histogram(DEFAULT_LATENCY_BUCKETS)
+        self.statistics: dict[str, QueryStatistics] = {}
+
+        sa.event.listen(engine.sync_engine, "before_cursor_execute", self._before_cursor_execute)
+        sa.event.listen(engine.sync_engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def to_prometheus(self) -> list[str]:
+        """
+        The latency histogram of all statements as lines of the Prometheus text exposition format.
+        """
+        return self.latency.to_prometheus("db_query_duration_seconds", f'engine="{self.name}"')
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        # kept on the execution context rather than the connection, as after_cursor_execute isn't called for
+        # statements that fail
+        if context is not None and (self.sample_rate >= 1 or random.random() < self.sample_rate):
+            setattr(context, _QUERY_START, time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        start = getattr(context, _QUERY_START, None)
+        fingerprint = fingerprint_statement(statement)
+
+        session_query_counts = _session_query_counts.get()
+        if session_query_counts is not None and self.n_plus_one_threshold is not None:
+            count = session_query_counts[fingerprint] = session_query_counts.get(fingerprint, 0) + 1
+            if count == self.n_plus_one_threshold:
+                logger.warning(
+                    f"Possible N+1 query pattern on {self.name}: executed {count} times in one session: {fingerprint}"
+                )
+
+        if start is None:
+            return
+
+        duration = time.perf_counter() - start
+        rowcount = cursor.rowcount if cursor.rowcount is not None else -1
+        self.latency.observe(duration)
+
+        if fingerprint not in self.statistics and len(self.statistics) >= self.max_fingerprints:
+            statistics = self.statistics.setdefault("other", QueryStatistics())
+        else:
+            statistics = self.statistics.setdefault(fingerprint, QueryStatistics())
+        statistics.count += 1
+        statistics.total_duration_in_seconds += duration
+        statistics.max_duration_in_seconds = max(statistics.max_duration_in_seconds, duration)
+        statistics.rows += max(rowcount, 0)
+
+        if self.slow_query_threshold_in_seconds is not None and duration > self.slow_query_threshold_in_seconds:
+            logger.warning(f"Slow query on {self.name} took {duration:.3f} seconds: {fingerprint}")
+
+        if self.on_query is not None:
+            self.on_query(QueryRecord(self.name, fingerprint, statement, duration, rowcount, executemany))
+
+
+@lru_cache(maxsize=2048)
+def fingerprint_statement(statement: str) -> str:
+    """
+    Normalizes a SQL statement so that executions of the same query with different values are grouped together:
+    literals and parameters become "?", lists of parameters become "(?)" and whitespace is collapsed.
+    """
+    fingerprint = _STRING_LITERAL.sub("?", statement)
+    fingerprint = _PARAMETER.sub("?", fingerprint)
+    fingerprint = _NUMBER_LITERAL.sub("?", fingerprint)
+    fingerprint = _PARAMETER_LIST.sub("(?)", fingerprint)
+    return _WHITESPACE.sub(" ", fingerprint).strip()
+
+
+@contextlib.contextmanager
+def track_session_queries() -> Iterator[None]:
+    """
+    Counts the statement fingerprints executed in the context, for the N+1 detection of QueryMetrics.
+    Used by DatabaseManager.session.
+    """
+    token = _session_query_counts.set({})
+    try:
+        yield
+    finally:
+        _session_query_counts.reset(token)
+
+
+def pool_metrics_to_prometheus(pool_metrics: Iterable[PoolMetrics]) -> str:
+    """
+    Renders the metrics of many pools (e.g. DatabaseManager.pool_metrics.values()) in the Prometheus text format.
+    """
+    return "\n".join(line for metrics in pool_metrics for line in metrics.to_prometheus()) + "\n"
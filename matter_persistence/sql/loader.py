@@ -0,0 +1,93 @@
+import asyncio
+from collections.abc import Sequence
+from uuid import UUID
+
+from matter_persistence.sql.base import CustomBase
+from matter_persistence.sql.manager import AsyncSession
+from matter_persistence.sql.utils import get_many
+
+
+class ModelLoader:
+    """
+    Batches the lookups of rows by id that are made within the same event loop iteration into a single query.
+
+    Meant to be created per request (e.g. per GraphQL operation): resolvers call load for the rows they need, and the
+    loader gets all of them with one get_many call instead of one query per row. With cache enabled, every id is
+    looked up at most once during the lifetime of the loader.
+
+    Arguments:
+        session (AsyncSession): the session the rows are loaded with
+        db_model (type[CustomBase]): the model of the rows
+        with_deleted (bool): whether soft deleted rows are loaded as well
+        cache (bool): whether loaded rows are kept and returned for repeated ids
+
+    Usage example:
+        loader = ModelLoader(session, PersonORM)
+        person, other_person = await asyncio.gather(loader.load(person_id), loader.load(other_person_id))
+    """
+
+    def __init__(
+        self, session: AsyncSession, db_model: type[CustomBase], with_deleted: bool = False, cache: bool = True
+    ):
+        self._session = session
+        self._db_model = db_model
+        self._with_deleted = with_deleted
+        self._cache = cache
+        self._loaded: dict[UUID, asyncio.Future] = {}
+        self._queued: dict[UUID, asyncio.Future] = {}
+        self._session_lock = asyncio.Lock()
+        self._dispatch_tasks: set[asyncio.Task] = set()
+
+    def load(self, id: UUID) -> "asyncio.Future[CustomBase | None]":
+        """
+        Loads the row with the given id, or None if it doesn't exist.
+        """
+        if id in self._loaded:
+            return self._loaded[id]
+        if id in self._queued:
+            return self._queued[id]
+
+        loop = asyncio.get_running_loop()
+        if not self._queued:
+            loop.call_soon(self._schedule_dispatch)
+        future = self._queued[id] = loop.create_future()
+        if self._cache:
+            self._loaded[id] = future
+        return future
+
+    async def load_many(self, ids: Sequence[UUID]) -> list[CustomBase | None]:
+        """
+        Loads the rows with the given ids, in the order of ids.
+        """
+        return list(await asyncio.gather(*(self.load(id) for id in ids)))
+
+    def clear(self, id: UUID | None = None) -> None:
+        """
+        Removes the given id, or all ids, from the cache.
+        """
+        if id is None:
+            self._loaded.clear()
+        else:
+            self._loaded.pop(id, None)
+
+    def _schedule_dispatch(self) -> None:
+        task = asyncio.get_running_loop().create_task(self._dispatch())
+        self._dispatch_tasks.add(task)
+        task.add_done_callback(self._dispatch_tasks.discard)
+
+    async def _dispatch(self) -> None:
+        queued, self._queued = self._queued, {}
+        try:
+            # the session can't run queries concurrently
+            async with self._session_lock:
+                rows = await get_many(self._session, self._db_model, list(queued), with_deleted=self._with_deleted)
+        except Exception as exc:
+            for id, future in queued.items():
+                self._loaded.pop(id, None)
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        for future, row in zip(queued.values(), rows, strict=True):
+            if not future.done():
+                future.set_result(row)
@@ -1,15 +1,44 @@
+import asyncio
 import contextlib
-from collections.abc import AsyncIterator
+import itertools
+import logging
+import time
+from collections.abc import AsyncIterator, Callable, Sequence
+from contextvars import ContextVar
 from typing import Any
+from uuid import UUID
 
+import sqlalchemy as sa
 from sqlalchemy.ext.asyncio import (
     AsyncConnection,
+    AsyncEngine,
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
 
+from matter_persistence.deadline import get_remaining_time
 from matter_persistence.sql.exceptions import DatabaseNoEngineSetError
+from matter_persistence.sql.instrumentation import PoolMetrics, QueryMetrics, track_session_queries
+from matter_persistence.sql.prepared_statements import (
+    PreparedStatementMode,
+    get_connect_args,
+    listen_for_stale_statements,
+    track_writes,
+)
+from matter_persistence.sql.result_cache import QueryResultCache
+from matter_persistence.tenancy import get_organization_id
+
+logger = logging.getLogger(__name__)
+
+# time.monotonic() of the last commit made through a writer session in the current context (e.g. request)
+_last_commit_at: ContextVar[float | None] = ContextVar("last_commit_at", default=None)
+
+# replication lag of a PostgreSQL standby; 0 when it has replayed everything it received
+_POSTGRESQL_REPLICA_LAG_QUERY = sa.text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
 
 
 class DatabaseManager:
@@ -19,11 +48,29 @@ class DatabaseManager:
     A class for managing database connections in an asynchronous manner.
 
     Methods:
-    - __init__(self, host: str, engine_kwargs: dict[str, Any] = {}):
+    - __init__(self, host: str, engine_kwargs: dict[str, Any] = {}, reader_hosts: Sequence[str] = (), ...):
         Initializes the DatabaseManager object with the given host and optional engine arguments.
         Args:
             - host (str): The host name or connection URI of the database.
             - engine_kwargs (dict[str, Any]): Optional keyword arguments to be passed to the create_async_engine function.
+            - reader_hosts (Sequence[str]): Optional connection URIs of read replicas, used by readonly sessions.
+            - max_replica_lag_in_seconds (float | None): Replicas lagging further behind are not used, see
+              refresh_replica_status.
+            - read_your_writes_in_seconds (float): For how long after a commit readonly sessions opened in the same
+              context (e.g. request) still use the writer, so they see the committed data.
+            - pool_metrics (bool): Whether to measure the connection pool of every engine, see pool_metrics below.
+            - query_metrics (bool): Whether to measure the statements executed by every engine, see query_metrics below.
+            - query_metrics_kwargs (dict[str, Any] | None): Optional keyword arguments to be passed to QueryMetrics, e.g.
+              slow_query_threshold_in_seconds, n_plus_one_threshold or sample_rate.
+            - result_cache (QueryResultCache | None): Optional cache of the results of find and get, used when they
+              are called with cached=True; see QueryResultCache.
+            - prepared_statements (PreparedStatementMode): How asyncpg prepares and caches statements, e.g. NAMED or
+              TRANSACTION behind PgBouncer; see PreparedStatementMode. Only for postgresql+asyncpg hosts.
+            - prepared_statement_cache_size (int): Number of prepared statements cached per connection (asyncpg).
+            - organization_schemas (Callable[[UUID], str | None] | None): Optional function returning the schema of
+              the tables of an organization (or None for the default schema), e.g. for big organizations isolated in
+              their own schema. Sessions opened in the context of an organization (see matter_persistence.tenancy)
+              then use its schema for the tables that don't specify one.
 
     - __aenter__(self) -> DatabaseManager:
         Async context manager method for entering a context.
@@ -49,18 +96,85 @@ class DatabaseManager:
         Raises:
             - DatabaseNoEngineSetError: If the DatabaseManager is not initialized.
 
-    - session(self) -> AsyncIterator[AsyncSession]:
+    - session(self, readonly: bool = False) -> AsyncIterator[AsyncSession]:
         Async context manager for creating and managing a database session.
+        Args:
+            - readonly (bool): Whether the session only reads, in which case it's bound to one of the healthy read
+              replicas (round robin), if there are any.
+            On PostgreSQL, when a deadline is set (see matter_persistence.deadline.deadline), every transaction of the
+            session gets a statement_timeout of the time remaining until the deadline.
         Yields:
             - AsyncSession: The database session object.
         Raises:
             - DatabaseNoEngineSetError: If the DatabaseManager is not initialized.
 
+    - refresh_replica_status(self) -> dict[str, bool]:
+        Checks every read replica, excluding the unreachable ones and the ones lagging too far behind.
+
+    - check_replica(self, name: str) -> bool:
+        Checks a single read replica, like refresh_replica_status; see also matter_persistence.health.HealthMonitor.
+
+    - engines (property) -> dict[str, AsyncEngine]:
+        The writer engine (named "writer") and the read replica engines (named "reader_<index>").
+
+    - pool_metrics (attribute) -> dict[str, PoolMetrics]:
+        Connection pool metrics (checkout wait, in use/idle connections, connection lifetime, ...) of every engine,
+        by engine name; empty unless pool_metrics is enabled.
+
+    - query_metrics (attribute) -> dict[str, QueryMetrics]:
+        Statement latency and row counts per fingerprint, slow query logging and N+1 detection of every engine, by
+        engine name; empty unless query_metrics is enabled.
+
     """
 
-    def __init__(self, host: str, engine_kwargs: dict[str, Any] = {}):
+    def __init__(
+        self,
+        host: str,
+        engine_kwargs: dict[str, Any] = {},
+        reader_hosts: Sequence[str] = (),
+        max_replica_lag_in_seconds: float | None = None,
+        read_your_writes_in_seconds: float = 0.0,
+        pool_metrics: bool = False,
+        query_metrics: bool = False,
+        query_metrics_kwargs: dict[str, Any] | None = None,
+        result_cache: QueryResultCache | None = None,
+        prepared_statements: PreparedStatementMode = PreparedStatementMode.DEFAULT,
+        prepared_statement_cache_size: int = 100,
+        organization_schemas: Callable[[UUID], str | None] | None = None,
+    ):
+        self.prepared_statements = prepared_statements
+        if sa.make_url(host).drivername == "postgresql+asyncpg":
+            # explicitly given connect_args take precedence
+            connect_args = get_connect_args(prepared_statements, prepared_statement_cache_size)
+            engine_kwargs = engine_kwargs | {"connect_args": connect_args | engine_kwargs.get("connect_args", {})}
+        elif prepared_statements != PreparedStatementMode.DEFAULT:
+            raise ValueError("Prepared statement modes are only supported by postgresql+asyncpg hosts")
+
         self._engine = create_async_engine(host, **engine_kwargs)
         self._sessionmaker = async_sessionmaker(autocommit=False, bind=self._engine, expire_on_commit=False)
+        self._reader_engines = [create_async_engine(reader_host, **engine_kwargs) for reader_host in reader_hosts]
+        self._reader_sessionmakers = [
+            async_sessionmaker(autocommit=False, bind=engine, expire_on_commit=False) for engine in self._reader_engines
+        ]
+        if prepared_statements != PreparedStatementMode.DEFAULT:
+            for engine in self.engines.values():
+                listen_for_stale_statements(engine, prepared_statements)
+        self._healthy_readers = [True] * len(self._reader_engines)
+        self._reader_counter = itertools.count()
+        self._max_replica_lag_in_seconds = max_replica_lag_in_seconds
+        self._read_your_writes_in_seconds = read_your_writes_in_seconds
+        self.pool_metrics = (
+            {name: PoolMetrics(engine, name) for name, engine in self.engines.items()} if pool_metrics else {}
+        )
+        self.query_metrics = (
+            {name: QueryMetrics(engine, name, **(query_metrics_kwargs or {})) for name, engine in self.engines.items()}
+            if query_metrics
+            else {}
+        )
+        self.result_cache = result_cache
+        self._organization_schemas = organization_schemas
+        # engines with the schema_translate_map of a schema, by engine and schema
+        self._schema_engines: dict[tuple[AsyncEngine, str], AsyncEngine] = {}
 
     async def __aenter__(self):
         return self
@@ -72,9 +186,59 @@ class DatabaseManager:
         if self._engine is None:
             raise Exception("DatabaseManager is not initialized")
         await self._engine.dispose()
+        for engine in self._reader_engines:
+            await engine.dispose()
 
         self._engine = None
         self._sessionmaker = None
+        self._reader_engines = []
+        self._reader_sessionmakers = []
+        self._healthy_readers = []
+        self._schema_engines = {}
+
+    @property
+    def engines(self) -> dict[str, AsyncEngine]:
+        if self._engine is None:
+            return {}
+        return {"writer": self._engine} | {f"reader_{i}": engine for i, engine in enumerate(self._reader_engines)}
+
+    def set_replica_health(self, name: str, healthy: bool) -> None:
+        """
+        Marks a read replica (by its name in engines) as healthy or not; unhealthy replicas get no readonly sessions.
+        """
+        self._healthy_readers[int(name.removeprefix("reader_"))] = healthy
+
+    async def refresh_replica_status(self) -> dict[str, bool]:
+        """
+        Checks every read replica (concurrently): replicas that can't be reached, or whose replication lag is above
+        max_replica_lag_in_seconds, are excluded from readonly sessions until the next refresh.
+
+        Returns:
+            - dict[str, bool]: Whether each replica (by its name in engines) is used.
+        """
+        names = [f"reader_{i}" for i in range(len(self._reader_engines))]
+        return dict(zip(names, await asyncio.gather(*(self.check_replica(name) for name in names)), strict=True))
+
+    async def check_replica(self, name: str) -> bool:
+        """
+        Checks a read replica (by its name in engines) and marks it as healthy or not, see refresh_replica_status.
+        """
+        engine = self._reader_engines[int(name.removeprefix("reader_"))]
+        try:
+            async with engine.connect() as connection:
+                if engine.dialect.name == "postgresql":
+                    lag = float(await connection.scalar(_POSTGRESQL_REPLICA_LAG_QUERY) or 0)
+                else:
+                    lag = 0.0
+        except (sa.exc.DBAPIError, OSError):
+            logger.warning(f"Read replica {name} is unreachable.", exc_info=True)
+            healthy = False
+        else:
+            healthy = self._max_replica_lag_in_seconds is None or lag <= self._max_replica_lag_in_seconds
+            if not healthy:
+                logger.warning(f"Read replica {name} is lagging {lag} seconds behind.")
+        self.set_replica_health(name, healthy)
+        return healthy
 
     @contextlib.asynccontextmanager
     async def connect(self) -> AsyncIterator[AsyncConnection]:
@@ -91,17 +255,79 @@ class DatabaseManager:
                 raise
 
     @contextlib.asynccontextmanager
-    async def session(self) -> AsyncIterator[AsyncSession]:
+    async def session(self, readonly: bool = False) -> AsyncIterator[AsyncSession]:
         if self._sessionmaker is None:
             raise DatabaseNoEngineSetError(
                 description="DatabaseManager is not initialized",
             )
 
-        session = self._sessionmaker()
+        reader_sessionmaker = self._get_reader_sessionmaker() if readonly else None
+        sessionmaker = reader_sessionmaker or self._sessionmaker
+        schema = self._get_organization_schema()
+        session = sessionmaker() if schema is None else sessionmaker(bind=self._get_schema_engine(sessionmaker, schema))
+
+        committed = False
+        if reader_sessionmaker is None and self._reader_sessionmakers and self._read_your_writes_in_seconds:
+
+            def mark_committed(_):
+                nonlocal committed
+                committed = True
+
+            sa.event.listen(session.sync_session, "after_commit", mark_committed)
+
+        if self.result_cache is not None:
+            self.result_cache.track(session, readonly=readonly, from_replica=reader_sessionmaker is not None)
+
+        if self.prepared_statements != PreparedStatementMode.DEFAULT:
+            # calls that fail on a stale prepared statement are only retried if nothing is lost by a rollback
+            track_writes(session)
+
+        if get_remaining_time() is not None and session.get_bind().dialect.name == "postgresql":
+            sa.event.listen(session.sync_session, "after_begin", _set_statement_timeout)
+
         try:
-            yield session
+            with track_session_queries() if self.query_metrics else contextlib.nullcontext():
+                yield session
         except:
             await session.rollback()
             raise
         finally:
             await session.close()
+            if self.result_cache is not None:
+                await self.result_cache.wait_for_invalidations(session)
+            if committed:
+                _last_commit_at.set(time.monotonic())
+
+    def _get_organization_schema(self) -> str | None:
+        if self._organization_schemas is None:
+            return None
+        organization_id = get_organization_id()
+        return None if organization_id is None else self._organization_schemas(organization_id)
+
+    def _get_schema_engine(self, sessionmaker: async_sessionmaker, schema: str) -> AsyncEngine:
+        engine = sessionmaker.kw["bind"]
+        schema_engine = self._schema_engines.get((engine, schema))
+        if schema_engine is None:
+            # shares the connection pool of engine; the statements are compiled once and translated on execution
+            schema_engine = self._schema_engines[engine, schema] = engine.execution_options(
+                schema_translate_map={None: schema}
+            )
+        return schema_engine
+
+    def _get_reader_sessionmaker(self) -> async_sessionmaker | None:
+        last_commit_at = _last_commit_at.get()
+        if last_commit_at is not None and time.monotonic() - last_commit_at < self._read_your_writes_in_seconds:
+            return None
+
+        healthy_readers = [i for i, healthy in enumerate(self._healthy_readers) if healthy]
+        if not healthy_readers:
+            return None
+        return self._reader_sessionmakers[healthy_readers[next(self._reader_counter) % len(healthy_readers)]]
+
+
+def _set_statement_timeout(session, transaction, connection) -> None:
+    # the server cancels the statements of the transaction that run past the deadline of the context (e.g. request)
+    remaining_time = get_remaining_time()
+    if remaining_time is not None:
+        # SET doesn't take bind parameters; a timeout of 0 would disable it
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {max(1, int(remaining_time * 1000))}")
@@ -0,0 +1,123 @@
+from enum import Enum
+from typing import Any
+from uuid import uuid4
+
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+# SQLSTATEs of "prepared statement ... does not exist" and "prepared statement ... already exists"
+_STALE_PREPARED_STATEMENT_SQLSTATES = {"26000", "42P05"}
+
+# key of AsyncSession.info: whether the current transaction of the session wrote anything, see track_writes
+_HAS_WRITES = "matter_persistence_has_writes"
+
+
+class PreparedStatementMode(Enum):
+    """
+    How asyncpg prepares and caches statements, see DatabaseManager.
+
+    - DEFAULT: the asyncpg and SQLAlchemy defaults, for direct connections to PostgreSQL
+    - NAMED: statements get unique names and are cached per connection, so they keep their prepared plans; for
+      poolers that track prepared statements (e.g. PgBouncer 1.21+ with max_prepared_statements), where a statement
+      can still go missing now and then, which invalidates the caches and retries the call (see retry_if_failed)
+    - TRANSACTION: statements get unique names and are only reused until the connection is returned to the pool,
+      i.e. within a transaction of a session; for poolers in transaction mode that don't track prepared statements
+    - DISABLED: every execution prepares its statement again
+    """
+
+    DEFAULT = "default"
+    NAMED = "named"
+    TRANSACTION = "transaction"
+    DISABLED = "disabled"
+
+
+def get_connect_args(mode: PreparedStatementMode, cache_size: int) -> dict[str, Any]:
+    """
+    The connect_args of an asyncpg engine for the given mode and size of the prepared statement cache.
+    """
+    if mode == PreparedStatementMode.DEFAULT:
+        return {"prepared_statement_cache_size": cache_size}
+    return {
+        "prepared_statement_cache_size": 0 if mode == PreparedStatementMode.DISABLED else cache_size,
+        # names asyncpg generates (a counter per connection) collide when connections share server connections
+        "prepared_statement_name_func": _get_unique_statement_name,
+        # the cache of asyncpg itself (used by its type introspection) has generated names as well
+        "statement_cache_size": 0,
+    }
+
+
+def listen_for_stale_statements(engine: AsyncEngine, mode: PreparedStatementMode) -> None:
+    """
+    Invalidates the prepared statement caches of engine when a statement went missing, and, in TRANSACTION mode,
+    empties the cache of a connection when it's returned to the pool.
+    """
+    sa.event.listen(engine.sync_engine, "handle_error", _invalidate_stale_statements)
+    if mode == PreparedStatementMode.TRANSACTION:
+        sa.event.listen(engine.sync_engine, "checkin", _clear_prepared_statements)
+
+
+def is_stale_prepared_statement_error(exc: sa.exc.DBAPIError) -> bool:
+    """
+    Whether exc was raised because a cached prepared statement no longer exists (or no longer matches the schema).
+    """
+    return (
+        getattr(exc.orig, "sqlstate", None) in _STALE_PREPARED_STATEMENT_SQLSTATES
+        or type(exc.orig).__name__ == "InvalidCachedStatementError"
+    )
+
+
+def track_writes(session: AsyncSession) -> None:
+    """
+    Tracks whether the current transaction of session wrote anything, see discard_failed_transaction.
+    """
+    session.info[_HAS_WRITES] = False
+    sync_session = session.sync_session
+    sa.event.listen(sync_session, "after_flush", _mark_written)
+    sa.event.listen(sync_session, "do_orm_execute", _mark_executed_writes)
+    sa.event.listen(sync_session, "after_commit", _clear_written)
+    sa.event.listen(sync_session, "after_rollback", _clear_written)
+
+
+async def discard_failed_transaction(session: Any) -> bool:
+    """
+    Rolls back the transaction of session that a stale prepared statement aborted, if nothing is lost by doing so.
+
+    :return: whether the failed call can be retried; sessions whose transaction wrote or loaded anything (or whose
+        writes aren't tracked) can't, as the rollback would discard the writes or expire the loaded objects
+    """
+    if not isinstance(session, AsyncSession):  # e.g. a call that manages its own transactions or savepoints
+        return True
+    if session.info.get(_HAS_WRITES, True) or session.identity_map or session.new or session.dirty or session.deleted:
+        return False
+    await session.rollback()
+    return True
+
+
+def _get_unique_statement_name() -> str:
+    return f"__matter_persistence_{uuid4().hex}__"
+
+
+def _invalidate_stale_statements(exception_context) -> None:
+    exc = exception_context.sqlalchemy_exception
+    if isinstance(exc, sa.exc.DBAPIError) and is_stale_prepared_statement_error(exc):
+        # makes every connection prepare its cached statements again, like the dialect does for DDL
+        exception_context.dialect._invalidate_schema_cache()
+
+
+def _clear_prepared_statements(dbapi_connection, connection_record) -> None:
+    cache = getattr(dbapi_connection, "_prepared_statement_cache", None)
+    if cache is not None:
+        cache.clear()
+
+
+def _mark_written(sync_session, flush_context) -> None:
+    sync_session.info[_HAS_WRITES] = True
+
+
+def _mark_executed_writes(orm_execute_state) -> None:
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info[_HAS_WRITES] = True
+
+
+def _clear_written(sync_session) -> None:
+    sync_session.info[_HAS_WRITES] = False
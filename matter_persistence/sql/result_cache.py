@@ -0,0 +1,233 @@
+import asyncio
+import logging
+from collections.abc import Iterable, Sequence
+from functools import lru_cache
+from hashlib import sha1
+from typing import Any
+from uuid import uuid4
+
+import sqlalchemy as sa
+from pydantic import BaseModel, ConfigDict, ValidationError, create_model
+from pydantic_core import to_json
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+
+from matter_persistence.redis.exceptions import CacheServerError
+from matter_persistence.redis.manager import CacheManager
+from matter_persistence.sql.base import CustomBase
+
+logger = logging.getLogger(__name__)
+
+# keys of AsyncSession.info
+_RESULT_CACHE = "matter_persistence_result_cache"
+_FROM_REPLICA = "matter_persistence_result_cache_from_replica"
+_CHANGED_TABLES = "matter_persistence_result_cache_changed_tables"
+_INVALIDATIONS = "matter_persistence_result_cache_invalidations"
+
+
+class QueryResultCache:
+    """
+    Caches the rows returned by find and get (when called with cached=True) in Redis, through a CacheManager.
+
+    Results are keyed on a fingerprint of the query (model, filters, sort and page for find; the compiled statement
+    and its parameters for get), its organization scope and the current generation of every table it reads. Every
+    commit of a session of the DatabaseManager that writes to a table (through the ORM or with insert/update/delete
+    statements executed by the session) replaces the generation of the table, so results read before the commit are
+    never served again; the generations a query is cached with are read before the query runs, so a result read
+    concurrently with a commit can't be cached under the new generation. Results read from read replicas are served
+    from the cache but never stored, as a lagging replica can return rows older than the generations read before
+    the query. Writes made by other means (other applications, raw SQL strings) aren't seen, results cached before
+    them are served until they expire.
+
+    Rows are stored as compact lists of their column values and are turned back into instances of the model that
+    are added to the session without querying the database. Queries that load relationships, load only some columns
+    or use custom filters or joins are not cached. Redis failures are logged and the query is run as usual.
+
+    Arguments:
+        cache_manager (CacheManager): stores the results and the table generations
+        expiration_in_seconds (int): for how long results are cached
+        max_rows (int): results with more rows are not cached
+        namespace (str): prefix of the Redis keys
+
+    Usage example:
+        database_manager = DatabaseManager(host, result_cache=QueryResultCache(cache_manager))
+        async with database_manager.session() as session:
+            rows = await find(session, NumberORM, filters={"organization_id": organization_id}, cached=True)
+    """
+
+    def __init__(
+        self,
+        cache_manager: CacheManager,
+        expiration_in_seconds: int = 60,
+        max_rows: int = 1000,
+        namespace: str = "query_result",
+    ):
+        self.cache_manager = cache_manager
+        self.expiration_in_seconds = expiration_in_seconds
+        self.max_rows = max_rows
+        self.namespace = namespace
+
+    def track(self, session: AsyncSession, readonly: bool = False, from_replica: bool = False) -> None:
+        """
+        Makes the result cache available to find and get with session and, unless readonly, tracks the tables the
+        session writes to, replacing their generations after every commit. The results of sessions bound to a read
+        replica (from_replica) are looked up, but not stored.
+        """
+        session.info[_RESULT_CACHE] = self
+        session.info[_FROM_REPLICA] = from_replica
+        if not readonly:
+            sync_session = session.sync_session
+            sa.event.listen(sync_session, "after_flush", _collect_flushed_tables)
+            sa.event.listen(sync_session, "do_orm_execute", _collect_executed_tables)
+            sa.event.listen(sync_session, "after_commit", self._invalidate_changed_tables)
+            sa.event.listen(sync_session, "after_rollback", _discard_changed_tables)
+
+    async def wait_for_invalidations(self, session: AsyncSession) -> None:
+        """
+        Waits until the generations of the tables written by the commits of session are replaced.
+        """
+        invalidations = session.info.pop(_INVALIDATIONS, None)
+        if invalidations:
+            await asyncio.gather(*invalidations)
+
+    async def invalidate(self, table_names: Iterable[str]) -> None:
+        """
+        Replaces the generations of the given tables, so that no result read from them before is served again.
+        """
+        try:
+            await self.cache_manager.save_many_with_keys(
+                {self._get_generation_key(table_name): uuid4().hex for table_name in table_names}, use_key_as_is=True
+            )
+        except CacheServerError:
+            logger.warning(f"Unable to invalidate cached results of {', '.join(table_names)}.", exc_info=True)
+
+    async def lookup(
+        self,
+        session: AsyncSession,
+        db_model: type[CustomBase],
+        tables: Sequence[sa.TableClause],
+        scope: Any,
+        fingerprint: Any,
+    ) -> tuple[str | None, list[CustomBase] | None]:
+        """
+        Looks up the result of a query of db_model reading tables.
+
+        :return: the key to store the result with (None if the result can't be stored, e.g. as the session reads
+            from a read replica) and the cached rows (None if the result isn't cached)
+        """
+        await self.wait_for_invalidations(session)
+        table_names = sorted({table.name for table in tables})
+        try:
+            generations = await self._get_generations(table_names)
+            key = self._get_result_key(db_model, scope, fingerprint, generations)
+            row_model = _get_row_model(db_model)
+            rows = (await self.cache_manager.get_many_with_keys([key], row_model, use_key_as_is=True))[key]
+        except ValidationError:  # cached with other columns, e.g. before a migration
+            rows = None
+        except CacheServerError:
+            logger.warning(f"Unable to read cached results of {db_model.__name__}.", exc_info=True)
+            return None, None
+
+        store_key = None if session.info.get(_FROM_REPLICA) else key
+        if rows is None:
+            return store_key, None
+        return store_key, await session.run_sync(_merge_rows, db_model, rows)
+
+    async def store(self, db_model: type[CustomBase], key: str, rows: Sequence[CustomBase | None]) -> None:
+        """
+        Stores the result of a query looked up with lookup.
+        """
+        if len(rows) > self.max_rows:
+            return
+        row_model = _get_row_model(db_model)
+        try:
+            row_models = [row_model.model_validate(row.__dict__) for row in rows if row is not None]
+        except ValidationError:  # some columns aren't loaded
+            return
+
+        try:
+            await self.cache_manager.save_many_with_keys(
+                {key: row_models},
+                row_model,
+                expiration_in_seconds=self.expiration_in_seconds,
+                use_key_as_is=True,
+                compact_lists=True,
+            )
+        except CacheServerError:
+            logger.warning(f"Unable to cache results of {db_model.__name__}.", exc_info=True)
+
+    async def _get_generations(self, table_names: list[str]) -> list[str]:
+        generation_keys = [self._get_generation_key(table_name) for table_name in table_names]
+        stored_generations = await self.cache_manager.get_many_with_keys(generation_keys, use_key_as_is=True)
+
+        generations, new_generations = [], {}
+        for generation_key in generation_keys:
+            generation = stored_generations[generation_key]
+            if generation is None:  # never invalidated, or evicted
+                generation = new_generations[generation_key] = uuid4().hex
+            generations.append(generation.decode() if isinstance(generation, bytes) else generation)
+        if new_generations:
+            await self.cache_manager.save_many_with_keys(new_generations, use_key_as_is=True)
+        return generations
+
+    def _get_generation_key(self, table_name: str) -> str:
+        return f"{self.namespace}:generation:{table_name}"
+
+    def _get_result_key(self, db_model: type[CustomBase], scope: Any, fingerprint: Any, generations: list[str]) -> str:
+        digest = sha1(to_json([fingerprint, generations], fallback=str)).hexdigest()
+        return f"{self.namespace}:{scope}:{db_model.__tablename__}:{digest}"
+
+    def _invalidate_changed_tables(self, sync_session) -> None:
+        changed_tables = sync_session.info.pop(_CHANGED_TABLES, None)
+        if changed_tables:
+            # commit runs on the event loop, but listeners can't be awaited
+            invalidation = asyncio.get_running_loop().create_task(self.invalidate(sorted(changed_tables)))
+            sync_session.info.setdefault(_INVALIDATIONS, []).append(invalidation)
+
+
+def get_result_cache(session: AsyncSession) -> QueryResultCache | None:
+    return session.info.get(_RESULT_CACHE)
+
+
+def _collect_flushed_tables(sync_session, flush_context) -> None:
+    changed_tables = sync_session.info.setdefault(_CHANGED_TABLES, set())
+    for instance in (*sync_session.new, *sync_session.dirty, *sync_session.deleted):
+        changed_tables.update(table.name for table in sa.inspect(instance).mapper.tables)
+
+
+def _collect_executed_tables(orm_execute_state) -> None:
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        changed_tables = orm_execute_state.session.info.setdefault(_CHANGED_TABLES, set())
+        changed_tables.add(orm_execute_state.statement.table.name)
+
+
+def _discard_changed_tables(sync_session) -> None:
+    sync_session.info.pop(_CHANGED_TABLES, None)
+
+
+def _merge_rows(sync_session, db_model: type[CustomBase], rows: list[BaseModel]) -> list[CustomBase]:
+    instances = []
+    for row in rows:
+        instance = db_model(**dict(row))
+        make_transient_to_detached(instance)
+        instances.append(sync_session.merge(instance, load=False))
+    return instances
+
+
+@lru_cache(maxsize=256)
+def _get_row_model(db_model: type[CustomBase]) -> type[BaseModel]:
+    """
+    A model with a field per column of db_model, the cached rows are stored as.
+    """
+    fields = {}
+    for attribute in sa.inspect(db_model).column_attrs:
+        column = attribute.columns[0]
+        try:
+            python_type: Any = column.type.python_type
+        except NotImplementedError:
+            python_type = Any
+        fields[attribute.key] = (python_type | None if column.nullable else python_type, ...)
+    row_model: type[BaseModel] = create_model(  # type: ignore[call-overload]
+        f"{db_model.__name__}Row", __config__=ConfigDict(extra="ignore"), **fields
+    )
+    return row_model
@@ -0,0 +1,85 @@
+import itertools
+from collections.abc import Iterable, Iterator, Sequence
+from functools import lru_cache
+from typing import Any
+from uuid import uuid4
+
+import sqlalchemy as sa
+from pydantic import BaseModel
+
+from matter_persistence.sql.base import CustomBase, datetime_with_utc_tz
+from matter_persistence.sql.manager import AsyncSession
+
+
+def batched(items: Iterable[Any], batch_size: int) -> Iterator[list[Any]]:
+    """
+    Splits items into lists of at most batch_size items.
+    """
+    iterator = iter(items)
+    while batch := list(itertools.islice(iterator, batch_size)):
+        yield batch
+
+
+def group_by_columns(rows: Iterable[dict[str, Any]]) -> dict[tuple[str, ...], list[dict[str, Any]]]:
+    """
+    Groups rows by the (sorted) set of columns they have values for, so that every group can be written by the same
+    statement.
+    """
+    rows_by_columns: dict[tuple[str, ...], list[dict[str, Any]]] = {}
+    for row in rows:
+        rows_by_columns.setdefault(tuple(sorted(row)), []).append(row)
+    return rows_by_columns
+
+
+@lru_cache(maxsize=256)
+def get_column_keys(db_model: type[CustomBase]) -> frozenset[str]:
+    return frozenset(sa.inspect(db_model).columns.keys())
+
+
+@lru_cache(maxsize=256)
+def get_column_keys_in_order(db_model: type[CustomBase]) -> tuple[str, ...]:
+    return tuple(sa.inspect(db_model).columns.keys())
+
+
+def prepare_insert_rows(db_model: type[CustomBase], values: Sequence[dict | BaseModel]) -> list[dict[str, Any]]:
+    """
+    Turns values into rows to insert into db_model: keys that aren't columns are dropped, and missing ids and
+    created/updated timestamps are filled in.
+    """
+    column_keys = get_column_keys(db_model)
+    now = datetime_with_utc_tz()
+    rows = []
+    for value in values:
+        value_dict = value.model_dump() if isinstance(value, BaseModel) else value
+        row = {key: column_value for key, column_value in value_dict.items() if key in column_keys}
+        if row.get("id") is None:
+            row["id"] = uuid4()
+        row.setdefault("created", now)
+        row.setdefault("updated", now)
+        rows.append(row)
+    return rows
+
+
+async def update_rows(
+    session: AsyncSession, db_model: type[CustomBase], columns: tuple[str, ...], rows: list[dict[str, Any]]
+) -> None:
+    """
+    Updates the given columns of rows by id. On PostgreSQL this is a single UPDATE ... FROM (VALUES ...) statement;
+    other dialects use an executemany UPDATE by primary key.
+    """
+    if session.get_bind().dialect.name != "postgresql":
+        await session.execute(sa.update(db_model), rows)
+        return
+
+    mapper_columns = sa.inspect(db_model).columns
+    values = sa.values(
+        *(sa.column(name, mapper_columns[name].type) for name in ("id", *columns)),
+        name="pending_updates",
+    ).data([tuple(row[name] for name in ("id", *columns)) for row in rows])
+    statement = (
+        sa.update(db_model)
+        .where(db_model.id == values.c.id)
+        .values({mapper_columns[name]: values.c[name] for name in columns})
+        .execution_options(synchronize_session=False)
+    )
+    await session.execute(statement)
@@ -0,0 +1,159 @@
+from typing import Any
+from uuid import UUID
+
+import sqlalchemy as sa
+from pydantic import BaseModel
+
+from matter_persistence.decorators import retry_if_failed
+from matter_persistence.sql.base import CustomBase, datetime_with_utc_tz
+from matter_persistence.sql.manager import AsyncSession
+from matter_persistence.sql.rows import batched, get_column_keys, group_by_columns, prepare_insert_rows, update_rows
+
+
+class UnitOfWork:
+    """
+    Buffers inserts, updates and soft deletes made in a session and writes them with a few bulk statements, instead
+    of a statement (or a transaction) per object.
+
+    Buffered changes are flushed when the unit of work is exited, and as soon as max_pending changes are buffered.
+    A flush writes the inserts, then the updates, then the soft deletes, model by model in the order the models were
+    first buffered (so that e.g. parents can be buffered before their children). Updates of the same row are
+    coalesced, and updates and soft deletes of rows that are still to be inserted are merged into their inserts.
+
+    Every flush runs in a savepoint, so that it can be retried as a whole when it fails with an OperationalError,
+    without affecting what was already written in the session. On a successful exit the session is committed too
+    (unless commit is False); if the block raises, the buffered changes are discarded.
+
+    Arguments:
+        session (AsyncSession): the session the changes are written with, e.g. from DatabaseManager.session()
+        max_pending (int): number of buffered changes that triggers a flush
+        batch_size (int): maximum number of rows written by a single statement
+        commit (bool): whether to commit the session on exit
+
+    Usage example:
+        async with database_manager.session() as session, UnitOfWork(session) as unit_of_work:
+            for value in values:
+                await unit_of_work.add(NumberORM, value)
+            await unit_of_work.update(NumberORM, number_id, number=10)
+            await unit_of_work.soft_delete(NumberORM, other_number_id)
+    """
+
+    def __init__(self, session: AsyncSession, max_pending: int = 1000, batch_size: int = 1000, commit: bool = True):
+        self.session = session
+        self._max_pending = max_pending
+        self._batch_size = batch_size
+        self._commit = commit
+        # by model, in the order the models were first buffered
+        self._inserts: dict[type[CustomBase], dict[UUID, dict[str, Any]]] = {}
+        self._updates: dict[type[CustomBase], dict[UUID, dict[str, Any]]] = {}
+        self._soft_deletes: dict[type[CustomBase], dict[UUID, None]] = {}
+        self._pending = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self._clear()
+            return
+        await self.flush()
+        if self._commit:
+            await self.session.commit()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def add(self, db_model: type[CustomBase], value: dict | BaseModel | CustomBase) -> UUID:
+        """
+        Buffers the insert of a row. Like bulk_insert, keys that aren't columns of db_model are ignored and missing
+        ids and created/updated timestamps are filled in.
+
+        :return: the id of the row
+        """
+        if isinstance(value, CustomBase):
+            column_keys = get_column_keys(db_model)
+            value = {key: column_value for key, column_value in value.__dict__.items() if key in column_keys}
+        [row] = prepare_insert_rows(db_model, [value])
+        id: UUID = row["id"]
+        self._inserts.setdefault(db_model, {})[id] = row
+        await self._buffered()
+        return id
+
+    async def update(self, db_model: type[CustomBase], id: UUID, **values: Any) -> None:
+        """
+        Buffers an update of the given columns of the row with the given id. The updated timestamp is set, unless
+        given.
+        """
+        unknown_columns = values.keys() - get_column_keys(db_model)
+        if unknown_columns:
+            raise ValueError(f"{db_model.__name__} has no columns named: {', '.join(sorted(unknown_columns))}")
+
+        row = self._inserts.get(db_model, {}).get(id)
+        if row is None:
+            row = self._updates.setdefault(db_model, {}).setdefault(id, {})
+        row.update({"updated": datetime_with_utc_tz(), **values})
+        await self._buffered()
+
+    async def soft_delete(self, db_model: type[CustomBase], id: UUID) -> None:
+        """
+        Buffers the soft deletion of the row with the given id, like bulk_soft_delete.
+        """
+        row = self._inserts.get(db_model, {}).get(id)
+        if row is None:
+            self._soft_deletes.setdefault(db_model, {})[id] = None
+        else:
+            now = datetime_with_utc_tz()
+            row.update(deleted=now, updated=now)
+        await self._buffered()
+
+    async def flush(self) -> int:
+        """
+        Writes all buffered changes, in a savepoint of the session.
+
+        :return: the number of changes that were written
+        """
+        if not self._pending:
+            return 0
+        await self._write_in_savepoint()
+        pending = self._pending
+        self._clear()
+        return pending
+
+    async def _buffered(self) -> None:
+        self._pending += 1
+        if self._pending >= self._max_pending:
+            await self.flush()
+
+    def _clear(self) -> None:
+        self._inserts, self._updates, self._soft_deletes = {}, {}, {}
+        self._pending = 0
+
+    @retry_if_failed
+    async def _write_in_savepoint(self) -> None:
+        # the buffers are only cleared once the savepoint is released, so a retry writes the same changes again
+        async with self.session.begin_nested():
+            await self._write()
+
+    async def _write(self) -> None:
+        for db_model, rows in self._inserts.items():
+            # rows inserting the same set of columns are written by the same statements
+            for rows_with_columns in group_by_columns(list(rows.values())).values():
+                for batch in batched(rows_with_columns, self._batch_size):
+                    await self.session.execute(sa.insert(db_model), batch)
+
+        for db_model, updates in self._updates.items():
+            rows_by_columns = group_by_columns([{"id": id, **values} for id, values in updates.items()])
+            for columns, rows_with_columns in rows_by_columns.items():
+                for batch in batched(rows_with_columns, self._batch_size):
+                    await update_rows(self.session, db_model, tuple(c for c in columns if c != "id"), batch)
+
+        now = datetime_with_utc_tz()
+        for db_model, ids in self._soft_deletes.items():
+            for batch in batched(ids, self._batch_size):
+                await self.session.execute(
+                    sa.update(db_model)
+                    .where(db_model.id.in_(batch), db_model.deleted.is_(None))
+                    .values(deleted=now, updated=now)
+                    .execution_options(synchronize_session=False)
+                )
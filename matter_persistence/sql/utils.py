@@ -1,14 +1,43 @@
+import asyncio
+import base64
+import contextlib
+import csv
+import io
 import logging
-from collections.abc import Callable
+from collections.abc import AsyncIterable, AsyncIterator, Callable, Iterable, Sequence
+from datetime import datetime, timedelta
 from enum import Enum
+from functools import lru_cache
+from typing import Any
+from uuid import UUID, uuid4
 
 import sqlalchemy as sa
-from sqlalchemy.orm import joinedload
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import from_json, to_json
+from sqlalchemy import orm
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import defaultload, joinedload, raiseload, selectinload, subqueryload
+from sqlalchemy.sql.util import find_tables
 
 from matter_persistence.decorators import retry_if_failed
-from matter_persistence.sql.base import CustomBase
-from matter_persistence.sql.exceptions import DatabaseInvalidSortFieldError, DatabaseNoEngineSetError
+from matter_persistence.sql.base import CustomBase, datetime_with_utc_tz, is_active_index
+from matter_persistence.sql.exceptions import (
+    DatabaseInvalidCursorError,
+    DatabaseInvalidLoadFieldError,
+    DatabaseInvalidSortFieldError,
+    DatabaseNoEngineSetError,
+    DatabaseOrganizationMismatchError,
+)
 from matter_persistence.sql.manager import AsyncSession, DatabaseManager
+from matter_persistence.sql.result_cache import get_result_cache
+from matter_persistence.sql.rows import (
+    batched,
+    get_column_keys,
+    get_column_keys_in_order,
+    group_by_columns,
+    prepare_insert_rows,
+)
+from matter_persistence.tenancy import ORGANIZATION_COLUMN, get_organization_id
 
 
 class SortMethodModel(Enum):
@@ -16,9 +45,37 @@ class SortMethodModel(Enum):
     DESC = "desc"
 
 
+class LoadStrategyModel(Enum):
+    """
+    How a relationship is loaded, see https://docs.sqlalchemy.org/en/20/orm/queryguide/relationships.html
+
+    - SELECTIN: a second SELECT ... WHERE id IN (...) per relationship; the best choice for one-to-many
+    - JOINED: a LEFT OUTER JOIN in the same query; best for many-to-one, but multiplies the rows of one-to-many
+    - SUBQUERY: a second SELECT that joins the original query as a subquery
+    - RAISE: accessing the relationship raises an error instead of emitting a query
+    """
+
+    SELECTIN = "selectin"
+    JOINED = "joined"
+    SUBQUERY = "subquery"
+    RAISE = "raise"
+
+
+_LOADERS = {
+    LoadStrategyModel.SELECTIN: selectinload,
+    LoadStrategyModel.JOINED: joinedload,
+    LoadStrategyModel.SUBQUERY: subqueryload,
+    LoadStrategyModel.RAISE: raiseload,
+}
+
+# hashable form of the load, load_only and defer arguments: (tuple of (path, strategy), load_only, defer)
+LoadingShape = tuple[tuple[tuple[str, LoadStrategyModel], ...], tuple[str, ...], tuple[str, ...]]
+
+
 async def is_database_alive(database_manager: DatabaseManager):
     """
-    Checks if the database is alive or not.
+    Checks if the database (i.e. the writer) is alive or not. Read replicas aren't checked, as readonly sessions use
+    the writer while they are down; see engines_alive.
     """
     # many times it is possible to open a connection but the database can't execute a query. Thus,
     # we test also if the query returns the expected result.
@@ -33,6 +90,23 @@ async def is_database_alive(database_manager: DatabaseManager):
     return db_result == 1
 
 
+async def engines_alive(database_manager: DatabaseManager, include_writer: bool = True) -> dict[str, bool]:
+    """
+    Checks every engine of the database manager (see DatabaseManager.engines) separately.
+    """
+    status = {}
+    for name, engine in database_manager.engines.items():
+        if name == "writer" and not include_writer:
+            continue
+        try:
+            async with engine.connect() as connection:
+                status[name] = await connection.scalar(sa.text("SELECT 1")) == 1
+        except (sa.exc.DBAPIError, OSError):
+            logging.exception(f"Database engine {name} is not alive.")
+            status[name] = False
+    return status
+
+
 async def table_exists(name: str, database_manager: DatabaseManager):
     """
     Checks if a table exists.
@@ -53,17 +127,106 @@ async def get(
     object_class: type[CustomBase] | None = None,
     one_or_none: bool = False,
     with_deleted: bool = False,
+    load: dict[str, LoadStrategyModel] | None = None,
+    load_only: Sequence[str] | None = None,
+    defer: Sequence[str] | None = None,
+    cached: bool = False,
 ):
-    result = (
-        (await session.execute(statement.where(sa.and_(object_class.deleted.is_(None)))))
-        if (object_class and not with_deleted)
-        else (await session.execute(statement))
-    )
+    """
+    Gets the first row of statement.
 
-    if one_or_none:
-        return result.scalar_one_or_none()
+    :param load: relationships to load, see find
+    :param load_only: the only columns to load, see find
+    :param defer: columns not to load, see find
+    :param cached: whether to use the result cache of the DatabaseManager, see QueryResultCache; only statements
+        selecting a single CustomBase model, without load, load_only or defer, are cached
+
+    While an organization is set (see matter_persistence.tenancy), statements of models with an organization_id column
+    only get rows of that organization.
+    """
+    loading = _get_loading_shape(load, load_only, defer)
+    if loading is not None:
+        statement = statement.options(
+            *_get_loader_options(object_class or statement.column_descriptions[0]["entity"], *loading)
+        )
+    if object_class and not with_deleted:
+        statement = statement.where(sa.and_(object_class.deleted.is_(None)))
+    organization_id = get_organization_id()
+    if organization_id is not None:
+        scoped_model = object_class or statement.column_descriptions[0]["entity"]
+        if _has_organization_column(scoped_model):
+            statement = statement.where(getattr(scoped_model, ORGANIZATION_COLUMN) == organization_id)
+
+    result_cache = get_result_cache(session) if cached and loading is None else None
+    cache_key = None
+    if result_cache is not None and len(statement.column_descriptions) == 1:
+        entity = statement.column_descriptions[0]["entity"]
+        if isinstance(entity, type) and issubclass(entity, CustomBase):
+            compiled = statement.compile(dialect=session.get_bind().dialect)
+            cache_key, rows = await result_cache.lookup(
+                session,
+                entity,
+                find_tables(statement),
+                _get_cache_scope(None),
+                ("get", str(compiled), sorted(compiled.params.items()), one_or_none),
+            )
+            if rows is not None:
+                return rows[0] if rows else None
+
+    result = await session.execute(statement)
+    if _has_joined_load(loading):
+        result = result.unique()
+
+    row = result.scalar_one_or_none() if one_or_none else result.scalar()
+    if cache_key is not None:
+        await result_cache.store(entity, cache_key, [row] if row is not None else [])  # type: ignore[union-attr]
+    return row
+
+
+@retry_if_failed
+async def get_many(
+    session: AsyncSession,
+    db_model: type[CustomBase],
+    ids: Sequence[UUID],
+    with_deleted: bool = False,
+    load: dict[str, LoadStrategyModel] | None = None,
+    load_only: Sequence[str] | None = None,
+    defer: Sequence[str] | None = None,
+) -> list[CustomBase | None]:
+    """
+    Gets many rows by id with a single query (WHERE id = ANY(:ids) on PostgreSQL, WHERE id IN (...) elsewhere).
+
+    :param load: relationships to load, see find
+    :param load_only: the only columns to load, see find
+    :param defer: columns not to load, see find
+    :return: the rows in the order of ids, with None for ids that don't exist (or are deleted, unless with_deleted)
+    """
+    unique_ids = list(dict.fromkeys(ids))
+    if not unique_ids:
+        return []
+
+    if session.get_bind().dialect.name == "postgresql":
+        # a single array parameter keeps the statement the same for any number of ids
+        id_filter = db_model.id == sa.any_(sa.bindparam("ids", unique_ids, type_=postgresql.ARRAY(db_model.id.type)))
     else:
-        return result.scalar()
+        id_filter = db_model.id.in_(unique_ids)
+
+    q = sa.select(db_model).where(id_filter)
+    if not with_deleted:
+        q = q.where(db_model.deleted.is_(None))
+    organization_id = get_organization_id()
+    if organization_id is not None and _has_organization_column(db_model):
+        q = q.where(getattr(db_model, ORGANIZATION_COLUMN) == organization_id)
+
+    loading = _get_loading_shape(load, load_only, defer)
+    if loading is not None:
+        q = q.options(*_get_loader_options(db_model, *loading))
+
+    result = await session.scalars(q)
+    if _has_joined_load(loading):
+        result = result.unique()
+    rows_by_id = {row.id: row for row in result.all()}
+    return [rows_by_id.get(id) for id in ids]
 
 
 @retry_if_failed
@@ -79,14 +242,370 @@ async def find(
     sort_field: str | None = None,
     sort_method: SortMethodModel | None = None,
     joined_field: str | None = None,
+    load: dict[str, LoadStrategyModel] | None = None,
+    load_only: Sequence[str] | None = None,
+    defer: Sequence[str] | None = None,
+    cached: bool = False,
 ):
+    """
+    Finds rows of db_model.
+
+    Relationships are not loaded unless requested: joined_field loads one relationship with a join, load takes
+    several relationships or dotted paths to nested relationships (e.g. {"children": LoadStrategyModel.SELECTIN,
+    "children.toys": LoadStrategyModel.SELECTIN, "*": LoadStrategyModel.RAISE}). Relationships on a path that are
+    not in load themselves are loaded with the strategy of the path (or their default one, for RAISE).
+
+    :param load: strategy per relationship path
+    :param load_only: the only columns to load (other than the primary key), optionally on a relationship path,
+        e.g. ["name", "children.name"]; other columns are loaded when accessed, or raise if "*" is RAISE
+    :param defer: columns not to load, e.g. blobs that aren't needed, with the same syntax as load_only
+    :param cached: whether to use the result cache of the DatabaseManager, see QueryResultCache; results are scoped
+        by the organization of the context (see matter_persistence.tenancy) or else the organization_id filter, if
+        any. Calls with one_or_none, custom_filter, joined_field, load, load_only or defer are not cached
+    """
+    filters = _scope_to_organization(db_model, filters)
+    loading = _get_loading_shape(load, load_only, defer)
+    result_cache = get_result_cache(session) if cached else None
+    cache_key = None
+    if result_cache is not None and not one_or_none and custom_filter is None and joined_field is None and not loading:
+        table: sa.Table = db_model.__table__  # type: ignore[assignment]
+        cache_key, cached_rows = await result_cache.lookup(
+            session,
+            db_model,
+            [table],
+            _get_cache_scope(filters),
+            ("find", sorted((filters or {}).items()), skip, limit, with_deleted, sort_field, sort_method),
+        )
+        if cached_rows is not None:
+            return cached_rows
+
+    if custom_filter is None:
+        # without a custom filter, the statement only depends on the "shape" of the arguments, so it's built once
+        # per shape and the values are bound on execution
+        filter_shape = tuple((key, value is None) for key, value in (filters or {}).items())
+        q, filter_keys = _get_find_statement(
+            db_model,
+            filter_shape,
+            with_deleted,
+            sort_field,
+            sort_method,
+            joined_field,
+            bool(skip),
+            bool(limit),
+            loading,
+        )
+        params = {f"filter_{key}": filters[key] for key in filter_keys}  # type: ignore[index]
+        params.update(find_skip=skip, find_limit=limit)
+        result = await session.execute(q, params)
+    else:
+        q = _build_find_query(db_model, with_deleted, filters, custom_filter, joined_field, loading)
+        q = _apply_sort_and_pagination(q, db_model, skip, limit, sort_field, sort_method)
+        result = await session.execute(q)
+
+    if _has_joined_load(loading):
+        # joined loads of collections repeat the parent row for every child
+        result = result.unique()
+
+    if one_or_none:
+        return result.scalar_one_or_none().all()  # type: ignore
+
+    rows = result.scalars().all()
+    if cache_key is not None:
+        await result_cache.store(db_model, cache_key, rows)  # type: ignore[union-attr]
+    return rows
+
+
+@retry_if_failed
+async def count(
+    session: AsyncSession,
+    db_model: type[CustomBase],
+    with_deleted: bool = False,
+    filters: dict | None = None,
+    custom_filter: Callable[[sa.Select], sa.Select] | None = None,
+) -> int:
+    """
+    Counts the rows find would return for the same arguments, with a SELECT count(*) query.
+    """
+    q = _build_find_query(db_model, with_deleted, filters, custom_filter)
+    result = await session.execute(q.with_only_columns(sa.func.count(), maintain_column_froms=True))
+    return result.scalar_one()
+
+
+@retry_if_failed
+async def exists(
+    session: AsyncSession,
+    db_model: type[CustomBase],
+    with_deleted: bool = False,
+    filters: dict | None = None,
+    custom_filter: Callable[[sa.Select], sa.Select] | None = None,
+) -> bool:
+    """
+    Checks whether find would return any row for the same arguments, with a SELECT EXISTS(...) query.
+    """
+    q = _build_find_query(db_model, with_deleted, filters, custom_filter)
+    result = await session.execute(sa.select(q.exists()))
+    return bool(result.scalar_one())
+
+
+@retry_if_failed
+async def find_with_count(
+    session: AsyncSession,
+    db_model: type[CustomBase],
+    skip: int = 0,
+    limit: int | None = None,
+    with_deleted: bool = False,
+    filters: dict | None = None,
+    custom_filter: Callable[[sa.Select], sa.Select] | None = None,
+    sort_field: str | None = None,
+    sort_method: SortMethodModel | None = None,
+    joined_field: str | None = None,
+    load: dict[str, LoadStrategyModel] | None = None,
+    load_only: Sequence[str] | None = None,
+    defer: Sequence[str] | None = None,
+) -> tuple[Sequence[CustomBase], int]:
+    """
+    Like find, but also returns the total number of matching rows, ignoring skip and limit.
+
+    The total is computed by the same query, with a count(*) OVER () window column; a separate count query is only
+    needed when joined_field or a JOINED load is given (the join would multiply the counted rows) or the page is
+    empty.
+
+    :return: the rows of the page and the total number of rows
+    """
+    loading = _get_loading_shape(load, load_only, defer)
+    if joined_field or _has_joined_load(loading):
+        rows = await find(
+            session,
+            db_model,
+            skip=skip,
+            limit=limit,
+            with_deleted=with_deleted,
+            filters=filters,
+            custom_filter=custom_filter,
+            sort_field=sort_field,
+            sort_method=sort_method,
+            joined_field=joined_field,
+            load=load,
+            load_only=load_only,
+            defer=defer,
+        )
+        return rows, await count(session, db_model, with_deleted, filters, custom_filter)
+
+    q = _build_find_query(db_model, with_deleted, filters, custom_filter, loading=loading)
+    q = q.add_columns(sa.func.count().over().label("total_count"))
+    q = _apply_sort_and_pagination(q, db_model, skip, limit, sort_field, sort_method)
+
+    result = (await session.execute(q)).all()
+    if not result:
+        return [], (await count(session, db_model, with_deleted, filters, custom_filter)) if skip else 0
+    return [row[0] for row in result], result[0].total_count
+
+
+async def stream(
+    session: AsyncSession,
+    db_model: type[CustomBase],
+    skip: int = 0,
+    limit: int | None = None,
+    with_deleted: bool = False,
+    filters: dict | None = None,
+    custom_filter: Callable[[sa.Select], sa.Select] | None = None,
+    sort_field: str | None = None,
+    sort_method: SortMethodModel | None = None,
+    yield_per: int = 1000,
+    partitions: bool = False,
+    as_rows: bool = False,
+) -> AsyncIterator[Any]:
+    """
+    Like find, but iterates over the result instead of loading all of it into memory at once.
+
+    The rows are fetched from a server side cursor, yield_per rows at a time, so memory usage doesn't depend on the
+    number of rows. The session must stay open while iterating, and it isn't retried on failure, as rows might have
+    been consumed already.
+
+    :param yield_per: number of rows fetched from the database at a time
+    :param partitions: whether to yield lists of (up to) yield_per rows instead of single rows
+    :param as_rows: whether to yield Core Row tuples with the columns of db_model instead of ORM objects, which
+        avoids building ORM objects and tracking them in the session
+    """
+    q = _build_find_query(db_model, with_deleted, filters, custom_filter)
+    if as_rows:
+        q = q.with_only_columns(*db_model.__table__.columns)
+    q = _apply_sort_and_pagination(q, db_model, skip, limit, sort_field, sort_method)
+
+    result = await session.stream(q.execution_options(yield_per=yield_per))
+    rows = result if as_rows else result.scalars()
+    try:
+        if partitions:
+            async for partition in rows.partitions():
+                yield partition
+        else:
+            async for row in rows:
+                yield row
+    finally:
+        await result.close()
+
+
+@retry_if_failed
+async def find_page(
+    session: AsyncSession,
+    db_model: type[CustomBase],
+    limit: int,
+    cursor: str | None = None,
+    with_deleted: bool = False,
+    filters: dict | None = None,
+    custom_filter: Callable[[sa.Select], sa.Select] | None = None,
+    sort_field: str = "created",
+    sort_method: SortMethodModel | None = None,
+    joined_field: str | None = None,
+    load: dict[str, LoadStrategyModel] | None = None,
+    load_only: Sequence[str] | None = None,
+    defer: Sequence[str] | None = None,
+) -> tuple[Sequence[CustomBase], str | None]:
+    """
+    Finds a page of rows using keyset (cursor) pagination.
+
+    Instead of skipping rows with OFFSET, the page starts right after the (sort_field, id) position encoded in the
+    cursor, so getting a page costs the same no matter how deep it is. The rows are sorted by sort_field and then by
+    id, both in the direction of sort_method (descending by default, like find). sort_field must not be nullable.
+
+    :param limit: maximum number of rows in the page
+    :param cursor: the cursor returned with the previous page, or None to get the first page
+    :param load: relationships to load, see find
+    :param load_only: the only columns to load, see find; must include sort_field
+    :param defer: columns not to load, see find
+    :return: the rows of the page and the cursor of the next page, which is None if this is the last page
+    """
+    loading = _get_loading_shape(load, load_only, defer)
+    q = _build_find_query(db_model, with_deleted, filters, custom_filter, joined_field, loading)
+    sort_column = _get_sort_column(db_model, sort_field)
+    ascending = sort_method == SortMethodModel.ASC
+
+    if cursor is not None:
+        last_sort_value, last_id = _decode_cursor(cursor, sort_column)
+        last_position = sa.tuple_(sa.literal(last_sort_value, sort_column.type), sa.literal(last_id, db_model.id.type))
+        q = q.filter(
+            sa.tuple_(sort_column, db_model.id) > last_position
+            if ascending
+            else sa.tuple_(sort_column, db_model.id) < last_position
+        )
+
+    q = q.order_by(sort_column, db_model.id) if ascending else q.order_by(sort_column.desc(), db_model.id.desc())
+    result = await session.execute(q.limit(limit + 1))
+    if _has_joined_load(loading):
+        result = result.unique()
+    rows = result.scalars().all()
+
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    return rows, _encode_cursor(getattr(rows[-1], sort_field), rows[-1].id)
+
+
+@lru_cache(maxsize=512)
+def _get_find_statement(
+    db_model: type[CustomBase],
+    filter_shape: tuple[tuple[str, bool], ...],
+    with_deleted: bool,
+    sort_field: str | None,
+    sort_method: SortMethodModel | None,
+    joined_field: str | None,
+    with_skip: bool,
+    with_limit: bool,
+    loading: LoadingShape | None = None,
+) -> tuple[sa.Select, tuple[str, ...]]:
+    """
+    Builds the find statement for the given shape of arguments, with bound parameters instead of values:
+    filter_<key> for every (not None) filter, find_skip and find_limit.
+
+    Reusing the statement object also lets SQLAlchemy reuse its memoized cache key.
+
+    :param filter_shape: (key, whether the value is None) for every filter, as None values are compared with IS NULL
+    :return: the statement and the keys of the filters that need a bound value
+    """
+    q: sa.Select = sa.select(db_model)
+
+    if joined_field:
+        q = q.options(joinedload(getattr(db_model, joined_field)))
+    if loading is not None:
+        q = q.options(*_get_loader_options(db_model, *loading))
+
+    filter_keys = []
+    for key, is_none in filter_shape:
+        if hasattr(db_model, key):
+            column = getattr(db_model, key)
+            if is_none:
+                q = q.filter(column.is_(None))
+            else:
+                q = q.filter(column == sa.bindparam(f"filter_{key}"))
+                filter_keys.append(key)
+
+    if not with_deleted:
+        q = q.filter(db_model.deleted.is_(None))
+
+    q = _apply_sort_and_pagination(q, db_model, sort_field=sort_field, sort_method=sort_method)
+    # statements are built once per shape, so the warning is too
+    _warn_if_no_usable_index(
+        db_model, [key for key, _ in filter_shape], sort_field if with_limit else None, with_deleted
+    )
+    if with_skip:
+        q = q.offset(sa.bindparam("find_skip", type_=sa.Integer))
+    if with_limit:
+        q = q.limit(sa.bindparam("find_limit", type_=sa.Integer))
+
+    return q, tuple(filter_keys)
+
+
+def _warn_if_no_usable_index(
+    db_model: type[CustomBase], filter_keys: Sequence[str], sort_field: str | None, with_deleted: bool
+) -> None:
+    """
+    Warns when no index of db_model starts with one of the filtered columns (or, without filters, with the sort
+    column), as the database then has to scan the whole table. Indexes created with active_index are only usable
+    without with_deleted.
+    """
+    mapper_columns = sa.inspect(db_model).columns
+    leading_columns = {mapper_columns[key].name for key in filter_keys if key in mapper_columns}
+    if not leading_columns and sort_field is not None and sort_field in mapper_columns:
+        leading_columns = {mapper_columns[sort_field].name}
+    if not leading_columns:
+        return
+
+    table: sa.Table = db_model.__table__  # type: ignore[assignment]
+    indexed_columns = [
+        [column.name for column in index.columns]
+        for index in table.indexes
+        if (not with_deleted and is_active_index(index))
+        or (index.dialect_options["postgresql"]["where"] is None and index.dialect_options["sqlite"]["where"] is None)
+    ]
+    indexed_columns.extend(
+        [column.name for column in constraint.columns]
+        for constraint in table.constraints
+        if isinstance(constraint, sa.PrimaryKeyConstraint | sa.UniqueConstraint)
+    )
+    if not any(columns and columns[0] in leading_columns for columns in indexed_columns):
+        logging.warning(
+            f"No index of {table.name} starts with any of {', '.join(sorted(leading_columns))}, so find has to scan "
+            f"the whole table; consider adding one, e.g. with active_index."
+        )
+
+
+def _build_find_query(
+    db_model: type[CustomBase],
+    with_deleted: bool = False,
+    filters: dict | None = None,
+    custom_filter: Callable[[sa.Select], sa.Select] | None = None,
+    joined_field: str | None = None,
+    loading: LoadingShape | None = None,
+) -> sa.Select:
     q: sa.Select = sa.select(db_model)  # Query is deprecated, hence using Select
 
     if joined_field:
         q = q.options(joinedload(getattr(db_model, joined_field)))
+    if loading is not None:
+        q = q.options(*_get_loader_options(db_model, *loading))
 
-    if filters is None:
-        filters = {}
+    filters = _scope_to_organization(db_model, filters) or {}
 
     for key, value in filters.items():
         if hasattr(db_model, key):
@@ -98,31 +617,697 @@ async def find(
     if not with_deleted:
         q = q.filter(db_model.deleted.is_(None))
 
+    return q
+
+
+def _scope_to_organization(db_model: type[CustomBase], filters: dict | None) -> dict | None:
+    """
+    Adds the organization of the context (see matter_persistence.tenancy) to filters, if db_model has an
+    organization_id column. Filters that name another organization_id raise DatabaseOrganizationMismatchError.
+    """
+    organization_id = get_organization_id()
+    if organization_id is None or not _has_organization_column(db_model):
+        return filters
+    if filters and ORGANIZATION_COLUMN in filters:
+        _check_organization(db_model, filters[ORGANIZATION_COLUMN])
+        return filters
+    return {**(filters or {}), ORGANIZATION_COLUMN: organization_id}
+
+
+def _scope_rows_to_organization(db_model: type[CustomBase], rows: list[dict[str, Any]], fill: bool) -> None:
+    """
+    Checks that rows to write belong to the organization of the context, if db_model has an organization_id column.
+
+    :param fill: whether to set the organization of rows that don't have one, e.g. of rows to insert
+    """
+    organization_id = get_organization_id()
+    if organization_id is None or not _has_organization_column(db_model):
+        return
+    for row in rows:
+        if ORGANIZATION_COLUMN in row or not fill:
+            _check_organization(db_model, row.get(ORGANIZATION_COLUMN, organization_id))
+        else:
+            row[ORGANIZATION_COLUMN] = organization_id
+
+
+def _get_organization_criteria(db_model: type[CustomBase]) -> list[sa.ColumnElement[bool]]:
+    """
+    The WHERE criteria that limit statements of db_model to the organization of the context, if any.
+    """
+    organization_id = get_organization_id()
+    if organization_id is None or not _has_organization_column(db_model):
+        return []
+    return [getattr(db_model, ORGANIZATION_COLUMN) == organization_id]
+
+
+def _check_organization(db_model: type[CustomBase], organization_id: Any) -> None:
+    context_organization_id = get_organization_id()
+    if organization_id != context_organization_id:
+        raise DatabaseOrganizationMismatchError(
+            description=f"{db_model.__name__} rows of organization {organization_id} can't be accessed in the "
+            f"context of organization {context_organization_id}",
+            detail={
+                "db_model": db_model.__name__,
+                "organization_id": organization_id,
+                "context_organization_id": context_organization_id,
+            },
+        )
+
+
+def _has_organization_column(db_model: Any) -> bool:
+    return (
+        isinstance(db_model, type)
+        and issubclass(db_model, CustomBase)
+        and ORGANIZATION_COLUMN in get_column_keys(db_model)
+    )
+
+
+def _get_cache_scope(filters: dict | None) -> Any:
+    # the results of different organizations are cached under different keys
+    organization_id = get_organization_id()
+    if organization_id is not None:
+        return organization_id
+    return (filters or {}).get(ORGANIZATION_COLUMN, "all")
+
+
+def _get_loading_shape(
+    load: dict[str, LoadStrategyModel] | None,
+    load_only: Sequence[str] | None,
+    defer: Sequence[str] | None,
+) -> LoadingShape | None:
+    if not (load or load_only or defer):
+        return None
+    return tuple((load or {}).items()), tuple(load_only or ()), tuple(defer or ())
+
+
+def _has_joined_load(loading: LoadingShape | None) -> bool:
+    return loading is not None and any(strategy == LoadStrategyModel.JOINED for _, strategy in loading[0])
+
+
+@lru_cache(maxsize=256)
+def _get_loader_options(
+    db_model: type[CustomBase],
+    load: tuple[tuple[str, LoadStrategyModel], ...],
+    load_only: tuple[str, ...],
+    defer: tuple[str, ...],
+) -> tuple[orm.interfaces.LoaderOption, ...]:
+    """
+    Builds the loader options of a loading shape, see find.
+    """
+    strategies = dict(load)
+    options = []
+
+    for path, strategy in load:
+        if path == "*":
+            options.append(_LOADERS[strategy]("*"))
+            continue
+
+        entity = db_model
+        names = path.split(".")
+        loaders = []
+        for depth, name in enumerate(names, start=1):
+            relationship = _get_relationship(db_model, entity, path, name)
+            prefix = ".".join(names[:depth])
+            if prefix == path:
+                loader = _LOADERS[strategy]
+            elif prefix in strategies or strategy == LoadStrategyModel.RAISE:
+                # loaded by its own option (or by default)
+                loader = defaultload
+            else:
+                loader = _LOADERS[strategy]
+            loaders.append((loader, relationship))
+            entity = relationship.property.mapper.class_
+
+        (loader, relationship), *nested_loaders = loaders
+        option = loader(relationship)
+        for loader, relationship in nested_loaders:
+            option = getattr(option, loader.__name__)(relationship)
+        options.append(option)
+
+    for columns, column_loader in ((load_only, "load_only"), (defer, "defer")):
+        columns_by_path: dict[str, list[str]] = {}
+        for column in columns:
+            path, _, name = column.rpartition(".")
+            columns_by_path.setdefault(path, []).append(name)
+
+        for path, names in columns_by_path.items():
+            # the option of the relationship the columns belong to
+            parent, entity = None, db_model
+            for name in path.split(".") if path else ():
+                relationship = _get_relationship(db_model, entity, path, name)
+                parent = defaultload(relationship) if parent is None else parent.defaultload(relationship)
+                entity = relationship.property.mapper.class_
+
+            attributes = [_get_column(db_model, entity, path, name) for name in names]
+            if column_loader == "load_only":
+                options.append(orm.load_only(*attributes) if parent is None else parent.load_only(*attributes))
+            else:
+                options.extend(
+                    orm.defer(attribute) if parent is None else parent.defer(attribute) for attribute in attributes
+                )
+
+    return tuple(options)
+
+
+def _get_relationship(db_model: type[CustomBase], entity: type, path: str, name: str):
+    if name not in sa.inspect(entity).relationships:
+        raise DatabaseInvalidLoadFieldError(
+            description=f"'{name}' in '{path}' isn't a relationship of {entity.__name__}",
+            detail={"db_model": db_model.__name__, "path": path, "field": name},
+        )
+    return getattr(entity, name)
+
+
+def _get_column(db_model: type[CustomBase], entity: type, path: str, name: str):
+    if name not in sa.inspect(entity).column_attrs:
+        raise DatabaseInvalidLoadFieldError(
+            description=f"'{name}' isn't a column of {entity.__name__}",
+            detail={"db_model": db_model.__name__, "path": path, "field": name},
+        )
+    return getattr(entity, name)
+
+
+def _apply_sort_and_pagination(
+    q: sa.Select,
+    db_model: type[CustomBase],
+    skip: int = 0,
+    limit: int | None = None,
+    sort_field: str | None = None,
+    sort_method: SortMethodModel | None = None,
+) -> sa.Select:
     if sort_field is not None:
-        try:
-            q = (
-                q.order_by(getattr(db_model, sort_field))
-                if sort_method == SortMethodModel.ASC
-                else q.order_by(getattr(db_model, sort_field).desc())
-            )
-        except AttributeError as exc:
-            raise DatabaseInvalidSortFieldError(
-                description=f"The Sort Field '{sort_field}' you selected doesn't exist: {str(exc)}",
-                detail={"sort_field": sort_field, "exception": exc},
-            )
+        sort_column = _get_sort_column(db_model, sort_field)
+        q = q.order_by(sort_column) if sort_method == SortMethodModel.ASC else q.order_by(sort_column.desc())
 
     if skip:
         q = q.offset(skip)
     if limit:
         q = q.limit(limit)
 
-    result = await session.execute(q)
-    if one_or_none:
-        return result.scalar_one_or_none().all()  # type: ignore
-    else:
-        return result.scalars().all()
+    return q
+
+
+def _get_sort_column(db_model: type[CustomBase], sort_field: str):
+    try:
+        return getattr(db_model, sort_field)
+    except AttributeError as exc:
+        raise DatabaseInvalidSortFieldError(
+            description=f"The Sort Field '{sort_field}' you selected doesn't exist: {str(exc)}",
+            detail={"sort_field": sort_field, "exception": exc},
+        )
+
+
+def _encode_cursor(sort_value: Any, id: UUID) -> str:
+    return base64.urlsafe_b64encode(to_json([sort_value, id])).decode()
+
+
+def _decode_cursor(cursor: str, sort_column) -> tuple[Any, UUID]:
+    try:
+        sort_value, id = from_json(base64.urlsafe_b64decode(cursor))
+        return _get_cursor_adapter(sort_column.type).validate_python(sort_value), UUID(id)
+    except (ValueError, TypeError, AttributeError) as exc:
+        raise DatabaseInvalidCursorError(
+            description=f"The cursor '{cursor}' is not valid: {str(exc)}",
+            detail={"cursor": cursor, "exception": exc},
+        )
+
+
+@lru_cache(maxsize=128)
+def _get_cursor_adapter(column_type: sa.types.TypeEngine) -> TypeAdapter:
+    try:
+        return TypeAdapter(column_type.python_type)
+    except NotImplementedError:
+        return TypeAdapter(Any)
+
+
+@retry_if_failed
+async def bulk_insert(
+    session: AsyncSession,
+    db_model: type[CustomBase],
+    values: Sequence[dict | BaseModel],
+    batch_size: int = 1000,
+) -> list[UUID]:
+    """
+    Inserts many rows with as few statements as possible (executemany / insertmanyvalues batches).
+
+    Values may be dictionaries or pydantic models; like CustomBase.parse_dict, keys that aren't columns of db_model
+    are ignored. Missing ids and created/updated timestamps are filled in, as is the organization of the context
+    (see matter_persistence.tenancy); rows of other organizations raise DatabaseOrganizationMismatchError.
+
+    :return: the ids of the inserted rows, in the order of values
+    """
+    rows = prepare_insert_rows(db_model, values)
+    _scope_rows_to_organization(db_model, rows, fill=True)
+    for batch in batched(rows, batch_size):
+        await session.execute(sa.insert(db_model), batch)
+    return [row["id"] for row in rows]
+
+
+@retry_if_failed
+async def bulk_upsert(
+    session: AsyncSession,
+    db_model: type[CustomBase],
+    values: Sequence[dict | BaseModel],
+    index_elements: Sequence[str] = ("id",),
+    batch_size: int = 1000,
+) -> list[UUID]:
+    """
+    Inserts many rows, updating the existing rows that conflict with them on index_elements instead.
+
+    On PostgreSQL and SQLite this is done with INSERT ... ON CONFLICT DO UPDATE; other dialects look up the existing
+    rows first and then use bulk_insert and bulk_update. The created timestamp of existing rows is kept. Like
+    bulk_insert, rows are scoped to the organization of the context; rows that conflict with rows of another
+    organization raise DatabaseOrganizationMismatchError.
+
+    :param index_elements: the columns of a unique index (or primary key) that identify existing rows
+    :return: the ids of the inserted or updated rows, in the order of values
+    """
+    rows = prepare_insert_rows(db_model, values)
+    _scope_rows_to_organization(db_model, rows, fill=True)
+    dialect_name = session.get_bind().dialect.name
+    if dialect_name not in ("postgresql", "sqlite"):
+        return await _bulk_upsert_without_on_conflict(session, db_model, rows, index_elements, batch_size)
+
+    insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    organization_criteria = _get_organization_criteria(db_model)
+    # every statement sets the columns of its rows, so rows with different columns need different statements
+    for columns, rows_with_columns in group_by_columns(rows).items():
+        insert_statement = insert(db_model)
+        statement = insert_statement.on_conflict_do_update(
+            index_elements=list(index_elements),
+            set_={
+                column: insert_statement.excluded[column]
+                for column in columns
+                if column not in ("id", "created", *index_elements)
+            },
+            where=sa.and_(*organization_criteria) if organization_criteria else None,
+        ).returning(db_model.id, sort_by_parameter_order=True)
+        for batch in batched(rows_with_columns, batch_size):
+            await _check_no_rows_of_other_organizations(session, db_model, index_elements, batch)
+            # rows that conflict on index_elements other than id keep the id of the existing row
+            for row, id in zip(batch, (await session.scalars(statement, batch)).all(), strict=True):
+                row["id"] = id
+    return [row["id"] for row in rows]
+
+
+@retry_if_failed
+async def bulk_update(
+    session: AsyncSession,
+    db_model: type[CustomBase],
+    values: Sequence[dict],
+    batch_size: int = 1000,
+) -> list[UUID]:
+    """
+    Updates many rows by primary key with executemany batches. Every value must contain the id of its row, the
+    other keys are the columns to update. The updated timestamp is set, unless given. While an organization is set
+    (see matter_persistence.tenancy), rows of other organizations aren't updated, and values that move rows to
+    another organization raise DatabaseOrganizationMismatchError.
+
+    :return: the ids of the updated rows, in the order of values
+    """
+    now = datetime_with_utc_tz()
+    rows = [{"updated": now, **value} for value in values]
+    _scope_rows_to_organization(db_model, rows, fill=False)
+    statement = _get_update_by_id_statement(db_model)
+    for batch in batched(rows, batch_size):
+        await session.execute(statement, batch)
+    return [row["id"] for row in rows]
+
+
+@retry_if_failed
+async def bulk_soft_delete(
+    session: AsyncSession,
+    db_model: type[CustomBase],
+    ids: Sequence[UUID],
+    batch_size: int = 1000,
+) -> list[UUID]:
+    """
+    Soft deletes many rows, setting their deleted (and updated) timestamps. Rows that are already deleted are kept
+    as they are, as are the rows of other organizations than the one of the context (see matter_persistence.tenancy).
+
+    :return: the ids of the rows that were deleted
+    """
+    now = datetime_with_utc_tz()
+    organization_criteria = _get_organization_criteria(db_model)
+    deleted_ids: list[UUID] = []
+    for batch in batched(ids, batch_size):
+        not_deleted = sa.and_(db_model.id.in_(batch), db_model.deleted.is_(None), *organization_criteria)
+        if not session.get_bind().dialect.update_returning:
+            deleted_ids.extend((await session.scalars(sa.select(db_model.id).where(not_deleted))).all())
+            await session.execute(sa.update(db_model).where(not_deleted).values(deleted=now, updated=now))
+        else:
+            statement = sa.update(db_model).where(not_deleted).values(deleted=now, updated=now).returning(db_model.id)
+            deleted_ids.extend((await session.scalars(statement)).all())
+    return deleted_ids
+
+
+class CopyFormat(Enum):
+    CSV = "csv"
+    BINARY = "binary"  # PostgreSQL's binary COPY format
+
+
+async def bulk_load(
+    session: AsyncSession,
+    db_model: type[CustomBase],
+    records: AsyncIterable[BaseModel | dict | tuple] | Iterable[BaseModel | dict | tuple],
+    columns: Sequence[str] | None = None,
+    batch_size: int = 10_000,
+) -> int:
+    """
+    Loads a large number of rows, e.g. an import of millions of rows, from an (async) iterable of records, without
+    holding more than a batch of them in memory.
+
+    On PostgreSQL with asyncpg the rows are streamed with a binary COPY ... FROM STDIN, which is much faster than
+    INSERT statements; other dialects (e.g. SQLite) insert them with executemany batches of batch_size rows. Like
+    bulk_insert, missing ids and created/updated timestamps and the organization of the context are filled in.
+    Records that are tuples need columns, the keys of their values; for dictionaries and pydantic models columns
+    default to the column keys of the first record, and every record must have the same keys. It isn't retried on
+    failure, as records might have been consumed already.
+
+    :param columns: the column keys of the values of the records, in the order of tuples
+    :param batch_size: number of rows inserted by a single statement, when COPY isn't available
+    :return: the number of loaded rows
+    """
+    record_iterator = _iterate_async(records)
+    try:
+        first_record = await anext(record_iterator)
+    except StopAsyncIteration:
+        return 0
+    if columns is None:
+        if isinstance(first_record, tuple):
+            raise ValueError("columns are required to load tuples")
+        first_values = _get_record_values(first_record)
+        columns = [key for key in get_column_keys_in_order(db_model) if key in first_values]
+    elif unknown_columns := set(columns) - get_column_keys(db_model):
+        raise ValueError(f"{db_model.__name__} has no columns named: {', '.join(sorted(unknown_columns))}")
+
+    # the keys of the rows; ids, timestamps and the organization that aren't given are appended to every row
+    now = datetime_with_utc_tz()
+    organization_id = get_organization_id() if _has_organization_column(db_model) else None
+    default_values = {"id": uuid4, "created": lambda: now, "updated": lambda: now}
+    if organization_id is not None:
+        default_values[ORGANIZATION_COLUMN] = lambda: organization_id
+    default_values = {key: default for key, default in default_values.items() if key not in columns}
+    keys = [*columns, *default_values]
+    organization_index = (
+        columns.index(ORGANIZATION_COLUMN) if organization_id is not None and ORGANIZATION_COLUMN in columns else None
+    )
+
+    async def rows() -> AsyncIterator[tuple]:
+        async for record in _chain_async(first_record, record_iterator):
+            if isinstance(record, tuple):
+                values = record
+            else:
+                record_values = _get_record_values(record)
+                values = tuple(record_values.get(column) for column in columns)
+            if organization_index is not None:
+                _check_organization(db_model, values[organization_index])
+            yield (*values, *(default() for default in default_values.values()))
+
+    connection = await session.connection()
+    mapper_columns = sa.inspect(db_model).columns
+    table: sa.Table = db_model.__table__  # type: ignore[assignment]
+    if connection.dialect.name == "postgresql" and connection.dialect.driver == "asyncpg":
+        # COPY bypasses the bind processing of the column types, e.g. of Enum columns
+        dialect = connection.dialect
+        bind_processors = [mapper_columns[key].type.dialect_impl(dialect).bind_processor(dialect) for key in keys]
+        processors = [(i, processor) for i, processor in enumerate(bind_processors) if processor is not None]
+
+        loaded = 0
+
+        async def records_to_copy() -> AsyncIterator[tuple]:
+            nonlocal loaded
+            async for row in rows():
+                if processors:
+                    row_values = list(row)
+                    for i, processor in processors:
+                        row_values[i] = processor(row_values[i])
+                    row = tuple(row_values)
+                loaded += 1
+                yield row
+
+        driver_connection = (await connection.get_raw_connection()).driver_connection
+        await driver_connection.copy_records_to_table(  # type: ignore[union-attr]
+            table.name,
+            records=records_to_copy(),
+            columns=[mapper_columns[key].name for key in keys],
+            # COPY bypasses the schema_translate_map of the session too, e.g. of organization_schemas
+            schema_name=_get_schema_translate_map(session).get(table.schema, table.schema),
+        )
+        return loaded
+
+    loaded = 0
+    batch = []
+    async for row in rows():
+        batch.append(dict(zip(keys, row, strict=True)))
+        if len(batch) >= batch_size:
+            await session.execute(sa.insert(db_model), batch)
+            loaded += len(batch)
+            batch = []
+    if batch:
+        await session.execute(sa.insert(db_model), batch)
+        loaded += len(batch)
+    return loaded
+
+
+async def bulk_export(
+    session: AsyncSession,
+    db_model: type[CustomBase],
+    columns: Sequence[str] | None = None,
+    with_deleted: bool = False,
+    filters: dict | None = None,
+    custom_filter: Callable[[sa.Select], sa.Select] | None = None,
+    format: CopyFormat = CopyFormat.CSV,
+    header: bool = True,
+    yield_per: int = 10_000,
+    max_pending_chunks: int = 16,
+) -> AsyncIterator[bytes]:
+    """
+    Exports the rows of db_model that find would return (in no particular order) as chunks of CSV (or PostgreSQL
+    binary COPY format), e.g. to write them to a file or an object store, without holding more than a few chunks in
+    memory.
+
+    On PostgreSQL with asyncpg the chunks come from a COPY (query) TO STDOUT; when the chunks aren't consumed fast
+    enough, the COPY waits once max_pending_chunks are pending. Other dialects (e.g. SQLite) stream the rows from a
+    server side cursor, yield_per rows at a time, and write them with the csv module, so values are formatted the
+    Python way (e.g. True instead of t) and the binary format isn't available. The session must stay open while
+    iterating, and it isn't retried on failure.
+
+    :param columns: the column keys to export, all columns by default
+    :param header: whether the CSV starts with a line with the column names
+    """
+    mapper_columns = sa.inspect(db_model).columns
+    keys = columns if columns is not None else get_column_keys_in_order(db_model)
+    q = _build_find_query(db_model, with_deleted, filters, custom_filter).with_only_columns(
+        *(mapper_columns[key] for key in keys)
+    )
+
+    connection = await session.connection()
+    if connection.dialect.name == "postgresql" and connection.dialect.driver == "asyncpg":
+        compiled = q.compile(
+            dialect=connection.dialect,
+            schema_translate_map=_get_schema_translate_map(session),
+            render_schema_translate=True,
+        )
+        parameters = [compiled.params[name] for name in compiled.positiontup or ()]
+        driver_connection = (await connection.get_raw_connection()).driver_connection
+        chunks: asyncio.Queue[bytes | None] = asyncio.Queue(maxsize=max_pending_chunks)
+
+        async def copy() -> None:
+            try:
+                await driver_connection.copy_from_query(  # type: ignore[union-attr]
+                    compiled.string,
+                    *parameters,
+                    output=chunks.put,
+                    format=format.value,
+                    header=header if format == CopyFormat.CSV else None,
+                )
+            finally:
+                await chunks.put(None)
+
+        copy_task = asyncio.get_running_loop().create_task(copy())
+        try:
+            while (chunk := await chunks.get()) is not None:
+                yield chunk
+            await copy_task  # raises the errors of the COPY
+        finally:
+            if not copy_task.done():  # the iteration was stopped early
+                copy_task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await copy_task
+        return
+
+    if format != CopyFormat.CSV:
+        raise ValueError(f"The {format.value} format is only available on PostgreSQL with asyncpg")
+    result = await session.stream(q.execution_options(yield_per=yield_per))
+    try:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if header:
+            writer.writerow(mapper_columns[key].name for key in keys)
+        async for partition in result.partitions():
+            writer.writerows(partition)
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():  # only the header
+            yield buffer.getvalue().encode()
+    finally:
+        await result.close()
+
+
+async def archive_soft_deleted(
+    database_manager: DatabaseManager,
+    db_model: type[CustomBase],
+    history_model: type[CustomBase],
+    older_than: timedelta,
+    batch_size: int = 1000,
+) -> int:
+    """
+    Moves the rows of db_model that were soft deleted more than older_than ago to the table of history_model, e.g.
+    from a periodic job, so that deleted rows don't pile up in the table that is queried.
+
+    The columns the two tables have in common are copied. Rows are moved in batches of batch_size, each in a
+    transaction of its own that inserts the rows into the history table and deletes them; on PostgreSQL the rows
+    are locked with SKIP LOCKED, so several jobs can run at the same time. As a batch can come up short while other
+    jobs hold locks, it stops only when a batch finds no rows to move.
+
+    :return: the number of rows that were moved
+    """
+    deleted_before = datetime_with_utc_tz() - older_than
+    archived = 0
+    while True:
+        archived_batch: int = await _archive_soft_deleted_batch(
+            database_manager, db_model, history_model, deleted_before, batch_size
+        )
+        if archived_batch == 0:
+            return archived
+        archived += archived_batch
 
 
 @retry_if_failed
 async def commit(session: AsyncSession):
     await session.commit()
+
+
+async def _bulk_upsert_without_on_conflict(
+    session: AsyncSession,
+    db_model: type[CustomBase],
+    rows: list[dict[str, Any]],
+    index_elements: Sequence[str],
+    batch_size: int,
+) -> list[UUID]:
+    index_columns = [getattr(db_model, column) for column in index_elements]
+    existing_ids = {}
+    for batch in batched(rows, batch_size):
+        await _check_no_rows_of_other_organizations(session, db_model, index_elements, batch)
+        keys = [tuple(row[column] for column in index_elements) for row in batch]
+        result = await session.execute(
+            sa.select(db_model.id, *index_columns).where(sa.tuple_(*index_columns).in_(keys))
+        )
+        existing_ids.update({tuple(key): id for id, *key in result.all()})
+
+    rows_to_insert, rows_to_update = [], []
+    for row in rows:
+        existing_id = existing_ids.get(tuple(row[column] for column in index_elements))
+        if existing_id is None:
+            rows_to_insert.append(row)
+        else:
+            row.update(id=existing_id)
+            row.pop("created")
+            rows_to_update.append(row)
+
+    for batch in batched(rows_to_insert, batch_size):
+        await session.execute(sa.insert(db_model), batch)
+    update_statement = _get_update_by_id_statement(db_model)
+    for batch in batched(rows_to_update, batch_size):
+        await session.execute(update_statement, batch)
+    return [row["id"] for row in rows]
+
+
+async def _check_no_rows_of_other_organizations(
+    session: AsyncSession,
+    db_model: type[CustomBase],
+    index_elements: Sequence[str],
+    rows: list[dict[str, Any]],
+) -> None:
+    # an upsert of rows that conflict with rows of another organization would update (or skip) rows it can't see
+    organization_id = get_organization_id()
+    if organization_id is None or not _has_organization_column(db_model):
+        return
+    organization_column = getattr(db_model, ORGANIZATION_COLUMN)
+    index_columns = [getattr(db_model, column) for column in index_elements]
+    keys = [tuple(row[column] for column in index_elements) for row in rows]
+    other_organization_id = await session.scalar(
+        sa.select(organization_column)
+        .where(sa.tuple_(*index_columns).in_(keys), organization_column != organization_id)
+        .limit(1)
+    )
+    if other_organization_id is not None:
+        _check_organization(db_model, other_organization_id)
+
+
+def _get_update_by_id_statement(db_model: type[CustomBase]) -> sa.Update:
+    statement = sa.update(db_model)
+    if organization_criteria := _get_organization_criteria(db_model):
+        # the ORM can't synchronize the objects of the session with the additional criteria of an update by id
+        statement = statement.where(*organization_criteria).execution_options(synchronize_session=None)
+    return statement
+
+
+@retry_if_failed
+async def _archive_soft_deleted_batch(
+    database_manager: DatabaseManager,
+    db_model: type[CustomBase],
+    history_model: type[CustomBase],
+    deleted_before: datetime,
+    batch_size: int,
+) -> int:
+    table: sa.Table = db_model.__table__  # type: ignore[assignment]
+    history_table: sa.Table = history_model.__table__  # type: ignore[assignment]
+    columns = [name for name in table.columns.keys() if name in history_table.columns]
+
+    async with database_manager.session() as session:
+        ids_query = (
+            sa.select(db_model.id).where(db_model.deleted < deleted_before).order_by(db_model.deleted).limit(batch_size)
+        )
+        if session.get_bind().dialect.name == "postgresql":
+            ids_query = ids_query.with_for_update(skip_locked=True)
+        ids = (await session.scalars(ids_query)).all()
+        if not ids:
+            return 0
+
+        await session.execute(
+            sa.insert(history_model).from_select(
+                columns,
+                sa.select(*(table.columns[name] for name in columns)).where(db_model.id.in_(ids)),
+            )
+        )
+        await session.execute(
+            sa.delete(db_model).where(db_model.id.in_(ids)).execution_options(synchronize_session=False)
+        )
+        await session.commit()
+    return len(ids)
+
+
+def _get_record_values(record: BaseModel | dict) -> dict[str, Any]:
+    return record.model_dump() if isinstance(record, BaseModel) else record
+
+
+def _get_schema_translate_map(session: AsyncSession) -> dict[str | None, str | None]:
+    return session.get_bind().get_execution_options().get("schema_translate_map") or {}
+
+
+async def _iterate_async(items: AsyncIterable[Any] | Iterable[Any]) -> AsyncIterator[Any]:
+    if isinstance(items, AsyncIterable):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+async def _chain_async(first_item: Any, items: AsyncIterator[Any]) -> AsyncIterator[Any]:
+    yield first_item
+    async for item in items:
+        yield item
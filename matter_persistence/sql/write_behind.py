@@ -0,0 +1,144 @@
+import asyncio
+import contextlib
+import logging
+from typing import Any
+from uuid import UUID
+
+import sqlalchemy as sa
+
+from matter_persistence.decorators import retry_if_failed
+from matter_persistence.sql.base import CustomBase, datetime_with_utc_tz
+from matter_persistence.sql.manager import DatabaseManager
+from matter_persistence.sql.rows import batched, group_by_columns, update_rows
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """
+    Buffers updates to rows of a CustomBase model in memory and writes them to the database in bulk.
+
+    Updates to the same row are coalesced: only the latest value of every column is written. Buffered updates are
+    flushed every flush_interval_in_seconds, as soon as max_pending_rows rows have pending updates, and when the
+    buffer is drained. On PostgreSQL every batch is written with a single UPDATE ... FROM (VALUES ...) statement;
+    other dialects use an executemany UPDATE by primary key.
+
+    Delivery is at-least-once: if a flush fails, its updates are put back into the buffer (unless newer values were
+    buffered for the same columns in the meantime) and are written with the next flush.
+
+    Arguments:
+        database_manager (DatabaseManager): used to open the sessions that write the updates
+        db_model (type[CustomBase]): the model whose rows are updated
+        flush_interval_in_seconds (float): how often buffered updates are written
+        max_pending_rows (int): number of rows with pending updates that triggers a flush
+        batch_size (int): maximum number of rows written by a single statement
+
+    Usage example:
+        async with WriteBehindBuffer(database_manager, CounterORM) as buffer:
+            await buffer.update(counter_id, count=10)
+    """
+
+    def __init__(
+        self,
+        database_manager: DatabaseManager,
+        db_model: type[CustomBase],
+        flush_interval_in_seconds: float = 1.0,
+        max_pending_rows: int = 1000,
+        batch_size: int = 500,
+    ):
+        self._database_manager = database_manager
+        self._db_model = db_model
+        self._flush_interval_in_seconds = flush_interval_in_seconds
+        self._max_pending_rows = max_pending_rows
+        self._batch_size = batch_size
+        self._column_names = frozenset(sa.inspect(db_model).columns.keys()) - {"id"}
+        self._pending: dict[UUID, dict[str, Any]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: asyncio.Task | None = None
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.drain()
+
+    @property
+    def pending_rows(self) -> int:
+        return len(self._pending)
+
+    def start(self) -> None:
+        """
+        Starts flushing buffered updates periodically. Must be called from a running event loop.
+        """
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_periodically())
+
+    async def drain(self) -> None:
+        """
+        Stops the periodic flushing and writes all buffered updates. Call it on shutdown.
+        """
+        if self._flush_task is not None:
+            # a flush that is running is awaited rather than cancelled halfway through its write
+            async with self._flush_lock:
+                self._flush_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._flush_task
+            self._flush_task = None
+        await self.flush()
+
+    async def update(self, id: UUID, **values: Any) -> None:
+        """
+        Buffers an update of the given columns of the row with the given id.
+        """
+        unknown_columns = values.keys() - self._column_names
+        if unknown_columns:
+            raise ValueError(f"{self._db_model.__name__} has no columns named: {', '.join(sorted(unknown_columns))}")
+
+        pending_values = self._pending.setdefault(id, {})
+        pending_values.update(values)
+        if "updated" not in values:
+            pending_values["updated"] = datetime_with_utc_tz()
+
+        if len(self._pending) >= self._max_pending_rows:
+            await self.flush()
+
+    async def flush(self) -> int:
+        """
+        Writes all buffered updates.
+
+        Returns:
+            number_of_rows (int): number of rows that were updated
+        """
+        async with self._flush_lock:
+            pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+
+            try:
+                await self._write(pending)
+            except BaseException:  # e.g. CancelledError, which leaves the updates as unwritten as a failure
+                for id, values in pending.items():
+                    self._pending[id] = {**values, **self._pending.get(id, {})}
+                raise
+
+            return len(pending)
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self._flush_interval_in_seconds)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception(f"Unable to flush buffered updates of {self._db_model.__name__}, retrying later.")
+
+    @retry_if_failed
+    async def _write(self, pending: dict[UUID, dict[str, Any]]) -> None:
+        # rows updating the same set of columns are written by the same statements
+        rows_by_columns = group_by_columns([{"id": id, **values} for id, values in pending.items()])
+
+        async with self._database_manager.session() as session:
+            for columns, rows in rows_by_columns.items():
+                for batch in batched(rows, self._batch_size):
+                    await update_rows(session, self._db_model, tuple(c for c in columns if c != "id"), batch)
+            await session.commit()
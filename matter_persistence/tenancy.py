@@ -0,0 +1,48 @@
+import contextlib
+from collections.abc import Iterator
+from contextvars import ContextVar
+from uuid import UUID
+
+# the organization the current context (e.g. request) acts for
+_organization_id: ContextVar[UUID | None] = ContextVar("organization_id", default=None)
+
+# the column of CustomBase models that tells which organization a row belongs to
+ORGANIZATION_COLUMN = "organization_id"
+
+
+@contextlib.contextmanager
+def organization(organization_id: UUID | None) -> Iterator[None]:
+    """
+    Scopes the SQL and cache calls made in the block to an organization, e.g. once per request, so that call sites
+    don't need to pass it along. None removes the scope in the block, e.g. for jobs that work across organizations.
+
+    While an organization is set:
+    - find, count, exists, find_with_count, find_page, stream, get and get_many (see sql.utils) only return rows of
+      models with an organization_id column that belong to it; filters that name another organization_id raise
+      DatabaseOrganizationMismatchError. The result cache (see QueryResultCache) keeps the results of every
+      organization apart
+    - bulk_insert, bulk_upsert and bulk_load fill in the organization of rows, bulk_update and bulk_soft_delete
+      leave the rows of other organizations untouched, and rows of other organizations raise
+      DatabaseOrganizationMismatchError
+    - DatabaseManager sessions use the schema of the organization, if the DatabaseManager is given
+      organization_schemas, e.g. for big organizations that are isolated in their own schema
+    - CacheManager prefixes the keys of the *_with_key(s) methods with the organization, if it's created with
+      organization_namespaces=True
+
+    Usage example:
+        with organization(organization_id):
+            async with database_manager.session() as session:
+                numbers = await find(session, NumberORM)  # WHERE organization_id = :organization_id
+    """
+    token = _organization_id.set(organization_id)
+    try:
+        yield
+    finally:
+        _organization_id.reset(token)
+
+
+def get_organization_id() -> UUID | None:
+    """
+    The organization of the current context; None if there is none.
+    """
+    return _organization_id.get()
@@ -1,4 +1,5 @@
 import pytest
+from pydantic import ConfigDict
 from sqlalchemy.orm import Mapped
 
 from matter_persistence.foundation_model import FoundationModel
@@ -24,6 +25,12 @@ class PersonWithAge(Person):
     age: int
 
 
+class StrictPerson(FoundationModel):
+    model_config = ConfigDict(extra="forbid")
+
+    name: str
+
+
 @pytest.fixture
 def person_dto():
     return Person(name="john")
@@ -4,7 +4,7 @@ from uuid import uuid4
 
 import pytest
 import redis.asyncio
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from pytest_asyncio import is_async_test
 from testcontainers.compose import DockerCompose
 from testcontainers.redis import AsyncRedisContainer
@@ -34,6 +34,27 @@ class TestDTO(BaseModel):
     test_field: int
 
 
+class TestWideDTO(TestDTO):
+    __test__ = False
+
+    name: str
+    tags: list[str]
+
+
+class TestAliasedDTO(BaseModel):
+    __test__ = False
+
+    test_field: int = Field(alias="testField")
+    name: str
+
+
+class TestColumnsDTO(BaseModel):
+    __test__ = False
+
+    columns: list[str]
+    rows: int
+
+
 @pytest.fixture
 def test_dto():
     return TestDTO(test_field=1)
@@ -0,0 +1,81 @@
+import contextlib
+
+from matter_persistence.redis.instrumentation import (
+    CacheInstrumentation,
+    CacheMetrics,
+    OpenTelemetryCacheInstrumentation,
+    payload_size,
+)
+from tests.redis.conftest import TestDTO
+
+
+def test_cache_instrumentation_is_disabled_by_default():
+    instrumentation = CacheInstrumentation()
+    assert not instrumentation.enabled
+    assert isinstance(instrumentation.time_codec("get_with_key", TestDTO, "decode"), contextlib.nullcontext)
+
+
+def test_cache_metrics_hit_ratio_and_prometheus():
+    cache_metrics = CacheMetrics()
+    assert cache_metrics.hit_ratio() is None
+    assert cache_metrics.compression_ratio() is None
+
+    cache_metrics.record_lookup("get_many_with_keys", TestDTO, hits=3, misses=1)
+    cache_metrics.record_bytes("get_many_with_keys", TestDTO, bytes_written=0, bytes_read=30)
+    with cache_metrics.time_codec("get_many_with_keys", TestDTO, "decode"):
+        pass
+    cache_metrics.record_command("get_many_values", 0.001, None)
+    cache_metrics.record_compression("save_value", TestDTO, raw_bytes=200, encoded_bytes=50)
+
+    assert cache_metrics.hit_ratio(TestDTO) == 0.75
+    assert cache_metrics.hit_ratio() == 0.75
+    assert cache_metrics.decode_duration.count == 1
+    lines = cache_metrics.to_prometheus()
+    assert 'cache_hits_total{object_class="TestDTO"} 3' in lines
+    assert 'cache_read_bytes_total{object_class="TestDTO"} 30' in lines
+    assert 'cache_command_duration_seconds_count{command="get_many_values"} 1' in lines
+    assert cache_metrics.compression_ratio(TestDTO) == cache_metrics.compression_ratio() == 0.25
+    assert 'cache_compression_ratio{object_class="TestDTO"} 0.25' in lines
+
+
+def test_open_telemetry_cache_instrumentation():
+    class Instrument:
+        def __init__(self, name):
+            self.name = name
+
+        def add(self, value, attributes):
+            recorded.append((self.name, value, attributes))
+
+        record = add
+
+    class Meter:
+        def create_counter(self, name, **kwargs):
+            return Instrument(name)
+
+        create_histogram = create_counter
+
+    class Tracer:
+        @contextlib.contextmanager
+        def start_as_current_span(self, name, attributes):
+            spans.append((name, attributes))
+            yield
+
+    recorded, spans = [], []
+    instrumentation = OpenTelemetryCacheInstrumentation(Tracer(), Meter())
+    with instrumentation.span("get_with_key", TestDTO):
+        instrumentation.record_lookup("get_with_key", TestDTO, hits=0, misses=1)
+        instrumentation.record_compression("save_value", TestDTO, raw_bytes=200, encoded_bytes=50)
+
+    assert spans == [
+        ("cache.get_with_key", {"db.system": "redis", "db.operation": "get_with_key", "cache.object_class": "TestDTO"})
+    ]
+    assert recorded == [
+        ("cache.lookups", 1, {"cache.object_class": "TestDTO", "cache.result": "miss"}),
+        ("cache.compression.ratio", 0.25, {"cache.object_class": "TestDTO"}),
+    ]
+
+
+def test_payload_size():
+    assert payload_size(b"abc") == 3
+    assert payload_size([b"ab", None, "c"]) == 3
+    assert payload_size(None) == 0
@@ -1,13 +1,25 @@
 import asyncio
 import json
+from uuid import uuid4
 
 import pytest
 from pydantic import BaseModel
 from redis.asyncio import Redis
 
+from matter_persistence.redis.cache_helper import CacheHelper
 from matter_persistence.redis.exceptions import CacheRecordNotFoundError
+from matter_persistence.redis.instrumentation import CacheMetrics
 from matter_persistence.redis.manager import CacheManager
-from tests.redis.conftest import INTERNAL_ID, ORGANISATION_ID, TestDTO
+from matter_persistence.redis.utils import CompactModelList
+from matter_persistence.tenancy import organization
+from tests.redis.conftest import (
+    INTERNAL_ID,
+    ORGANISATION_ID,
+    TestAliasedDTO,
+    TestColumnsDTO,
+    TestDTO,
+    TestWideDTO,
+)
 
 
 async def test_cache_manager_is_alive(cache_manager):
@@ -163,3 +175,107 @@ async def test_cache_manager_use_key_as_is_works(
     value = TestDTO(test_field=234)
     await async_redis_client.set(key, value.model_dump_json())
     assert await cache_manager.get_with_key(key=key, object_class=TestDTO, use_key_as_is=True) == value
+
+
+@pytest.mark.parametrize("use_key_as_is", (True, False))
+async def test_cache_manager_save_and_get_many_compact_lists(cache_manager: CacheManager, use_key_as_is) -> None:
+    test_dtos = {
+        "key_0": [TestDTO(test_field=i) for i in range(100)],
+        "key_1": TestDTO(test_field=2),
+        "key_2": [],
+    }
+    await cache_manager.save_many_with_keys(test_dtos, TestDTO, 100, use_key_as_is, compact_lists=True)
+    response = await cache_manager.get_many_with_keys(list(test_dtos.keys()), TestDTO, use_key_as_is)
+    assert response == test_dtos
+    assert await cache_manager.get_with_key("key_0", TestDTO, use_key_as_is=use_key_as_is) == test_dtos["key_0"]
+
+
+async def test_cache_manager_save_and_get_model_with_columns_field(cache_manager: CacheManager) -> None:
+    test_dto = TestColumnsDTO(columns=["a", "b"], rows=2)
+    await cache_manager.save_with_key("key", test_dto, TestColumnsDTO)
+    assert await cache_manager.get_with_key("key", TestColumnsDTO) == test_dto
+    assert await cache_manager.get_many_with_keys(["key"], TestColumnsDTO) == {"key": test_dto}
+
+
+async def test_cache_manager_get_many_compact_lists_lazy(cache_manager: CacheManager) -> None:
+    test_dtos = [TestDTO(test_field=i) for i in range(10)]
+    await cache_manager.save_many_with_keys({"key": test_dtos}, TestDTO, 100, compact_lists=True)
+    response = await cache_manager.get_many_with_keys(["key"], TestDTO, lazy=True)
+    assert isinstance(response["key"], CompactModelList)
+    assert len(response["key"]) == len(test_dtos)
+    assert response["key"][3] == test_dtos[3]
+    assert list(response["key"]) == test_dtos
+
+
+@pytest.mark.parametrize("from_hash", (True, False))
+async def test_cache_manager_get_partial_with_key(cache_manager: CacheManager, from_hash: bool) -> None:
+    value = TestWideDTO(test_field=1, name="name", tags=["a", "b"])
+    if from_hash:
+        await cache_manager.save_as_hash_with_key("wide_key", value, TestWideDTO, 100)
+    else:
+        await cache_manager.save_with_key("wide_key", value, TestWideDTO, 100)
+    response = await cache_manager.get_partial_with_key("wide_key", TestWideDTO, ["name", "tags"], from_hash=from_hash)
+    assert response.model_dump() == {"name": "name", "tags": ["a", "b"]}
+
+
+@pytest.mark.parametrize("from_hash", (True, False))
+async def test_cache_manager_get_partial_with_key_aliased_field(cache_manager: CacheManager, from_hash: bool) -> None:
+    value = TestAliasedDTO(testField=1, name="name")
+    if from_hash:
+        await cache_manager.save_as_hash_with_key("aliased_key", value, TestAliasedDTO, 100)
+    else:
+        await cache_manager.save_with_key("aliased_key", value, TestAliasedDTO, 100)
+    response = await cache_manager.get_partial_with_key(
+        "aliased_key", TestAliasedDTO, ["test_field"], from_hash=from_hash
+    )
+    assert response.model_dump() == {"test_field": 1}
+
+
+async def test_cache_manager_get_partial_with_key_not_found(cache_manager: CacheManager) -> None:
+    with pytest.raises(CacheRecordNotFoundError):
+        await cache_manager.get_partial_with_key("missing_key", TestWideDTO, ["name"], from_hash=True)
+
+
+async def test_cache_manager_instrumentation(async_redis_client: Redis) -> None:
+    cache_metrics = CacheMetrics()
+    cache_manager = CacheManager(connection=async_redis_client, instrumentation=cache_metrics)
+
+    await cache_manager.save_many_with_keys({"metrics_1": TestDTO(test_field=1)}, TestDTO)
+    await cache_manager.get_many_with_keys(["metrics_1", "metrics_missing"], TestDTO)
+    with pytest.raises(CacheRecordNotFoundError):
+        await cache_manager.get_with_key("metrics_missing", TestDTO)
+
+    assert cache_metrics.hits["TestDTO"] == 1
+    assert cache_metrics.misses["TestDTO"] == 2
+    assert cache_metrics.bytes_written["TestDTO"] == cache_metrics.bytes_read["TestDTO"] > 0
+    assert cache_metrics.encode_duration.count == 1
+    assert cache_metrics.decode_duration.count == 1
+    assert cache_metrics.command_duration["set_many_values"].count == 1
+    assert cache_metrics.command_duration["get_many_values"].count == 1
+
+
+async def test_cache_manager_instrumentation_records_compression_ratio(async_redis_client: Redis) -> None:
+    cache_metrics = CacheMetrics()
+    cache_manager = CacheManager(connection=async_redis_client, instrumentation=cache_metrics)
+
+    await cache_manager.save_value(ORGANISATION_ID, INTERNAL_ID, TestDTO(test_field=1), TestDTO)
+
+    assert cache_metrics.raw_bytes_compressed["TestDTO"] > 0
+    assert cache_metrics.encoded_bytes_compressed["TestDTO"] == cache_metrics.bytes_written["TestDTO"]
+    assert cache_metrics.compression_ratio(TestDTO) == (
+        cache_metrics.encoded_bytes_compressed["TestDTO"] / cache_metrics.raw_bytes_compressed["TestDTO"]
+    )
+
+
+async def test_cache_manager_organization_namespaces(async_redis_client: Redis, test_dto):
+    cache_manager = CacheManager(connection=async_redis_client, organization_namespaces=True)
+    with organization(ORGANISATION_ID):
+        await cache_manager.save_with_key("namespaced", test_dto, TestDTO)
+        assert await cache_manager.get_with_key("namespaced", TestDTO) == test_dto
+        assert (await cache_manager.get_many_with_keys(["namespaced"], TestDTO))["namespaced"] == test_dto
+    hash_key = CacheHelper.create_basic_hash_key("namespaced", TestDTO.__name__)
+    assert await async_redis_client.exists(f"{ORGANISATION_ID}_{hash_key}")
+
+    with organization(uuid4()):
+        assert not await cache_manager.cache_record_with_key_exists("namespaced", TestDTO)
+    assert not await cache_manager.cache_record_with_key_exists("namespaced", TestDTO)
@@ -0,0 +1,70 @@
+import pytest
+from pydantic import ValidationError
+
+from matter_persistence.redis.utils import (
+    CompactModelList,
+    dump_compact_model_list,
+    get_model_list_adapter,
+    get_partial_model,
+    is_compact_model_list,
+    load_compact_model_list,
+)
+from tests.redis.conftest import TestAliasedDTO, TestColumnsDTO, TestDTO, TestWideDTO
+
+
+def test_compact_model_list_round_trip():
+    test_dtos = [TestDTO(test_field=i) for i in range(5)]
+    data = dump_compact_model_list(TestDTO, test_dtos)
+    assert is_compact_model_list(data)
+    assert load_compact_model_list(TestDTO, data) == test_dtos
+
+
+def test_compact_model_list_is_smaller_than_json_list():
+    test_dtos = [TestDTO(test_field=i) for i in range(100)]
+    assert len(dump_compact_model_list(TestDTO, test_dtos)) < len(get_model_list_adapter(TestDTO).dump_json(test_dtos))
+
+
+def test_compact_model_list_lazy_builds_models_on_access():
+    test_dtos = [TestDTO(test_field=i) for i in range(5)]
+    lazy = load_compact_model_list(TestDTO, dump_compact_model_list(TestDTO, test_dtos), lazy=True)
+    assert isinstance(lazy, CompactModelList)
+    assert lazy[-1] == test_dtos[-1]
+    assert lazy[1:3] == test_dtos[1:3]
+    assert lazy == test_dtos
+
+
+def test_compact_model_list_maps_rows_by_column():
+    test_wide_dtos = [TestWideDTO(test_field=i, name=f"name {i}", tags=["a"]) for i in range(3)]
+    data = dump_compact_model_list(TestWideDTO, test_wide_dtos)
+    # columns the model doesn't have are ignored, and missing columns are validated like missing fields
+    assert load_compact_model_list(TestDTO, data) == [TestDTO(test_field=i) for i in range(3)]
+    assert load_compact_model_list(TestDTO, data, lazy=True)[2] == TestDTO(test_field=2)
+    with pytest.raises(ValidationError):
+        load_compact_model_list(TestWideDTO, dump_compact_model_list(TestDTO, [TestDTO(test_field=1)]))
+
+
+def test_plain_json_list_is_not_compact():
+    assert not is_compact_model_list(get_model_list_adapter(TestDTO).dump_json([TestDTO(test_field=1)]))
+
+
+def test_model_with_columns_field_is_not_compact():
+    assert not is_compact_model_list(TestColumnsDTO(columns=["a"], rows=1).model_dump_json())
+
+
+def test_get_partial_model_is_cached_and_keeps_only_given_fields():
+    partial_model = get_partial_model(TestWideDTO, ("name",))
+    assert partial_model is get_partial_model(TestWideDTO, ("name",))
+    assert list(partial_model.model_fields) == ["name"]
+    assert partial_model.model_validate_json('{"test_field": 1, "name": "x", "tags": []}').model_dump() == {"name": "x"}
+
+
+def test_get_partial_model_with_aliased_field():
+    partial_model = get_partial_model(TestAliasedDTO, ("test_field",))
+    test_dto = TestAliasedDTO(testField=1, name="x")
+    assert partial_model.model_validate_json(test_dto.model_dump_json()).model_dump() == {"test_field": 1}
+    assert partial_model.model_validate_json(test_dto.model_dump_json(by_alias=True)).model_dump() == {"test_field": 1}
+
+
+def test_get_partial_model_unknown_field():
+    with pytest.raises(ValueError):
+        get_partial_model(TestWideDTO, ("unknown",))
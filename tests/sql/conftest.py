@@ -1,9 +1,11 @@
+from uuid import UUID
+
 import pytest
-from sqlalchemy import insert
-from sqlalchemy.orm import Mapped
+from sqlalchemy import ForeignKey, insert
+from sqlalchemy.orm import Mapped, mapped_column, relationship
 from testcontainers.postgres import PostgresContainer
 
-from matter_persistence.sql.base import Base, CustomBase
+from matter_persistence.sql.base import Base, CustomBase, active_index
 from matter_persistence.sql.manager import DatabaseManager
 
 # test database settings
@@ -31,6 +33,52 @@ class NumberORM(CustomBase):
 test_data = [{"number": x} for x in range(NUM_ROWS_IN_TABLE)]
 
 
+class DocumentORM(CustomBase):
+    __tablename__ = "documents"
+    __table_args__ = (active_index("organization_id"),)
+
+    organization_id: Mapped[UUID]
+    title: Mapped[str]
+
+
+class AuthorORM(CustomBase):
+    __tablename__ = "authors"
+
+    name: Mapped[str]
+    biography: Mapped[str | None]
+    books: Mapped[list["BookORM"]] = relationship(back_populates="author")
+
+
+class BookORM(CustomBase):
+    __tablename__ = "books"
+
+    title: Mapped[str]
+    author_id: Mapped[UUID] = mapped_column(ForeignKey("authors.id"))
+    author: Mapped[AuthorORM] = relationship(back_populates="books")
+    chapters: Mapped[list["ChapterORM"]] = relationship()
+
+
+class ChapterORM(CustomBase):
+    __tablename__ = "chapters"
+
+    title: Mapped[str]
+    book_id: Mapped[UUID] = mapped_column(ForeignKey("books.id"))
+
+
+class EventORM(CustomBase):
+    __tablename__ = "events"
+    __table_args__ = (active_index("name"),)
+
+    name: Mapped[str]
+    kind: Mapped[str]
+
+
+class EventHistoryORM(CustomBase):
+    __tablename__ = "events_history"
+
+    name: Mapped[str]
+
+
 @pytest.fixture(scope="session")
 async def postgres_db():
     postgres = PostgresContainer(
@@ -66,3 +114,31 @@ async def postgres_db():
 @pytest.fixture
 def database_manager(postgres_db):
     return DatabaseManager(postgres_db.get_connection_url())
+
+
+@pytest.fixture
+async def author(database_manager):
+    """
+    An author with two books of two chapters each.
+    """
+    author = AuthorORM(
+        name="author",
+        biography="a long biography",
+        books=[
+            BookORM(title=f"book {i}", chapters=[ChapterORM(title=f"chapter {j}") for j in range(2)]) for i in range(2)
+        ],
+    )
+    async with database_manager.session() as session:
+        session.add(author)
+        await session.commit()
+    return author
+
+
+@pytest.fixture
+def database_manager_with_reader(postgres_db):
+    return DatabaseManager(
+        postgres_db.get_connection_url(),
+        reader_hosts=[postgres_db.get_connection_url()],
+        max_replica_lag_in_seconds=10,
+        read_your_writes_in_seconds=60,
+    )
@@ -1,6 +1,16 @@
+from matter_persistence.sql.base import is_active_index
 from tests.conftest import Person, PersonORM
+from tests.sql.conftest import EventORM, NumberORM
 
 
 def test_person_orm_from_pydantic(person_dto):
     person = PersonORM.parse_obj(Person(name="john"))
     assert person.name == person_dto.name
+
+
+def test_active_index():
+    [index] = EventORM.__table__.indexes
+    assert index.name == "ix_events_name_active"
+    assert [column.name for column in index.columns] == ["name"]
+    assert is_active_index(index)
+    assert not any(is_active_index(index) for index in NumberORM.__table__.indexes)
@@ -0,0 +1,44 @@
+import asyncio
+from unittest.mock import patch
+
+from matter_persistence.health import HealthMonitor
+from matter_persistence.sql.manager import DatabaseManager
+from tests.redis.conftest import async_redis_client, cache_manager  # noqa: F401
+
+
+async def test_health_monitor_check(database_manager_with_reader, cache_manager):  # noqa: F811
+    health_monitor = HealthMonitor(database_manager_with_reader, cache_manager)
+    assert health_monitor.status is None
+    assert not health_monitor.is_healthy()
+
+    status = await health_monitor.check()
+    assert status is health_monitor.status
+    assert list(status.probes) == ["sql:writer", "sql:reader_0", "redis"]
+    assert all(result.healthy and result.latency_in_seconds >= 0 for result in status.probes.values())
+    assert health_monitor.is_healthy()
+
+
+async def test_health_monitor_marks_slow_replica_unhealthy(database_manager_with_reader):
+    async def hang(self, name):
+        await asyncio.sleep(10)
+
+    health_monitor = HealthMonitor(database_manager_with_reader, timeout_in_seconds=0.01)
+    with patch.object(DatabaseManager, "check_replica", hang):
+        status = await health_monitor.check()
+
+    assert not status.probes["sql:reader_0"].healthy
+    assert "TimeoutError" in status.probes["sql:reader_0"].error
+    assert status.healthy  # readonly sessions use the writer instead
+    async with database_manager_with_reader.session(readonly=True) as session:
+        assert session.bind is database_manager_with_reader.engines["writer"]
+
+
+async def test_health_monitor_checks_in_background(database_manager):
+    async with HealthMonitor(database_manager, interval_in_seconds=0.01, max_age_in_seconds=0.05) as health_monitor:
+        first_checked_at = health_monitor.status.checked_at
+        await asyncio.sleep(0.05)
+        assert health_monitor.status.checked_at > first_checked_at
+        assert health_monitor.is_healthy()
+
+    await asyncio.sleep(0.06)
+    assert not health_monitor.is_healthy()  # no longer refreshed
@@ -0,0 +1,84 @@
+import logging
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from matter_persistence.sql.instrumentation import PoolMetrics, fingerprint_statement, pool_metrics_to_prometheus
+from matter_persistence.sql.manager import DatabaseManager
+
+
+def test_fingerprint_statement():
+    assert fingerprint_statement("SELECT * FROM t WHERE id = $1 AND name = 'x'") == (
+        "SELECT * FROM t WHERE id = ? AND name = ?"
+    )
+    assert fingerprint_statement("SELECT *\n  FROM t WHERE id IN (%(id_1)s, %(id_2)s) LIMIT 10") == (
+        "SELECT * FROM t WHERE id IN (?) LIMIT ?"
+    )
+
+
+async def test_database_manager_pool_metrics(postgres_db):
+    database_manager = DatabaseManager(postgres_db.get_connection_url(), pool_metrics=True)
+    for _ in range(3):
+        async with database_manager.session() as session:
+            await session.execute(text("SELECT 1"))
+
+    pool_metrics = database_manager.pool_metrics["writer"]
+    assert pool_metrics.checkouts == 3
+    assert pool_metrics.checkout_wait.count == 3
+    assert pool_metrics.checkout_duration.count == 3
+    assert pool_metrics.gauges()["checkedout"] == 0
+    assert 'db_pool_checkouts_total{engine="writer"} 3' in pool_metrics_to_prometheus(
+        database_manager.pool_metrics.values()
+    )
+    assert "pool_pre_ping" in pool_metrics.recommend_settings()
+    await database_manager.close()
+
+
+async def test_pool_metrics_of_the_same_engine_measure_every_checkout_once(postgres_db):
+    database_manager = DatabaseManager(postgres_db.get_connection_url(), pool_metrics=True)
+    other_pool_metrics = PoolMetrics(database_manager.engines["writer"], "other")
+    async with database_manager.session() as session:
+        await session.execute(text("SELECT 1"))
+
+    assert database_manager.pool_metrics["writer"].checkout_wait.count == 1
+    assert other_pool_metrics.checkout_wait.count == 1
+    await database_manager.close()
+
+
+async def test_database_manager_query_metrics(postgres_db, caplog):
+    records = []
+    database_manager = DatabaseManager(
+        postgres_db.get_connection_url(),
+        query_metrics=True,
+        query_metrics_kwargs={
+            "slow_query_threshold_in_seconds": 0,
+            "n_plus_one_threshold": 3,
+            "on_query": records.append,
+        },
+    )
+    with caplog.at_level(logging.WARNING, logger="matter_persistence.sql.instrumentation"):
+        async with database_manager.session() as session:
+            for value in range(5):
+                await session.execute(text(f"SELECT {value}"))
+
+    query_metrics = database_manager.query_metrics["writer"]
+    assert query_metrics.statistics["SELECT ?"].count == 5
+    assert query_metrics.latency.count >= 5
+    assert len([record for record in records if record.fingerprint == "SELECT ?"]) == 5
+    assert len([message for message in caplog.messages if "N+1" in message]) == 1
+    assert any("Slow query" in message for message in caplog.messages)
+    await database_manager.close()
+
+
+async def test_database_manager_query_metrics_failed_statement(postgres_db):
+    database_manager = DatabaseManager(postgres_db.get_connection_url(), query_metrics=True)
+    with pytest.raises(DBAPIError):
+        async with database_manager.connect() as connection:
+            await connection.execute(text("SELECT * FROM table_that_does_not_exist"))
+
+    async with database_manager.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+        assert "matter_query_start" not in connection.info
+    assert database_manager.query_metrics["writer"].statistics["SELECT ?"].count == 1
+    await database_manager.close()
@@ -0,0 +1,25 @@
+import asyncio
+from uuid import uuid4
+
+from matter_persistence.sql.loader import ModelLoader
+from matter_persistence.sql.utils import find
+from tests.sql.conftest import NumberORM
+
+
+async def test_model_loader_batches_loads(postgres_db, database_manager):
+    async with database_manager.session() as session:
+        rows = await find(session, NumberORM, limit=2)
+        loader = ModelLoader(session, NumberORM)
+        res = await asyncio.gather(loader.load(rows[0].id), loader.load(rows[1].id), loader.load(uuid4()))
+        assert [row.id if row else None for row in res] == [rows[0].id, rows[1].id, None]
+
+
+async def test_model_loader_caches_loaded_rows(postgres_db, database_manager):
+    async with database_manager.session() as session:
+        [row] = await find(session, NumberORM, limit=1)
+        loader = ModelLoader(session, NumberORM)
+        assert loader.load(row.id) is loader.load(row.id)
+        assert (await loader.load_many([row.id, row.id])) == [row, row]
+
+        loader.clear(row.id)
+        assert (await loader.load(row.id)) is row
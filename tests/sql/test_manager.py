@@ -1,8 +1,12 @@
+from uuid import uuid4
+
 import pytest
 from sqlalchemy import text
 
+from matter_persistence.deadline import deadline
 from matter_persistence.sql.exceptions import DatabaseNoEngineSetError
 from matter_persistence.sql.manager import DatabaseManager
+from matter_persistence.tenancy import organization
 
 
 async def test_database_manager_connection(database_manager: DatabaseManager):
@@ -17,6 +21,16 @@ async def test_database_manager_session(database_manager: DatabaseManager):
     assert res.scalar() == 1
 
 
+async def test_database_manager_session_with_deadline_sets_statement_timeout(database_manager: DatabaseManager):
+    with deadline(5):
+        async with database_manager.session() as session:
+            statement_timeout = await session.scalar(text("SELECT current_setting('statement_timeout')"))
+    assert 4000 <= int(statement_timeout.removesuffix("ms")) <= 5000
+
+    async with database_manager.session() as session:
+        assert await session.scalar(text("SELECT current_setting('statement_timeout')")) == "0"
+
+
 async def test_database_manager_close_connection(database_manager: DatabaseManager):
     await database_manager.close()
     with pytest.raises(DatabaseNoEngineSetError):
@@ -29,3 +43,40 @@ async def test_database_manager_close_session(database_manager: DatabaseManager)
     with pytest.raises(DatabaseNoEngineSetError):
         async with database_manager.session() as session:
             await session.execute(text("SELECT 1"))
+
+
+async def test_database_manager_readonly_session_uses_reader(database_manager_with_reader: DatabaseManager):
+    async with database_manager_with_reader.session(readonly=True) as session:
+        assert session.bind is database_manager_with_reader.engines["reader_0"]
+    async with database_manager_with_reader.session() as session:
+        assert session.bind is database_manager_with_reader.engines["writer"]
+
+
+async def test_database_manager_readonly_session_without_healthy_reader(database_manager_with_reader: DatabaseManager):
+    database_manager_with_reader.set_replica_health("reader_0", False)
+    async with database_manager_with_reader.session(readonly=True) as session:
+        assert session.bind is database_manager_with_reader.engines["writer"]
+
+    assert await database_manager_with_reader.refresh_replica_status() == {"reader_0": True}
+    async with database_manager_with_reader.session(readonly=True) as session:
+        assert session.bind is database_manager_with_reader.engines["reader_0"]
+
+
+async def test_database_manager_readonly_session_reads_your_writes(database_manager_with_reader: DatabaseManager):
+    async with database_manager_with_reader.session() as session:
+        await session.commit()
+    async with database_manager_with_reader.session(readonly=True) as session:
+        assert session.bind is database_manager_with_reader.engines["writer"]
+
+
+async def test_database_manager_session_uses_organization_schema(postgres_db):
+    big_organization_id = uuid4()
+    schemas = {big_organization_id: "big_organization"}
+    database_manager = DatabaseManager(postgres_db.get_connection_url(), organization_schemas=schemas.get)
+    with organization(big_organization_id):
+        async with database_manager.session() as session:
+            assert session.bind.get_execution_options()["schema_translate_map"] == {None: "big_organization"}
+            assert session.bind.sync_engine.pool is database_manager.engines["writer"].sync_engine.pool
+    with organization(uuid4()):
+        async with database_manager.session() as session:
+            assert session.bind is database_manager.engines["writer"]
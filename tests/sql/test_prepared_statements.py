@@ -0,0 +1,77 @@
+from sqlalchemy import text
+
+from matter_persistence.sql.manager import DatabaseManager
+from matter_persistence.sql.prepared_statements import (
+    PreparedStatementMode,
+    discard_failed_transaction,
+    get_connect_args,
+    track_writes,
+)
+from matter_persistence.sql.utils import find
+from tests.sql.conftest import NUM_ROWS_IN_TABLE, NumberORM
+
+
+def test_get_connect_args():
+    assert get_connect_args(PreparedStatementMode.DEFAULT, 100) == {"prepared_statement_cache_size": 100}
+
+    connect_args = get_connect_args(PreparedStatementMode.NAMED, 500)
+    assert connect_args["prepared_statement_cache_size"] == 500
+    assert connect_args["statement_cache_size"] == 0
+    name_func = connect_args["prepared_statement_name_func"]
+    assert name_func() != name_func()
+
+    assert get_connect_args(PreparedStatementMode.DISABLED, 500)["prepared_statement_cache_size"] == 0
+
+
+async def test_discard_failed_transaction(database_manager):
+    async with database_manager.session() as session:
+        assert not await discard_failed_transaction(session)  # the writes of the session aren't tracked
+
+    async with database_manager.session() as session:
+        track_writes(session)
+        await session.execute(text("SELECT 1"))
+        assert await discard_failed_transaction(session)
+        assert not session.in_transaction()
+
+        session.add(NumberORM(number=7000))
+        await session.flush()
+        assert not await discard_failed_transaction(session)  # the number would be lost
+        await session.rollback()
+
+    assert await discard_failed_transaction(None)
+
+
+async def test_database_manager_transaction_prepared_statements(postgres_db):
+    database_manager = DatabaseManager(
+        postgres_db.get_connection_url(),
+        engine_kwargs={"pool_size": 1},
+        prepared_statements=PreparedStatementMode.TRANSACTION,
+    )
+    async with database_manager.session() as session:
+        assert len(await find(session, NumberORM)) == NUM_ROWS_IN_TABLE
+        assert len(await find(session, NumberORM)) == NUM_ROWS_IN_TABLE
+        dbapi_connection = (await (await session.connection()).get_raw_connection()).driver_connection
+        statement_names = await dbapi_connection.fetch("SELECT name FROM pg_prepared_statements")
+        assert all(row["name"].startswith("__matter_persistence_") for row in statement_names)
+
+    # the statements aren't reused by the next transaction, which may run on another server connection
+    async with database_manager.session() as session:
+        raw_connection = await (await session.connection()).get_raw_connection()
+        assert len(raw_connection.dbapi_connection._prepared_statement_cache) == 0
+
+
+async def test_database_manager_named_prepared_statements_retry_stale_statement(postgres_db):
+    database_manager = DatabaseManager(
+        postgres_db.get_connection_url(),
+        engine_kwargs={"pool_size": 1, "max_overflow": 0},
+        prepared_statements=PreparedStatementMode.NAMED,
+    )
+    async with database_manager.session() as session:
+        assert len(await find(session, NumberORM)) == NUM_ROWS_IN_TABLE
+
+    # e.g. a pooler moved the client connection to a server connection that doesn't have the cached statement
+    async with database_manager.connect() as connection:
+        await connection.exec_driver_sql("DEALLOCATE ALL")
+
+    async with database_manager.session() as session:
+        assert len(await find(session, NumberORM)) == NUM_ROWS_IN_TABLE
@@ -0,0 +1,132 @@
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import delete, select, update
+
+from matter_persistence.redis.exceptions import CacheServerError
+from matter_persistence.sql.base import datetime_with_utc_tz
+from matter_persistence.sql.manager import DatabaseManager
+from matter_persistence.sql.result_cache import QueryResultCache
+from matter_persistence.sql.utils import find, get
+from matter_persistence.tenancy import organization
+from tests.redis.conftest import async_redis_client, cache_manager  # noqa: F401
+from tests.sql.conftest import DocumentORM, NumberORM
+
+
+@pytest.fixture
+def result_cache(cache_manager):  # noqa: F811
+    return QueryResultCache(cache_manager, namespace=f"query_result_{datetime_with_utc_tz().timestamp()}")
+
+
+@pytest.fixture
+async def cached_database_manager(postgres_db, result_cache):
+    database_manager = DatabaseManager(postgres_db.get_connection_url(), result_cache=result_cache)
+    start = datetime_with_utc_tz()
+    yield database_manager
+    # other tests count the rows of the numbers table
+    async with database_manager.session() as session:
+        await session.execute(delete(NumberORM).where(NumberORM.created >= start))
+        await session.commit()
+
+
+async def _find_cached(database_manager, number):
+    async with database_manager.session() as session:
+        return await find(session, NumberORM, filters={"number": number}, cached=True)
+
+
+async def _update_without_invalidation(database_manager, id, number):
+    # writes that aren't made with a session aren't tracked, so the cached results stay as they are
+    async with database_manager.connect() as connection:
+        await connection.execute(update(NumberORM.__table__).where(NumberORM.id == id).values(number=number))
+
+
+async def test_find_cached(cached_database_manager):
+    async with cached_database_manager.session() as session:
+        number_orm = NumberORM(number=6000)
+        session.add(number_orm)
+        await session.commit()
+
+    [cached_number_orm] = await _find_cached(cached_database_manager, 6000)
+    await _update_without_invalidation(cached_database_manager, number_orm.id, 6001)
+    [cached_number_orm] = await _find_cached(cached_database_manager, 6000)  # served from the cache
+    assert cached_number_orm.id == number_orm.id
+    assert cached_number_orm.number == 6000
+
+
+async def test_find_cached_invalidated_by_commit(cached_database_manager):
+    async with cached_database_manager.session() as session:
+        session.add(NumberORM(number=6100))
+        await session.commit()
+    [number_orm] = await _find_cached(cached_database_manager, 6100)
+
+    async with cached_database_manager.session() as session:
+        [number_orm] = await find(session, NumberORM, filters={"number": 6100}, cached=True)
+        number_orm.number = 6101  # cached rows are part of the session
+        await session.commit()
+
+    assert await _find_cached(cached_database_manager, 6100) == []
+    assert [number_orm.number for number_orm in await _find_cached(cached_database_manager, 6101)] == [6101]
+
+
+async def test_get_cached(cached_database_manager):
+    async with cached_database_manager.session() as session:
+        number_orm = NumberORM(number=6200)
+        session.add(number_orm)
+        await session.commit()
+
+    statement = select(NumberORM).where(NumberORM.id == number_orm.id)
+    async with cached_database_manager.session() as session:
+        assert (await get(session, statement, NumberORM, cached=True)).number == 6200
+    await _update_without_invalidation(cached_database_manager, number_orm.id, 6201)
+    async with cached_database_manager.session() as session:
+        assert (await get(session, statement, NumberORM, cached=True)).number == 6200
+    async with cached_database_manager.session() as session:
+        assert (await get(session, statement, NumberORM)).number == 6201
+
+
+async def test_find_cached_without_redis(cached_database_manager, result_cache):
+    async with cached_database_manager.session() as session:
+        session.add(NumberORM(number=6300))
+        await session.commit()
+
+    with patch.object(result_cache.cache_manager, "get_many_with_keys", side_effect=CacheServerError("down")):
+        assert [number_orm.number for number_orm in await _find_cached(cached_database_manager, 6300)] == [6300]
+
+
+async def test_find_cached_scoped_to_organization(cached_database_manager, result_cache):
+    organization_id = uuid4()
+    async with cached_database_manager.session() as session:
+        session.add(DocumentORM(organization_id=organization_id, title="cached"))
+        await session.commit()
+
+    with organization(organization_id), patch.object(result_cache, "store", wraps=result_cache.store) as store:
+        async with cached_database_manager.session() as session:
+            assert [document.title for document in await find(session, DocumentORM, cached=True)] == ["cached"]
+    assert f":{organization_id}:documents:" in store.call_args.args[1]
+
+    async with cached_database_manager.session() as session:
+        await session.execute(delete(DocumentORM).where(DocumentORM.organization_id == organization_id))
+        await session.commit()
+
+
+async def test_find_cached_not_stored_from_replica(postgres_db, cached_database_manager, result_cache):
+    async with cached_database_manager.session() as session:
+        session.add(NumberORM(number=6500))
+        await session.commit()
+
+    database_manager = DatabaseManager(
+        postgres_db.get_connection_url(), reader_hosts=[postgres_db.get_connection_url()], result_cache=result_cache
+    )
+    with patch.object(result_cache, "store", wraps=result_cache.store) as store:
+        async with database_manager.session(readonly=True) as session:
+            await find(session, NumberORM, filters={"number": 6500}, cached=True)
+        store.assert_not_called()
+
+        [number_orm] = await _find_cached(cached_database_manager, 6500)  # stored from the writer
+        store.assert_called_once()
+
+    async with database_manager.session(readonly=True) as session:  # and served to readers
+        [cached_number_orm] = await find(session, NumberORM, filters={"number": 6500}, cached=True)
+    assert cached_number_orm.id == number_orm.id
+    await database_manager.close()
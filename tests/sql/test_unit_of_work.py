@@ -0,0 +1,98 @@
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import delete, select
+from sqlalchemy.exc import OperationalError
+
+from matter_persistence.sql.base import datetime_with_utc_tz
+from matter_persistence.sql.unit_of_work import UnitOfWork
+from matter_persistence.sql.utils import commit
+from tests.sql.conftest import NumberORM
+
+
+@pytest.fixture(autouse=True)
+async def delete_created_numbers(postgres_db, database_manager):
+    # other tests count the rows of the numbers table
+    start = datetime_with_utc_tz()
+    yield
+    async with database_manager.session() as session:
+        await session.execute(delete(NumberORM).where(NumberORM.created >= start))
+        await session.commit()
+
+
+async def _get_numbers(database_manager, ids) -> dict:
+    async with database_manager.session() as session:
+        number_orms = (await session.scalars(select(NumberORM).where(NumberORM.id.in_(ids)))).all()
+    return {number_orm.id: number_orm for number_orm in number_orms}
+
+
+async def test_unit_of_work_writes_on_exit(postgres_db, database_manager):
+    async with database_manager.session() as session:
+        number_orm = NumberORM(number=1)
+        deleted_number_orm = NumberORM(number=2)
+        session.add_all([number_orm, deleted_number_orm])
+        await commit(session)
+
+    async with database_manager.session() as session, UnitOfWork(session) as unit_of_work:
+        ids = [await unit_of_work.add(NumberORM, {"number": 1000 + i}) for i in range(3)]
+        ids.append(await unit_of_work.add(NumberORM, NumberORM(number=1003)))
+        await unit_of_work.update(NumberORM, ids[0], number=2000)
+        await unit_of_work.soft_delete(NumberORM, ids[1])
+        await unit_of_work.update(NumberORM, number_orm.id, number=10)
+        await unit_of_work.update(NumberORM, number_orm.id, number=11)
+        await unit_of_work.soft_delete(NumberORM, deleted_number_orm.id)
+        assert unit_of_work.pending == 9
+
+    numbers = await _get_numbers(database_manager, [*ids, number_orm.id, deleted_number_orm.id])
+    assert [numbers[id].number for id in ids] == [2000, 1001, 1002, 1003]
+    assert numbers[ids[1]].deleted is not None
+    assert numbers[number_orm.id].number == 11
+    assert numbers[number_orm.id].updated > number_orm.updated
+    assert numbers[deleted_number_orm.id].deleted is not None
+
+
+async def test_unit_of_work_flushes_on_max_pending(postgres_db, database_manager):
+    async with database_manager.session() as session:
+        unit_of_work = UnitOfWork(session, max_pending=2)
+        await unit_of_work.add(NumberORM, {"number": 3000})
+        assert unit_of_work.pending == 1
+        id = await unit_of_work.add(NumberORM, {"number": 3001})
+        assert unit_of_work.pending == 0
+        assert (await session.get(NumberORM, id)).number == 3001
+
+
+async def test_unit_of_work_discards_changes_on_error(postgres_db, database_manager):
+    with pytest.raises(RuntimeError):
+        async with database_manager.session() as session, UnitOfWork(session) as unit_of_work:
+            id = await unit_of_work.add(NumberORM, {"number": 4000})
+            raise RuntimeError
+    assert await _get_numbers(database_manager, [id]) == {}
+
+
+async def test_unit_of_work_retries_flush(postgres_db, database_manager):
+    write = UnitOfWork._write
+    calls = 0
+
+    async def fail_once(self):
+        nonlocal calls
+        calls += 1
+        await write(self)
+        if calls == 1:
+            raise OperationalError("statement", {}, Exception("connection reset"))
+
+    async with database_manager.session() as session, UnitOfWork(session) as unit_of_work:
+        id = await unit_of_work.add(NumberORM, {"number": 5000})
+        with patch.object(UnitOfWork, "_write", fail_once):
+            assert await unit_of_work.flush() == 1
+
+    assert calls == 2
+    numbers = await _get_numbers(database_manager, [id])
+    assert numbers[id].number == 5000  # inserted once, the first attempt was rolled back to the savepoint
+
+
+async def test_unit_of_work_unknown_column(postgres_db, database_manager):
+    async with database_manager.session() as session:
+        unit_of_work = UnitOfWork(session)
+        with pytest.raises(ValueError):
+            await unit_of_work.update(NumberORM, uuid4(), unknown=1)
@@ -0,0 +1,91 @@
+import asyncio
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import select
+
+from matter_persistence.sql.utils import commit
+from matter_persistence.sql.write_behind import WriteBehindBuffer
+from tests.sql.conftest import NumberORM
+
+
+async def _create_number(database_manager, number: int) -> NumberORM:
+    async with database_manager.session() as session:
+        number_orm = NumberORM(number=number)
+        session.add(number_orm)
+        await commit(session)
+    return number_orm
+
+
+async def _get_number(database_manager, number_orm: NumberORM) -> NumberORM:
+    async with database_manager.session() as session:
+        number: NumberORM | None = await session.scalar(select(NumberORM).where(NumberORM.id == number_orm.id))
+    assert number is not None
+    return number
+
+
+async def test_write_behind_buffer_coalesces_updates(postgres_db, database_manager):
+    number_orm = await _create_number(database_manager, 100)
+    buffer = WriteBehindBuffer(database_manager, NumberORM)
+    for number in range(101, 111):
+        await buffer.update(number_orm.id, number=number)
+    assert buffer.pending_rows == 1
+    assert await buffer.flush() == 1
+
+    updated_number_orm = await _get_number(database_manager, number_orm)
+    assert updated_number_orm.number == 110
+    assert updated_number_orm.updated > number_orm.updated
+
+
+async def test_write_behind_buffer_flushes_on_max_pending_rows(postgres_db, database_manager):
+    number_orms = [await _create_number(database_manager, 200 + i) for i in range(2)]
+    buffer = WriteBehindBuffer(database_manager, NumberORM, max_pending_rows=2)
+    for number_orm in number_orms:
+        await buffer.update(number_orm.id, number=number_orm.number + 10)
+    assert buffer.pending_rows == 0
+    assert (await _get_number(database_manager, number_orms[1])).number == 211
+
+
+async def test_write_behind_buffer_drains_on_exit(postgres_db, database_manager):
+    number_orm = await _create_number(database_manager, 300)
+    async with WriteBehindBuffer(database_manager, NumberORM, flush_interval_in_seconds=60) as buffer:
+        await buffer.update(number_orm.id, number=301)
+    assert (await _get_number(database_manager, number_orm)).number == 301
+
+
+async def test_write_behind_buffer_drain_waits_for_running_flush(postgres_db, database_manager):
+    number_orm = await _create_number(database_manager, 400)
+    buffer = WriteBehindBuffer(database_manager, NumberORM, flush_interval_in_seconds=0.01)
+    write = buffer._write
+    writing = asyncio.Event()
+
+    async def slow_write(pending):
+        writing.set()
+        await asyncio.sleep(0.1)
+        await write(pending)
+
+    buffer.start()
+    with patch.object(buffer, "_write", slow_write):
+        await buffer.update(number_orm.id, number=401)
+        await writing.wait()
+        await buffer.drain()
+    assert buffer.pending_rows == 0
+    assert (await _get_number(database_manager, number_orm)).number == 401
+
+
+async def test_write_behind_buffer_keeps_updates_of_cancelled_flush(postgres_db, database_manager):
+    number_orm = await _create_number(database_manager, 500)
+    buffer = WriteBehindBuffer(database_manager, NumberORM)
+    await buffer.update(number_orm.id, number=501)
+    with patch.object(buffer, "_write", side_effect=asyncio.CancelledError), pytest.raises(asyncio.CancelledError):
+        await buffer.flush()
+    assert buffer.pending_rows == 1
+    assert await buffer.flush() == 1
+    assert (await _get_number(database_manager, number_orm)).number == 501
+
+
+async def test_write_behind_buffer_unknown_column(postgres_db, database_manager):
+    buffer = WriteBehindBuffer(database_manager, NumberORM)
+    with pytest.raises(ValueError):
+        await buffer.update(uuid4(), unknown=1)
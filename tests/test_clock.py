@@ -0,0 +1,34 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+from matter_persistence.clock import CoarseClock
+
+
+def test_coarse_clock_without_event_loop():
+    clock = CoarseClock()
+    before = time.time()
+    timestamp = clock.timestamp()
+    assert before <= timestamp <= time.time()
+    assert clock.now().tzinfo == timezone.utc  # noqa: UP017
+
+
+async def test_coarse_clock_is_cached_and_refreshed():
+    clock = CoarseClock(resolution_in_seconds=0.01)
+    timestamp = clock.timestamp()
+    assert clock.timestamp() == timestamp
+    assert clock.now() == datetime.fromtimestamp(timestamp, tz=timezone.utc)  # noqa: UP017
+
+    await asyncio.sleep(0.05)
+    assert clock.timestamp() > timestamp
+    assert abs(clock.timestamp() - time.time()) < 0.05
+
+
+async def test_coarse_clock_stops_refreshing_when_idle():
+    clock = CoarseClock(resolution_in_seconds=0.01)
+    clock.timestamp()
+    await asyncio.sleep(0.05)
+    assert clock._loop is None
+
+    timestamp = clock.timestamp()
+    assert abs(timestamp - time.time()) < 0.01
@@ -0,0 +1,76 @@
+import asyncio
+import time
+from functools import partial
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from matter_persistence.deadline import DeadlineExceededError, deadline, get_remaining_time
+from matter_persistence.decorators import retry_if_failed
+from matter_persistence.sql.exceptions import DatabaseError
+
+
+def test_deadline_nesting():
+    assert get_remaining_time() is None
+    with deadline(10):
+        assert 9 < get_remaining_time() <= 10
+        with deadline(1):
+            assert get_remaining_time() <= 1
+        with deadline(60):  # a nested deadline can't extend the outer one
+            assert get_remaining_time() <= 10
+    assert get_remaining_time() is None
+
+
+async def test_retry_if_failed_deadline_exceeded_before_call():
+    called = False
+
+    async def func():
+        nonlocal called
+        called = True
+
+    with deadline(0):
+        with pytest.raises(DeadlineExceededError):
+            await retry_if_failed(func)()
+    assert not called
+
+
+async def test_retry_if_failed_cancels_call_at_deadline():
+    cancelled = False
+
+    async def slow_func():
+        nonlocal cancelled
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+
+    start = time.monotonic()
+    with deadline(0.05):
+        with pytest.raises(DeadlineExceededError):
+            await retry_if_failed(slow_func, cancel_at_deadline=True)()
+    assert time.monotonic() - start < 1
+    assert cancelled
+
+
+async def test_retry_if_failed_does_not_cancel_sql_call_at_deadline():
+    async def slow_commit():
+        await asyncio.sleep(0.1)
+        return "committed"
+
+    with deadline(0.05):
+        assert await retry_if_failed(slow_commit)() == "committed"
+        with pytest.raises(DeadlineExceededError):  # but no other call is made
+            await retry_if_failed(slow_commit)()
+
+
+async def test_retry_if_failed_stops_retrying_without_time_left():
+    mocked_func = MagicMock(side_effect=OperationalError("statement", {}, Exception()))
+    retry_func = partial(retry_if_failed, delays=(0, 5))(mocked_func)
+    start = time.monotonic()
+    with deadline(1):
+        with pytest.raises(DatabaseError):
+            await retry_func()
+    assert time.monotonic() - start < 1
+    assert mocked_func.call_count == 2  # the retry after 5 seconds would go past the deadline
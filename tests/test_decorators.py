@@ -1,11 +1,13 @@
+from functools import partial
 from unittest.mock import MagicMock
 
 import pytest
 from redis.exceptions import ConnectionError, TimeoutError
-from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.exc import DBAPIError, IntegrityError, OperationalError
 
 from matter_persistence.decorators import retry_if_failed
 from matter_persistence.redis.exceptions import CacheServerError
+from matter_persistence.redis.instrumentation import CacheMetrics
 from matter_persistence.sql.exceptions import DatabaseError, DatabaseIntegrityError
 
 
@@ -44,3 +46,47 @@ async def test_retry_if_failed_operational_error():
     retry_func = retry_if_failed(mocked_func, (0, 1))
     with pytest.raises(DatabaseError):
         await retry_func()
+
+
+class StalePreparedStatementError(Exception):
+    sqlstate = "26000"
+
+
+async def test_retry_if_failed_stale_prepared_statement():
+    calls = 0
+
+    async def fail_once():
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise DBAPIError("SELECT 1", {}, StalePreparedStatementError())
+        return "Mock Result"
+
+    retry_func = retry_if_failed(fail_once, (0, 1))
+    assert await retry_func() == "Mock Result"
+    assert calls == 2
+
+
+async def test_retry_if_failed_other_dbapi_error():
+    mocked_func = MagicMock(side_effect=DBAPIError("SELECT 1", {}, Exception()))
+    retry_func = retry_if_failed(mocked_func, (0, 1))
+    with pytest.raises(DBAPIError):
+        await retry_func()
+    assert mocked_func.call_count == 1
+
+
+async def test_retry_if_failed_records_attempts_and_retries():
+    class InstrumentedClient:
+        instrumentation = CacheMetrics()
+
+        @partial(retry_if_failed, delays=(0, 0))
+        async def get_value(self):
+            raise ConnectionError
+
+    client = InstrumentedClient()
+    with pytest.raises(CacheServerError):
+        await client.get_value()
+
+    assert client.instrumentation.command_duration["get_value"].count == 3
+    assert client.instrumentation.command_errors["get_value"] == 3
+    assert client.instrumentation.retries["get_value"] == 2
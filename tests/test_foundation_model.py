@@ -1,4 +1,11 @@
-from tests.conftest import Person, PersonClass, PersonORM, PersonWithAge
+import asyncio
+import time
+
+import pytest
+import sqlalchemy as sa
+from pydantic import ValidationError
+
+from tests.conftest import Person, PersonClass, PersonORM, PersonWithAge, StrictPerson
 
 
 def test_foundation_model_created_at_fields(person_dto):
@@ -6,6 +13,15 @@ def test_foundation_model_created_at_fields(person_dto):
     assert person_dto.created_at_timestamp
 
 
+async def test_foundation_model_created_at_fields_are_per_instance():
+    person = Person(name="john")
+    await asyncio.sleep(0.05)
+    later_person = Person(name="jane")
+    assert later_person.created_at > person.created_at
+    assert later_person.created_at_timestamp > person.created_at_timestamp
+    assert abs(later_person.created_at_timestamp - time.time()) < 1
+
+
 def test_foundation_model_from_dict(person_dto):
     person = Person.parse_obj({"name": "john"})
     assert person.name == person_dto.name
@@ -30,3 +46,27 @@ def test_foundation_model_from_list(person_dto):
 def test_foundation_model_from_python_class(person_dto):
     person = Person.parse_obj(PersonClass(name="john"))
     assert person.name == person_dto.name
+
+
+def test_foundation_model_parse_many_from_custom_base():
+    persons = Person.parse_many([PersonORM(name="john"), PersonORM(name="jane")])
+    assert [person.name for person in persons] == ["john", "jane"]
+
+
+def test_foundation_model_parse_many_skips_instance_state():
+    [person] = StrictPerson.parse_many([PersonORM(name="john")])
+    assert person.name == "john"
+    assert StrictPerson.parse_obj(PersonORM(name="jane")).name == "jane"
+    assert StrictPerson.parse_obj(PersonWithAge(name="jack", age=30)).name == "jack"
+
+
+def test_foundation_model_parse_many_from_rows():
+    with sa.create_engine("sqlite://").connect() as connection:
+        rows = connection.execute(sa.select(sa.literal("john").label("name"), sa.literal(30).label("age"))).all()
+    [person] = PersonWithAge.parse_many(rows)
+    assert (person.name, person.age) == ("john", 30)
+
+
+def test_foundation_model_parse_many_validates():
+    with pytest.raises(ValidationError):
+        PersonWithAge.parse_many([{"name": "john", "age": "not a number"}])
@@ -0,0 +1,16 @@
+from matter_persistence.instrumentation import Histogram
+
+
+def test_histogram_observe_and_quantile():
+    histogram = Histogram(buckets=(1.0, 2.0, 4.0))
+    for value in (0.5, 1.5, 1.5, 3.0, 10.0):
+        histogram.observe(value)
+    assert histogram.count == 5
+    assert histogram.sum == 16.5
+    assert histogram.bucket_counts == [1, 2, 1, 1]
+    assert 1.0 <= histogram.quantile(0.5) <= 2.0
+    assert histogram.quantile(1.0) == 4.0
+
+
+def test_histogram_empty_quantile():
+    assert Histogram().quantile(0.5) is None
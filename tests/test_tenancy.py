@@ -0,0 +1,16 @@
+from uuid import uuid4
+
+from matter_persistence.tenancy import get_organization_id, organization
+
+
+def test_organization_nesting():
+    organization_id, other_organization_id = uuid4(), uuid4()
+    assert get_organization_id() is None
+    with organization(organization_id):
+        assert get_organization_id() == organization_id
+        with organization(other_organization_id):
+            assert get_organization_id() == other_organization_id
+        with organization(None):  # e.g. a job across organizations
+            assert get_organization_id() is None
+        assert get_organization_id() == organization_id
+    assert get_organization_id() is None